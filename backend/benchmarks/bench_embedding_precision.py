@@ -0,0 +1,86 @@
+"""
+Corpus embedding precision benchmark: float32 vs. float16 vs. int8 storage.
+
+Reports matrix memory, exact-scan query latency and top-k overlap with the
+float32 ranking for each storage dtype. Uses a persisted embeddings.npy when
+given, otherwise a synthetic clustered corpus shaped like MiniLM output (384 dims).
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_embedding_precision [--embeddings PATH] [--sizes 10000,100000] [--top-k 10]
+"""
+
+import argparse
+import statistics
+import time
+from typing import List
+
+import numpy as np
+
+from services.ann_index import normalize_rows
+from services.quantization import STORAGE_DTYPES, QuantizedMatrix
+
+
+def synthetic_corpus(size: int, dim: int = 384, clusters: int = 64, seed: int = 0) -> np.ndarray:
+    """Clustered unit vectors, so nearest neighbours are close-scored like real topic embeddings."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    assignments = rng.integers(0, clusters, size=size)
+    return normalize_rows(centers[assignments] + 0.6 * rng.normal(size=(size, dim)).astype(np.float32))
+
+
+def make_queries(corpus: np.ndarray, count: int, seed: int = 1) -> np.ndarray:
+    """Perturbed corpus rows, standing in for user queries near real documents."""
+    rng = np.random.default_rng(seed)
+    rows = np.asarray(corpus[rng.integers(0, corpus.shape[0], size=count)], dtype=np.float32)
+    return normalize_rows(rows + 0.3 * rng.normal(size=rows.shape).astype(np.float32))
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def run(corpus: np.ndarray, queries: np.ndarray, k: int) -> None:
+    baseline = QuantizedMatrix.quantize(corpus, "float32")
+    reference = [set(top_k(baseline.dot(q), k).tolist()) for q in queries]
+
+    print(f"\n{corpus.shape[0]} x {corpus.shape[1]} corpus, {len(queries)} queries, top-{k}")
+    print(f"{'dtype':>8} {'memory MB':>10} {'saved':>7} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'top-k overlap':>14} {'top-1 match':>12}")
+    for dtype in STORAGE_DTYPES:
+        matrix = QuantizedMatrix.quantize(corpus, dtype)
+        latencies, overlaps, top1 = [], [], []
+        for q, expected in zip(queries, reference):
+            started = time.perf_counter()
+            scores = matrix.dot(q)
+            ranked = top_k(scores, k)
+            latencies.append((time.perf_counter() - started) * 1000)
+            overlaps.append(len(expected & set(ranked.tolist())) / k)
+            top1.append(ranked[0] == top_k(baseline.dot(q), 1)[0])
+
+        saved = 1 - matrix.nbytes / baseline.nbytes
+        print(f"{dtype:>8} {matrix.nbytes / 1e6:>10.1f} {saved:>6.0%} "
+              f"{statistics.median(latencies):>8.2f} {np.percentile(latencies, 95):>8.2f} "
+              f"{np.mean(overlaps):>14.3f} {np.mean(top1):>12.3f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark reduced-precision embedding storage")
+    parser.add_argument("--embeddings", help="Persisted embeddings.npy to use instead of synthetic data")
+    parser.add_argument("--sizes", default="10000,100000", help="Synthetic corpus sizes")
+    parser.add_argument("--queries", type=int, default=50, help="Queries per corpus")
+    parser.add_argument("--top-k", type=int, default=10, help="Ranking depth compared against float32")
+    args = parser.parse_args()
+
+    corpora: List[np.ndarray]
+    if args.embeddings:
+        corpora = [normalize_rows(np.load(args.embeddings))]
+    else:
+        corpora = [synthetic_corpus(int(size)) for size in args.sizes.split(",")]
+
+    for corpus in corpora:
+        run(corpus, make_queries(corpus, args.queries), min(args.top_k, corpus.shape[0]))
+
+
+if __name__ == "__main__":
+    main()
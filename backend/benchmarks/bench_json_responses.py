@@ -0,0 +1,106 @@
+"""
+Response encoding benchmark: FastAPI's default JSON path vs. services.json_encoding.
+
+Builds the documents of the largest endpoints (map ZIPs, risk scores, a
+1000-ZIP scenario and the clusters file) from the configured health data and
+times, per document:
+  - baseline: jsonable_encoder + stdlib json (what JSONResponse does), uncompressed
+  - fast: json_encoding.dumps, plus gzip/brotli at the per-request levels
+  - cached: repeat requests served from a ResponseCache payload
+and reports the bytes on the wire for each encoding.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_json_responses [--health-source PATH_OR_URL] [--repeats 20]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from typing import Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+
+from services.health_data import load_health_geojson, load_zip_table
+from services.json_encoding import (
+    JSON_ENCODER, SUPPORTED_ENCODINGS, ResponseCache, compress, dumps
+)
+from services.map_features import CLUSTERS_PATH, MapFeatureStore
+from services.risk_engine import RiskEngine
+
+
+def baseline_render(content) -> bytes:
+    """FastAPI's default path: jsonable_encoder, then Starlette's JSONResponse.render."""
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def _median_ms(fn: Callable[[], object], repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+async def build_documents(health_source: str) -> Dict[str, object]:
+    loader = lambda: load_health_geojson(health_source)
+    map_store = MapFeatureStore(CLUSTERS_PATH, loader=loader)
+    engine = RiskEngine(clusters_path=CLUSTERS_PATH, loader=lambda: load_zip_table(health_source))
+    await engine.ensure_loaded()
+
+    scores = engine.score(engine.values)
+    ranks = engine.ranks(scores)
+    with open(CLUSTERS_PATH) as f:
+        clusters = json.load(f)
+    return {
+        # The document /api/map/zips serves, parsed back from its encoded projection
+        "map_zips": json.loads((await map_store.get_payload()).body),
+        "risk_scores": {
+            "weights": engine.weights,
+            "scores": {z: {"score": round(float(s), 3), "rank": int(r)}
+                       for z, s, r in zip(engine.zip_codes.tolist(), scores, ranks)},
+        },
+        "scenario_1000": engine.simulate(
+            [{"metric": "OBESITY_CrudePrev", "change": -5, "unit": "percent"}], limit=1000
+        ),
+        "clusters": clusters,
+    }
+
+
+def run(health_source: str, repeats: int) -> None:
+    documents = asyncio.run(build_documents(health_source))
+    cache = ResponseCache()
+    print(f"encoder: {JSON_ENCODER}; encodings: {', '.join(SUPPORTED_ENCODINGS)}\n")
+    print(f"{'endpoint':<14} {'base ms':>8} {'fast ms':>8} {'speedup':>8} {'cached ms':>10} "
+          f"{'raw KB':>8} " + " ".join(f"{e + ' KB':>8} {e + ' ms':>7}" for e in SUPPORTED_ENCODINGS))
+    for name, content in documents.items():
+        base_ms = _median_ms(lambda: baseline_render(content), repeats)
+        fast_ms = _median_ms(lambda: dumps(content), repeats)
+        body = dumps(content)
+        cache.get_or_encode(name, 1, lambda: content).compressed(SUPPORTED_ENCODINGS[0])
+        cached_ms = _median_ms(
+            lambda: cache.get_or_encode(name, 1, lambda: content).compressed(SUPPORTED_ENCODINGS[0]), repeats
+        )
+        columns: List[str] = []
+        for encoding in SUPPORTED_ENCODINGS:
+            compress_ms = _median_ms(lambda: compress(body, encoding), max(1, repeats // 4))
+            columns.append(f"{len(compress(body, encoding)) / 1024:>8.1f} {compress_ms:>7.2f}")
+        print(f"{name:<14} {base_ms:>8.2f} {fast_ms:>8.2f} {base_ms / max(fast_ms, 1e-9):>7.1f}x "
+              f"{cached_ms:>10.4f} {len(baseline_render(content)) / 1024:>8.1f} " + " ".join(columns))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark response JSON encoding and compression")
+    parser.add_argument("--health-source", default=os.getenv("HEALTH_GEOJSON_URL"),
+                        help="Health GeoJSON URL or path (default: HEALTH_GEOJSON_URL)")
+    parser.add_argument("--repeats", type=int, default=20, help="Timed repeats per document")
+    args = parser.parse_args()
+    run(args.health_source, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Keyword scoring benchmark: BM25 index vs. the previous substring scorer.
+
+Synthesizes corpora of increasing size by replicating interventions-db.json
+(with per-copy id suffixes) and times index build and per-query scoring.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_keyword_scoring [--sizes 50,1000,10000,100000] [--queries 20]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from services.bm25 import BM25Index, tokenize
+from services.enhanced_interventions import KEYWORD_SCORE_SATURATION
+
+INTERVENTIONS_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "interventions-db.json"
+)
+
+SAMPLE_QUERIES = [
+    "diabetes prevention programs for seniors",
+    "community walking groups to increase physical activity",
+    "food pantry and nutrition education",
+    "smoking cessation support",
+    "mobile clinics for healthcare access",
+]
+RISK_KEYWORDS = ["diabetes", "blood_sugar", "glucose", "obesity", "weight", "bmi",
+                 "food", "nutrition", "food_security"]
+
+
+def legacy_keyword_scores(interventions: List[Dict], risk_keywords: List[str], query: str) -> np.ndarray:
+    """The substring scorer _get_keyword_scores used before BM25, verbatim (the baseline)."""
+    risk_keywords = list(risk_keywords)
+    if query:
+        query_words = [word.lower().strip() for word in query.split() if len(word) > 3]
+        risk_keywords.extend(query_words)
+
+    scores = []
+    for intervention in interventions:
+        score = 0.0
+
+        health_issues = intervention.get("health_issues", [])
+        if isinstance(health_issues, list):
+            for issue in health_issues:
+                if any(keyword in issue.lower() for keyword in risk_keywords):
+                    score += 0.4
+
+        keywords = intervention.get("keywords", [])
+        if isinstance(keywords, list):
+            for keyword in keywords:
+                if keyword.lower() in risk_keywords:
+                    score += 0.2
+
+        title = intervention.get("title", "").lower()
+        description = intervention.get("description", "").lower()
+
+        for keyword in risk_keywords:
+            if keyword in title:
+                score += 0.3
+            if keyword in description:
+                score += 0.1
+
+        scores.append(min(score, 1.0))
+
+    return np.array(scores)
+
+
+def bm25_keyword_scores(index: BM25Index, risk_keywords: List[str], query: str) -> np.ndarray:
+    """What _get_keyword_scores does now: tokenize, score the index, saturate."""
+    terms = [term for keyword in risk_keywords for term in tokenize(keyword)] + tokenize(query)
+    scores = index.score(terms)
+    return scores / (scores + KEYWORD_SCORE_SATURATION)
+
+
+def synthesize_corpus(base: List[Dict], size: int) -> List[Dict]:
+    corpus = []
+    for i in range(size):
+        item = dict(base[i % len(base)])
+        item["id"] = f"{item.get('id', 'item')}-{i}"
+        corpus.append(item)
+    return corpus
+
+
+def _timed(fn, repeats: int) -> List[float]:
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def run(sizes: List[int], queries: int) -> None:
+    with open(INTERVENTIONS_PATH) as f:
+        base = json.load(f)["interventions"]
+
+    print(f"{'docs':>8} {'bm25 build ms':>14} {'bm25 p50 ms':>12} {'bm25 p95 ms':>12} "
+          f"{'legacy p50 ms':>14} {'speedup':>8}")
+    for size in sizes:
+        corpus = synthesize_corpus(base, size)
+
+        started = time.perf_counter()
+        index = BM25Index().build(corpus)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        bm25_samples, legacy_samples = [], []
+        # The legacy scorer is O(docs x keywords) in Python; cap its repeats on big corpora
+        legacy_repeats = max(1, min(queries, 200_000 // size))
+        for q in range(queries):
+            query = SAMPLE_QUERIES[q % len(SAMPLE_QUERIES)]
+            bm25_samples.extend(_timed(lambda: bm25_keyword_scores(index, RISK_KEYWORDS, query), 1))
+            if q < legacy_repeats:
+                legacy_samples.extend(_timed(lambda: legacy_keyword_scores(corpus, RISK_KEYWORDS, query), 1))
+
+        bm25_p50 = statistics.median(bm25_samples)
+        bm25_p95 = float(np.percentile(bm25_samples, 95))
+        legacy_p50 = statistics.median(legacy_samples)
+        print(f"{size:>8} {build_ms:>14.1f} {bm25_p50:>12.3f} {bm25_p95:>12.3f} "
+              f"{legacy_p50:>14.2f} {legacy_p50 / max(bm25_p50, 1e-9):>7.0f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark BM25 vs. legacy keyword scoring")
+    parser.add_argument("--sizes", default="50,1000,10000,100000", help="Comma-separated corpus sizes")
+    parser.add_argument("--queries", type=int, default=20, help="Queries timed per corpus size")
+    args = parser.parse_args()
+    run([int(s) for s in args.sizes.split(",")], args.queries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Hot-path logging overhead benchmark.
+
+Measures the caller-side cost per log call of print(), a synchronous
+StreamHandler and the queue-backed JSON handler from services.logging_setup,
+against a fast sink and a slow sink (a stream whose writes take --slow-ms, like
+a congested pipe or log shipper). Also times DEBUG calls that are sampled out.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_logging [--calls 20000] [--slow-ms 0.2]
+"""
+
+import argparse
+import contextlib
+import io
+import logging
+import logging.handlers
+import queue
+import statistics
+import time
+
+import numpy as np
+
+from services.logging_setup import (
+    JSONFormatter, NonBlockingQueueHandler, SamplingFilter, TraceContextFilter, trace_id_var
+)
+
+
+class SlowStream(io.StringIO):
+    """In-memory stream whose writes take a fixed delay."""
+
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+
+    def write(self, s: str) -> int:
+        time.sleep(self.delay)
+        return super().write(s)
+
+
+def _time_calls(fn, calls: int) -> list:
+    samples = []
+    for i in range(calls):
+        started = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - started) * 1e6)
+    return samples
+
+
+def _report(name: str, samples: list, extra: str = "") -> None:
+    print(f"{name:<34} {statistics.median(samples):>8.2f} {np.percentile(samples, 99):>9.2f} "
+          f"{max(samples):>10.1f}  {extra}")
+
+
+def _sync_logger(stream) -> logging.Logger:
+    logger = logging.getLogger("bench.sync")
+    logger.handlers = []
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JSONFormatter())
+    logger.addHandler(handler)
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    return logger
+
+
+def _queued_logger(stream, queue_size: int, debug_rate: float):
+    logger = logging.getLogger("bench.queued")
+    logger.handlers = []
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+    handler.addFilter(TraceContextFilter())
+    handler.addFilter(SamplingFilter(debug_rate))
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JSONFormatter())
+    listener = logging.handlers.QueueListener(handler.queue, output)
+    listener.start()
+    logger.addHandler(handler)
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    return logger, handler, listener
+
+
+def run(calls: int, slow_ms: float, queue_size: int, caller_info: bool) -> None:
+    trace_id_var.set("bench0000000000")
+    if not caller_info:
+        # Same record-creation settings configure_logging applies by default
+        logging._srcfile = None
+        logging.logThreads = logging.logProcesses = logging.logMultiprocessing = False
+    print(f"{calls} calls per case; caller-side latency in microseconds")
+    print(f"{'case':<34} {'p50 us':>8} {'p99 us':>9} {'max us':>10}")
+
+    for sink_name, make_stream in [("fast sink", io.StringIO),
+                                   (f"slow sink {slow_ms}ms/write", lambda: SlowStream(slow_ms / 1000))]:
+        print(f"\n-- {sink_name}")
+        n = calls if sink_name == "fast sink" else max(1, calls // 10)
+
+        stream = make_stream()
+        with contextlib.redirect_stdout(stream):
+            samples = _time_calls(lambda i: print(f"Chat prompt: {i} tokens (0 trimmed)"), n)
+        _report("print()", samples)
+
+        logger = _sync_logger(make_stream())
+        samples = _time_calls(lambda i: logger.info("request", extra={"status": 200, "n": i}), n)
+        _report("sync StreamHandler (JSON)", samples)
+
+        logger, handler, listener = _queued_logger(make_stream(), queue_size, 0.05)
+        samples = _time_calls(lambda i: logger.info("request", extra={"status": 200, "n": i}), n)
+        listener.stop()
+        _report("queued JSON handler", samples,
+                f"dropped={handler.dropped} max_depth={handler.max_depth}")
+
+    print("\n-- sampling")
+    logger, handler, listener = _queued_logger(io.StringIO(), queue_size, 0.0)
+    samples = _time_calls(lambda i: logger.debug("scored candidates", extra={"n": i}), calls)
+    listener.stop()
+    _report("DEBUG sampled out (rate 0)", samples)
+
+    logging.getLogger("bench.disabled").setLevel(logging.INFO)
+    disabled = logging.getLogger("bench.disabled")
+    samples = _time_calls(lambda i: disabled.debug("scored candidates", extra={"n": i}), calls)
+    _report("DEBUG below level", samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark hot-path logging overhead")
+    parser.add_argument("--calls", type=int, default=20000, help="Log calls per case")
+    parser.add_argument("--slow-ms", type=float, default=0.2, help="Per-write delay of the slow sink")
+    parser.add_argument("--queue-size", type=int, default=10000, help="Queue capacity")
+    parser.add_argument("--caller-info", action="store_true",
+                        help="Keep findCaller/thread/process capture (LOG_CALLER_INFO=true)")
+    args = parser.parse_args()
+    run(args.calls, args.slow_ms, args.queue_size, args.caller_info)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# Local stand-ins and load driver; run as python -m loadtest.<name> from the backend directory
@@ -0,0 +1,228 @@
+"""
+Open-loop load driver for the backend API.
+
+Fires requests at a target rate (Poisson arrivals, so slow responses do not
+throttle the offered load) against /api/analyze, /api/chat and
+/api/recommendations/enhanced, then reports achieved throughput, latency
+percentiles and error rates per endpoint.
+
+Run the backend against the local stand-ins for meaningful numbers:
+    python -m loadtest.mock_openrouter &
+    python -m loadtest.static_server &
+    OPENROUTER_BASE_URL=http://127.0.0.1:8100/api/v1 OPENROUTER_API_KEY=mock \\
+        INTERVENTIONS_URL=http://127.0.0.1:8101/interventions-db.json uvicorn main:app --port 8000
+
+Usage (from the backend directory):
+    python -m loadtest.load_driver [--base-url http://127.0.0.1:8000] [--rps 20] [--duration 30]
+        [--mix analyze=1,chat=1,enhanced=2] [--health-source PATH_OR_URL] [--json results.json]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+ENDPOINTS = {
+    "analyze": "/api/analyze",
+    "chat": "/api/chat",
+    "enhanced": "/api/recommendations/enhanced",
+}
+
+CHAT_MESSAGES = [
+    "What interventions would help this area?",
+    "Give me program ideas to reduce diabetes risk here.",
+    "How does this area compare on obesity and physical activity?",
+    "What are the main risk factors in this ZIP code?",
+]
+
+
+def synthetic_health_data(count: int = 200, seed: int = 7) -> List[dict]:
+    """HealthData-shaped records with plausible prevalence ranges."""
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        records.append({
+            "zip_code": f"{10001 + i:05d}",
+            "RiskScore": round(rng.uniform(10, 40), 2),
+            "DIABETES_CrudePrev": round(rng.uniform(6, 22), 1),
+            "OBESITY_CrudePrev": round(rng.uniform(15, 40), 1),
+            "LPA_CrudePrev": round(rng.uniform(15, 40), 1),
+            "CSMOKING_CrudePrev": round(rng.uniform(8, 25), 1),
+            "BPHIGH_CrudePrev": round(rng.uniform(20, 45), 1),
+            "FOODINSECU_CrudePrev": round(rng.uniform(5, 25), 1),
+            "ACCESS2_CrudePrev": round(rng.uniform(5, 25), 1),
+        })
+    return records
+
+
+async def load_health_data(source: Optional[str]) -> List[dict]:
+    if not source:
+        return synthetic_health_data()
+    from services.health_data import load_health_records
+    records = list((await load_health_records(source)).values())
+    return records or synthetic_health_data()
+
+
+def build_request(kind: str, health_data: dict) -> dict:
+    if kind == "analyze":
+        return health_data
+    if kind == "chat":
+        return {"message": random.choice(CHAT_MESSAGES), "messages": [], "selected_area": health_data}
+    return {"question_type": "lifestyle_interventions", "health_data": health_data}
+
+
+class Results:
+    """Per-endpoint latency samples and outcome counters."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.outcomes: Dict[str, Counter] = defaultdict(Counter)
+
+    def record(self, kind: str, outcome: str, latency: float) -> None:
+        self.outcomes[kind][outcome] += 1
+        if outcome == "ok":
+            self.latencies[kind].append(latency)
+
+    def summary(self, elapsed: float) -> Dict[str, dict]:
+        report = {}
+        for kind in sorted(self.outcomes):
+            outcomes = self.outcomes[kind]
+            total = sum(outcomes.values())
+            latencies = np.array(self.latencies[kind]) * 1000
+            entry = {
+                "requests": total,
+                "ok": outcomes["ok"],
+                "throughput_rps": round(outcomes["ok"] / elapsed, 2),
+                "error_rate": round(1 - outcomes["ok"] / total, 4) if total else 0.0,
+                "outcomes": dict(outcomes),
+            }
+            if latencies.size:
+                entry.update({
+                    f"p{p}_ms": round(float(np.percentile(latencies, p)), 1) for p in (50, 90, 95, 99)
+                })
+                entry["max_ms"] = round(float(latencies.max()), 1)
+            report[kind] = entry
+        return report
+
+
+async def run(base_url: str, rps: float, duration: float, mix: Dict[str, float],
+              health_records: List[dict], timeout: float, max_in_flight: int) -> dict:
+    kinds, weights = zip(*mix.items())
+    results = Results()
+    semaphore = asyncio.Semaphore(max_in_flight)
+    tasks = set()
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout,
+                                 limits=httpx.Limits(max_connections=max_in_flight)) as client:
+        async def fire(kind: str) -> None:
+            if semaphore.locked():
+                results.record(kind, "shed_by_driver", 0.0)
+                return
+            async with semaphore:
+                payload = build_request(kind, random.choice(health_records))
+                started = time.perf_counter()
+                try:
+                    response = await client.post(ENDPOINTS[kind], json=payload)
+                    latency = time.perf_counter() - started
+                    body = response.json() if response.headers.get("content-type", "").startswith(
+                        "application/json") else {}
+                    if response.status_code >= 400:
+                        outcome = f"http_{response.status_code}"
+                    elif isinstance(body, dict) and body.get("error"):
+                        outcome = "app_error"  # /api/analyze reports failures in a 200 body
+                    elif kind == "chat" and str(body.get("response", "")).startswith("⚠️"):
+                        outcome = "fallback"   # /api/chat degrades to a fallback message
+                    else:
+                        outcome = "ok"
+                    results.record(kind, outcome, latency)
+                except httpx.TimeoutException:
+                    results.record(kind, "timeout", time.perf_counter() - started)
+                except httpx.HTTPError as e:
+                    results.record(kind, type(e).__name__, time.perf_counter() - started)
+
+        started = time.perf_counter()
+        next_at = started
+        while next_at - started < duration:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.create_task(fire(random.choices(kinds, weights)[0]))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            next_at += random.expovariate(rps)
+
+        offered_elapsed = time.perf_counter() - started
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+        elapsed = time.perf_counter() - started
+
+    return {
+        "target_rps": rps,
+        "offered_seconds": round(offered_elapsed, 2),
+        "elapsed_seconds": round(elapsed, 2),
+        "endpoints": results.summary(elapsed),
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"\nTarget {report['target_rps']} rps for {report['offered_seconds']}s "
+          f"(drained in {report['elapsed_seconds']}s)")
+    header = f"{'endpoint':<10} {'reqs':>6} {'ok':>6} {'rps':>7} {'err%':>6} " \
+             f"{'p50':>8} {'p90':>8} {'p95':>8} {'p99':>8} {'max':>8}"
+    print(header)
+    for kind, entry in report["endpoints"].items():
+        print(f"{kind:<10} {entry['requests']:>6} {entry['ok']:>6} {entry['throughput_rps']:>7} "
+              f"{entry['error_rate'] * 100:>5.1f}% "
+              + " ".join(f"{entry.get(k, float('nan')):>8.1f}" for k in
+                         ("p50_ms", "p90_ms", "p95_ms", "p99_ms", "max_ms")))
+        failures = {k: v for k, v in entry["outcomes"].items() if k != "ok"}
+        if failures:
+            print(f"{'':<10} failures: {failures}")
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{kind}' (choose from {', '.join(ENDPOINTS)})")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Drive load against the backend API")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--rps", type=float, default=20.0, help="Target request rate")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of offered load")
+    parser.add_argument("--mix", default="analyze=1,chat=1,enhanced=2", help="Endpoint weights")
+    parser.add_argument("--health-source", help="Health GeoJSON URL or path for request payloads")
+    parser.add_argument("--timeout", type=float, default=90.0, help="Per-request timeout")
+    parser.add_argument("--max-in-flight", type=int, default=500,
+                        help="Requests beyond this many outstanding are counted as shed")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    health_records = asyncio.run(load_health_data(args.health_source))
+    report = asyncio.run(run(args.base_url, args.rps, args.duration, mix, health_records,
+                             args.timeout, args.max_in_flight))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Local stand-in for the OpenRouter chat-completions API.
+
+Serves POST /api/v1/chat/completions (plain and "stream": true SSE) with
+configurable time-to-first-token distributions, token generation rate and
+injected 429 / 5xx failures, so the backend can be load-tested without real
+quota. Point the backend at it with OPENROUTER_BASE_URL=http://127.0.0.1:8100/api/v1
+(and any non-empty OPENROUTER_API_KEY).
+
+Latency distributions are written as "fixed:MS", "uniform:MIN_MS,MAX_MS" or
+"lognormal:MEDIAN_MS,SIGMA". Per-model overrides use "model=spec;model=spec".
+
+Usage (from the backend directory):
+    python -m loadtest.mock_openrouter [--port 8100] [--ttft lognormal:600,0.5]
+        [--tokens-per-sec 60] [--rate-429 0.05] [--rate-5xx 0.01]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import random
+import time
+import uuid
+from collections import Counter
+from typing import Dict, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+_FILLER = ("Communities with elevated diabetes prevalence benefit from coordinated prevention "
+           "programs, including nutrition education, walking groups, screening events and "
+           "improved access to primary care. ").split()
+
+
+class LatencyDistribution:
+    """Random delay in seconds drawn from a fixed, uniform or log-normal distribution."""
+
+    def __init__(self, kind: str, a: float, b: float = 0.0):
+        self.kind = kind
+        self.a = a
+        self.b = b
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyDistribution":
+        kind, _, params = spec.partition(":")
+        values = [float(v) for v in params.split(",") if v]
+        if kind == "fixed" and len(values) == 1:
+            return cls(kind, values[0])
+        if kind in ("uniform", "lognormal") and len(values) == 2:
+            return cls(kind, values[0], values[1])
+        raise ValueError(f"Bad latency spec '{spec}' (fixed:MS | uniform:MIN,MAX | lognormal:MEDIAN,SIGMA)")
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            ms = self.a
+        elif self.kind == "uniform":
+            ms = random.uniform(self.a, self.b)
+        else:
+            ms = random.lognormvariate(math.log(max(self.a, 1e-3)), self.b)
+        return max(ms, 0.0) / 1000.0
+
+    def __str__(self) -> str:
+        return f"{self.kind}:{self.a:g}" + (f",{self.b:g}" if self.kind != "fixed" else "")
+
+
+class MockConfig:
+    """Mutable mock behaviour; adjustable at runtime through POST /mock/config."""
+
+    def __init__(self, ttft: str = "lognormal:600,0.5", tokens_per_sec: float = 60.0,
+                 response_tokens: int = 120, rate_429: float = 0.0, rate_5xx: float = 0.0,
+                 retry_after: float = 2.0, model_ttft: str = "", unknown_models_404: bool = False):
+        self.ttft = LatencyDistribution.parse(ttft)
+        self.model_ttft: Dict[str, LatencyDistribution] = {}
+        for entry in filter(None, model_ttft.split(";")):
+            model, _, spec = entry.partition("=")
+            self.model_ttft[model.strip()] = LatencyDistribution.parse(spec.strip())
+        self.tokens_per_sec = tokens_per_sec
+        self.response_tokens = response_tokens
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.retry_after = retry_after
+        self.unknown_models_404 = unknown_models_404
+
+    def update(self, values: dict) -> None:
+        for key, value in values.items():
+            if key == "ttft":
+                self.ttft = LatencyDistribution.parse(value)
+            elif key == "model_ttft":
+                self.model_ttft = {m: LatencyDistribution.parse(s) for m, s in value.items()}
+            elif key in ("tokens_per_sec", "rate_429", "rate_5xx", "retry_after"):
+                setattr(self, key, float(value))
+            elif key == "response_tokens":
+                self.response_tokens = int(value)
+            elif key == "unknown_models_404":
+                self.unknown_models_404 = bool(value)
+            else:
+                raise ValueError(f"Unknown config key: {key}")
+
+    def as_dict(self) -> dict:
+        return {
+            "ttft": str(self.ttft),
+            "model_ttft": {m: str(d) for m, d in self.model_ttft.items()},
+            "tokens_per_sec": self.tokens_per_sec,
+            "response_tokens": self.response_tokens,
+            "rate_429": self.rate_429,
+            "rate_5xx": self.rate_5xx,
+            "retry_after": self.retry_after,
+            "unknown_models_404": self.unknown_models_404,
+        }
+
+
+def create_app(config: Optional[MockConfig] = None) -> FastAPI:
+    """Build the mock API app around a MockConfig."""
+    config = config or MockConfig()
+    app = FastAPI(title="Mock OpenRouter")
+    counters: Counter = Counter()
+    in_flight = {"current": 0, "peak": 0}
+
+    def _tokens() -> list:
+        count = max(1, int(random.gauss(config.response_tokens, config.response_tokens * 0.2)))
+        return [(_FILLER[i % len(_FILLER)] + " ") for i in range(count)]
+
+    def _injected_error() -> Optional[JSONResponse]:
+        roll = random.random()
+        if roll < config.rate_429:
+            counters["429"] += 1
+            return JSONResponse(
+                {"error": {"code": 429, "message": "Rate limit exceeded (mock)"}},
+                status_code=429, headers={"Retry-After": f"{config.retry_after:g}"}
+            )
+        if roll < config.rate_429 + config.rate_5xx:
+            status = random.choice([500, 502, 503])
+            counters[str(status)] += 1
+            return JSONResponse({"error": {"code": status, "message": "Upstream error (mock)"}},
+                                status_code=status)
+        return None
+
+    @app.post("/api/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "mock")
+        counters["requests"] += 1
+
+        if not request.headers.get("authorization", "").removeprefix("Bearer ").strip():
+            counters["401"] += 1
+            return JSONResponse({"error": {"code": 401, "message": "No auth credentials found"}},
+                                status_code=401)
+        if config.unknown_models_404 and config.model_ttft and model not in config.model_ttft:
+            counters["404"] += 1
+            return JSONResponse({"error": {"code": 404, "message": f"No endpoints for {model}"}},
+                                status_code=404)
+        error = _injected_error()
+        if error is not None:
+            return error
+
+        ttft = config.model_ttft.get(model, config.ttft).sample()
+        tokens = _tokens()
+        per_token = 1.0 / config.tokens_per_sec if config.tokens_per_sec > 0 else 0.0
+        completion_id = f"gen-mock-{uuid.uuid4().hex[:12]}"
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                 "total_tokens": prompt_tokens + len(tokens)}
+
+        if not body.get("stream"):
+            in_flight["current"] += 1
+            in_flight["peak"] = max(in_flight["peak"], in_flight["current"])
+            try:
+                await asyncio.sleep(ttft + per_token * len(tokens))
+            finally:
+                in_flight["current"] -= 1
+            counters["200"] += 1
+            return {
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "".join(tokens)}}],
+                "usage": usage,
+            }
+
+        async def events():
+            in_flight["current"] += 1
+            in_flight["peak"] = max(in_flight["peak"], in_flight["current"])
+            try:
+                yield ": OPENROUTER PROCESSING\n\n"
+                await asyncio.sleep(ttft)
+                for token in tokens:
+                    chunk = {"id": completion_id, "object": "chat.completion.chunk", "model": model,
+                             "choices": [{"index": 0, "delta": {"content": token}}]}
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    if per_token:
+                        await asyncio.sleep(per_token)
+                final = {"id": completion_id, "object": "chat.completion.chunk", "model": model,
+                         "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+                yield f"data: {json.dumps(final)}\n\n"
+                yield "data: [DONE]\n\n"
+                counters["200"] += 1
+            except asyncio.CancelledError:
+                counters["client_cancelled"] += 1
+                raise
+            finally:
+                in_flight["current"] -= 1
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/api/v1/models")
+    async def models():
+        names = list(config.model_ttft) or ["mock/default"]
+        return {"data": [{"id": name} for name in names]}
+
+    @app.get("/mock/stats")
+    async def stats():
+        return {"counters": dict(counters), "in_flight": in_flight["current"],
+                "peak_in_flight": in_flight["peak"], "config": config.as_dict()}
+
+    @app.post("/mock/config")
+    async def update_config(request: Request):
+        try:
+            config.update(await request.json())
+        except (ValueError, TypeError) as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        return config.as_dict()
+
+    @app.post("/mock/reset")
+    async def reset():
+        counters.clear()
+        in_flight["peak"] = in_flight["current"]
+        return {"ok": True}
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a local mock of the OpenRouter API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--ttft", default="lognormal:600,0.5", help="Time-to-first-token distribution")
+    parser.add_argument("--model-ttft", default="", help="Per-model overrides: 'model=spec;model=spec'")
+    parser.add_argument("--tokens-per-sec", type=float, default=60.0, help="Streaming token rate (0 = instant)")
+    parser.add_argument("--response-tokens", type=int, default=120, help="Mean tokens per completion")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="Fraction of requests answered with 5xx")
+    parser.add_argument("--retry-after", type=float, default=2.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--unknown-models-404", action="store_true",
+                        help="404 for models not listed in --model-ttft")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = MockConfig(args.ttft, args.tokens_per_sec, args.response_tokens, args.rate_429,
+                        args.rate_5xx, args.retry_after, args.model_ttft, args.unknown_models_404)
+    logging.basicConfig(level=logging.INFO)
+    logger.info(f"Mock OpenRouter on http://{args.host}:{args.port}/api/v1 with {config.as_dict()}")
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
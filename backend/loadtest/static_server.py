@@ -0,0 +1,84 @@
+"""
+Local static file server standing in for the S3 buckets.
+
+Serves the interventions JSON (and optionally a health GeoJSON) with a
+configurable response delay. Point the backend at it with
+INTERVENTIONS_URL=http://127.0.0.1:8101/interventions-db.json and, if
+given, HEALTH_GEOJSON_URL=http://127.0.0.1:8101/health.geojson.
+
+Usage (from the backend directory):
+    python -m loadtest.static_server [--port 8101] [--latency fixed:40] [--health-geojson PATH]
+"""
+
+import argparse
+import logging
+import os
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+from .mock_openrouter import LatencyDistribution
+
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_INTERVENTIONS = os.path.join(REPO_ROOT, "interventions-db.json")
+
+CONTENT_TYPES = {".json": "application/json", ".geojson": "application/geo+json"}
+
+
+def make_handler(routes: Dict[str, str], latency: LatencyDistribution):
+    """Request handler class serving `routes` (URL path -> file path) after a sampled delay."""
+
+    class StaticHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            file_path = routes.get(path)
+            time.sleep(latency.sample())
+            if file_path is None:
+                self.send_error(HTTPStatus.NOT_FOUND)
+                return
+            with open(file_path, "rb") as f:
+                body = f.read()
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", CONTENT_TYPES.get(os.path.splitext(file_path)[1],
+                                                               "application/octet-stream"))
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, fmt, *args):
+            logger.debug(fmt % args)
+
+    return StaticHandler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the interventions JSON like the S3 bucket")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8101)
+    parser.add_argument("--interventions", default=DEFAULT_INTERVENTIONS, help="Interventions JSON file")
+    parser.add_argument("--health-geojson", help="Health GeoJSON served at /health.geojson")
+    parser.add_argument("--latency", default="fixed:0", help="Response delay distribution")
+    args = parser.parse_args()
+
+    routes = {"/interventions-db.json": args.interventions}
+    if args.health_geojson:
+        routes["/health.geojson"] = args.health_geojson
+
+    logging.basicConfig(level=logging.INFO)
+    server = ThreadingHTTPServer((args.host, args.port),
+                                 make_handler(routes, LatencyDistribution.parse(args.latency)))
+    for path, file_path in routes.items():
+        logger.info(f"Serving {file_path} at http://{args.host}:{args.port}{path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
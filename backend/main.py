@@ -1,23 +1,50 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
+import asyncio
+import hmac
 import httpx
+import logging
 import os
 import time
 from typing import Optional, List, Dict
 from dotenv import load_dotenv
 import json
 
+# Load environment variables from .env file (override existing)
+# before importing services, so their module-level settings see it too
+load_dotenv(os.path.join(os.path.dirname(__file__), '.env'), override=True)
+
+# Structured, queue-backed logging for the whole process
+from services.logging_setup import (
+    LOG_ACCESS_SAMPLE_RATE, configure_logging, elapsed_ms, logging_runtime, new_trace_id, trace_id_var
+)
+configure_logging()
+logger = logging.getLogger(__name__)
+
 # Import services
-from services.enhanced_interventions import EnhancedInterventionService
+from services.enhanced_interventions import EnhancedInterventionService, generate_smart_query
+from services.facet_index import FACET_FIELDS
+from services.trend_store import trend_store
+from services.map_features import MapFeatureStore, map_feature_store
+from services.json_encoding import FastJSONResponse, json_response, payload_response, response_cache
+from services.risk_engine import RiskEngine, ScenarioError, parse_weights, risk_engine
+from services.region_store import LegacySource, RegionError, RegionShard, RegionSource, region_store
+from services.chat_sessions import chat_session_store
+from services.prefetch import prefetcher
+from services.report_bundle import REPORT_COMPONENTS, report_builder
+from services.profiler import ENABLE_PROFILER, ProfilerBusy, StackSampler, request_profiler
 from services.prompt_templates import PromptTemplateService, QuestionType
 from services.cache_manager import cache_manager
-
-print("Initial OPENROUTER_API_KEY:", os.getenv("OPENROUTER_API_KEY")) # Debugging line
-
-# Load environment variables from .env file (override existing)
-load_dotenv(os.path.join(os.path.dirname(__file__), '.env'), override=True)
-print("OPENROUTER_API_KEY after .env load:", os.getenv("OPENROUTER_API_KEY"))
+from services.prompt_assembly import prompt_assembler
+from services.context_blocks import intervention_context_cache
+from services.openrouter import openrouter_client
+from services.model_router import model_router
+from services.summary_store import summary_store
+from services.upstream_scheduler import (
+    UpstreamHTTPError, UpstreamRejectedError, upstream_scheduler
+)
 
 # Get OpenRouter API key from environment variables
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
@@ -27,11 +54,15 @@ ENABLE_INTERVENTIONS = os.getenv("ENABLE_INTERVENTIONS", "true").lower() == "tru
 ENABLE_ENHANCED_RAG = os.getenv("ENABLE_ENHANCED_RAG", "true").lower() == "true"
 ENABLE_CHAT = os.getenv("ENABLE_CHAT", "true").lower() == "true"
 
+# Shared secret for /api/admin/* endpoints (sent as X-Admin-Token); admin endpoints are off when unset
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN", "")
+
 # Service instances
 enhanced_intervention_service = None
 prompt_service = PromptTemplateService()
+background_tasks: List[asyncio.Task] = []
 
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # Configure CORS middleware
 origins = [
@@ -46,8 +77,35 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Tag each request with a trace ID (honouring X-Request-ID) and log its outcome."""
+    trace_id = (request.headers.get("x-request-id") or "")[:64] or new_trace_id()
+    token = trace_id_var.set(trace_id)
+    started = time.perf_counter()
+    profiled = request_profiler.armed and request_profiler.begin(request.url.path)
+    try:
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = trace_id
+        logger.info("request", extra={
+            "method": request.method, "path": request.url.path,
+            "status": response.status_code, "duration_ms": elapsed_ms(started),
+            "sample_rate": LOG_ACCESS_SAMPLE_RATE
+        })
+        return response
+    except Exception:
+        logger.exception("request failed", extra={
+            "method": request.method, "path": request.url.path, "duration_ms": elapsed_ms(started)
+        })
+        raise
+    finally:
+        trace_id_var.reset(token)
+        if profiled:
+            request_profiler.end()
+
 
 # Define a Pydantic model for the incoming request data
 class HealthData(BaseModel):
@@ -86,13 +144,50 @@ class HealthData(BaseModel):
 class RecommendationRequest(BaseModel):
     question_type: QuestionType
     health_data: HealthData
+    # Facet filters, e.g. {"implementation_cost": ["low"], "setting": ["schools"]}
+    filters: Optional[Dict[str, List[str]]] = None
 
 class ChatRequest(BaseModel):
     message: str
     messages: list
     selected_area: dict = None
 
-async def get_enhanced_relevant_interventions(health_data: dict, query: str = "", max_results: int = 3) -> List[Dict]:
+class ScenarioChange(BaseModel):
+    metric: str
+    change: float
+    unit: str = "percent"          # "percent" (relative) or "points" (percentage points)
+    scope: Optional[dict] = None   # {"borough": ..., "zip_codes": [...], "cluster_id": ...}
+
+class ScenarioRequest(BaseModel):
+    changes: List[ScenarioChange]
+    weights: Optional[Dict[str, float]] = None
+    limit: int = 50
+    region: Optional[str] = None
+
+class InterventionDelta(BaseModel):
+    upserts: List[dict] = []
+    deletes: List[str] = []
+
+def validate_facet_filters(filters: Optional[Dict[str, List[str]]]) -> None:
+    """Reject filters on fields that are not indexed facets."""
+    unknown = sorted(set(filters or {}) - set(FACET_FIELDS))
+    if unknown:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown facet(s): {', '.join(unknown)}. Allowed: {', '.join(FACET_FIELDS)}."
+        )
+
+def require_admin(token: Optional[str]) -> None:
+    """Reject admin requests unless X-Admin-Token matches ADMIN_API_TOKEN."""
+    if not ADMIN_API_TOKEN:
+        raise HTTPException(status_code=503, detail="Admin endpoints are disabled (ADMIN_API_TOKEN not set).")
+    if not token:
+        raise HTTPException(status_code=401, detail="Missing X-Admin-Token header.")
+    if not hmac.compare_digest(token.encode("utf-8"), ADMIN_API_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+async def get_enhanced_relevant_interventions(health_data: dict, query: str = "", max_results: int = 3,
+                                              filters: Optional[Dict[str, List[str]]] = None) -> List[Dict]:
     """
     Enhanced intervention recommendations using vector similarity + keyword matching.
     Falls back to empty list if enhanced service fails.
@@ -110,20 +205,63 @@ async def get_enhanced_relevant_interventions(health_data: dict, query: str = ""
         
         # Get enhanced recommendations
         recommendations = await enhanced_intervention_service.get_enhanced_recommendations(
-            health_data, query, max_results
+            health_data, query, max_results, filters
         )
         
         if recommendations:
-            print(f"✅ Enhanced RAG returned {len(recommendations)} recommendations")
+            logger.debug("Enhanced RAG returned recommendations", extra={"count": len(recommendations)})
             return recommendations
         else:
-            print("⚠️  Enhanced RAG returned no results")
+            logger.info("Enhanced RAG returned no results")
             return []
             
     except Exception as e:
-        print(f"❌ Enhanced RAG failed: {e}")
+        logger.exception(f"Enhanced RAG failed: {e}")
         return []
 
+async def get_intervention_context(health_data: dict, message: str, max_results: int = 3) -> str:
+    """
+    Rendered intervention context block for a chat message (cached).
+    Returns an empty string if enhanced RAG is disabled or retrieval fails.
+    """
+    global enhanced_intervention_service
+    
+    if not ENABLE_ENHANCED_RAG:
+        return ""
+    
+    try:
+        if enhanced_intervention_service is None:
+            enhanced_intervention_service = EnhancedInterventionService()
+        return await intervention_context_cache.get_block(
+            enhanced_intervention_service, health_data, message, max_results
+        )
+    except Exception as e:
+        logger.exception(f"Intervention context failed: {e}")
+        return ""
+
+async def get_precomputed_interventions(health_data: dict, max_results: int = 3,
+                                        filters: Optional[Dict[str, List[str]]] = None) -> Optional[List[Dict]]:
+    """
+    Look up the offline per-ZIP ranking (from the ZIP's region shard when sharded).
+    Returns None when live scoring is needed.
+    """
+    global enhanced_intervention_service
+    
+    if not ENABLE_ENHANCED_RAG:
+        return None
+    
+    try:
+        if enhanced_intervention_service is None:
+            enhanced_intervention_service = EnhancedInterventionService()
+        source = region_store.source_for_zip(str(health_data.get("zip_code", "")))
+        return await enhanced_intervention_service.get_precomputed_recommendations(
+            health_data, max_results, filters,
+            table_source=source if isinstance(source, RegionShard) else None
+        )
+    except Exception as e:
+        logger.warning(f"Precomputed recommendations unavailable: {e}")
+        return None
+
 @app.get("/")
 def read_root():
     return {"Hello": "World"}
@@ -133,59 +271,33 @@ async def analyze_health_data(data: HealthData):
     if not OPENROUTER_API_KEY:
         return {"error": "OpenRouter API key not configured."}
 
-    print("API Key being used:", OPENROUTER_API_KEY) # Debugging line
-
     # Format data into a prompt for the AI
-    prompt = f"""
-    You are a public health analyst. Analyze the following health data for Zip Code {data.zip_code} and provide a concise summary of the key risk factors for diabetes and related conditions in this area. Focus on the most significant prevalence rates and their potential implications.
-
-    Health Data:
-    - Risk Score: {data.RiskScore:.2f}
-    - Diabetes Crude Prevalence: {data.DIABETES_CrudePrev:.2f}%
-    - Obesity Crude Prevalence: {data.OBESITY_CrudePrev:.2f}%
-    - Lack of Physical Activity Prevalence: {data.LPA_CrudePrev:.2f}%
-    - Current Smoking Crude Prevalence: {data.CSMOKING_CrudePrev:.2f}%
-    - High Blood Pressure Crude Prevalence: {data.BPHIGH_CrudePrev:.2f}%
-    - Food Insecurity Crude Prevalence: {data.FOODINSECU_CrudePrev:.2f}%
-    - Limited Access to Healthcare Prevalence: {data.ACCESS2_CrudePrev:.2f}%
-
-    Example output: 
-
-    Provide a summary that is easy to understand for public health officials. Do not repeat the zip code in the summary. Please make it short no more than 500 characters. 
-    
-    """
+    prompt = prompt_service.format_health_data_prompt(
+        prompt_service.get_analysis_prompt(), data.zip_code, data.dict()
+    )
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-                    "Content-Type": "application/json",
-                    "HTTP-Referer": "YOUR_SITE_URL", # Optional. Site URL for rankings on openrouter.ai.
-                    "X-Title": "YOUR_SITE_NAME" # Optional. Site title for rankings on openrouter.ai.
-                },
-                json={
-                    "model": "arcee-ai/trinity-large-preview:free",
-                    "messages": [{"role": "user", "content": prompt}]
-                },
-                timeout=60.0 # Add a timeout for the API call
-            )
-            response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
-
-            openrouter_response = response.json()
-            ai_summary = openrouter_response['choices'][0]['message']['content']
-
-            return {"summary": ai_summary}
-
+        # Served from the persistent summary store when this prompt was generated before
+        prefetcher.note_request("analysis", prompt)
+        ai_summary = await summary_store.cached_completion(
+            "analysis", prompt, zip_code=data.zip_code,
+            timeout=60.0 # Add a timeout for the API call
+        )
+        # Warm the summaries users usually open next (adjacent and same-cluster ZIPs)
+        prefetcher.trigger(data.zip_code)
+        return {"summary": ai_summary}
+
+    except UpstreamRejectedError as exc:
+        logger.warning(f"AI request rejected by scheduler: {exc.reason}")
+        return {"error": f"The AI service is busy. Please try again in {exc.retry_after:.0f} seconds."}
+    except UpstreamHTTPError as exc:
+        logger.warning(f"Error response {exc.status_code} from AI service")
+        return {"error": f"AI service returned an error: {exc.status_code} - {exc.text}"}
     except httpx.RequestError as exc:
-        print(f"An error occurred while requesting {exc.request.url!r}: {exc}")
+        logger.error(f"An error occurred while requesting {exc.request.url!r}: {exc}")
         return {"error": f"An error occurred while communicating with the AI service: {exc}"}
-    except httpx.HTTPStatusError as exc:
-        print(f"Error response {exc.response.status_code} while requesting {exc.request.url!r}: {exc}")
-        return {"error": f"AI service returned an error: {exc.response.status_code} - {exc.response.text}"}
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
+        logger.exception(f"An unexpected error occurred: {e}")
         return {"error": f"An unexpected error occurred: {e}"}
 
 @app.post("/api/recommendations")
@@ -194,68 +306,38 @@ async def get_recommendations(request: RecommendationRequest):
         raise HTTPException(status_code=500, detail="OpenRouter API key not configured.")
 
     data = request.health_data
-    prompt = prompt_service.get_prompt(request.question_type).format(
-        zip_code=data.zip_code,
-        risk_score=data.RiskScore,
-        diabetes=data.DIABETES_CrudePrev,
-        obesity=data.OBESITY_CrudePrev,
-        physical_inactivity=data.LPA_CrudePrev,
-        smoking=data.CSMOKING_CrudePrev,
-        blood_pressure=data.BPHIGH_CrudePrev,
-        food_insecurity=data.FOODINSECU_CrudePrev,
-        healthcare_access=data.ACCESS2_CrudePrev
+    prompt = prompt_service.format_health_data_prompt(
+        prompt_service.get_prompt(request.question_type), data.zip_code, data.dict()
     )
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-                    "Content-Type": "application/json",
-                    "HTTP-Referer": "YOUR_SITE_URL",
-                    "X-Title": "YOUR_SITE_NAME"
-                },
-                json={
-                    "model": "arcee-ai/trinity-large-preview:free",
-                    "messages": [{"role": "user", "content": prompt}]
-                },
-                timeout=60.0
-            )
-            response.raise_for_status()
-
-            openrouter_response = response.json()
-            recommendation = openrouter_response['choices'][0]['message']['content']
-
-            return {"recommendation": recommendation}
+        prefetcher.note_request(request.question_type.value, prompt)
+        recommendation = await summary_store.cached_completion(
+            request.question_type.value, prompt, zip_code=data.zip_code, timeout=60.0
+        )
+        return {"recommendation": recommendation}
 
+    except UpstreamRejectedError as exc:
+        raise HTTPException(
+            status_code=503,
+            detail=f"AI service is temporarily unavailable ({exc.reason}). Please retry later.",
+            headers={"Retry-After": str(max(1, int(exc.retry_after)))}
+        )
+    except UpstreamHTTPError as exc:
+        if exc.status_code == 429:
+            raise HTTPException(
+                status_code=503,
+                detail="AI service is rate limited. Please retry later.",
+                headers={"Retry-After": str(max(1, int(exc.retry_after)))}
+            )
+        raise HTTPException(status_code=exc.status_code, detail=f"AI service error: {exc.text}")
     except httpx.RequestError as exc:
         raise HTTPException(status_code=500, detail=f"An error occurred while communicating with the AI service: {exc}")
-    except httpx.HTTPStatusError as exc:
-        raise HTTPException(status_code=exc.response.status_code, detail=f"AI service error: {exc.response.text}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
-@app.post("/api/chat")
-async def chat(request: ChatRequest):
-    """
-    Enhanced chat endpoint with Phase B intervention integration.
-    Includes fallback mode for OpenRouter API issues.
-    """
-    if not ENABLE_CHAT:
-        raise HTTPException(
-            status_code=503, 
-            detail="Chat functionality is temporarily disabled. Use /api/recommendations/enhanced for intervention recommendations."
-        )
-    
-    if not OPENROUTER_API_KEY:
-        print("❌ ERROR: OPENROUTER_API_KEY environment variable not set")
-        raise HTTPException(status_code=500, detail="OpenRouter API key not configured. Please check environment variables.")
-    
-    print(f"✅ Using OpenRouter API key: {OPENROUTER_API_KEY[:10]}...")
-    
-    # Prepare the system message with context about the project and data
-    system_message = """You are a helpful assistant that answers questions about diabetes risk factors and health data. Format your responses clearly with:
+# Prepare the system message with context about the project and data
+CHAT_SYSTEM_MESSAGE = """You are a helpful assistant that answers questions about diabetes risk factors and health data. Format your responses clearly with:
     - Use headers (###) for main sections
     - Break information into clear paragraphs
     - Use bullet points or numbered lists for steps or multiple items
@@ -270,118 +352,360 @@ async def chat(request: ChatRequest):
     
     Keep responses clear, actionable, and well-structured."""
 
-    # Format the conversation history for the API
-    messages = [{"role": "system", "content": system_message}]
-    
-    # Add conversation history
-    for msg in request.messages:
-        messages.append({"role": msg["role"], "content": msg["content"]})
+async def build_chat_prompt(message: str, history: list, selected_area: Optional[dict]):
+    """
+    Assemble the upstream messages for a chat turn (shared by POST /api/chat and the WebSocket).
 
+    Returns:
+        (messages, usage) where usage holds the prompt token accounting
+    """
     # ENHANCED: Add intervention context when relevant (Phase B)
-    if (ENABLE_INTERVENTIONS and request.selected_area and 
-        any(keyword in request.message.lower() for keyword in ['intervention', 'recommendation', 'program', 'help', 'ideas', 'solution'])):
+    intervention_context = ""
+    if (ENABLE_INTERVENTIONS and selected_area and
+        any(keyword in message.lower() for keyword in ['intervention', 'recommendation', 'program', 'help', 'ideas', 'solution'])):
         
-        # Use enhanced recommendations with fallback to legacy
-        relevant_interventions = await get_enhanced_relevant_interventions(
-            request.selected_area, 
-            request.message,
+        # Retrieval and rendering are cached per ZIP, intent and corpus version
+        intervention_context = await get_intervention_context(
+            selected_area,
+            message,
             max_results=3
         )
-        
-        if relevant_interventions:
-            intervention_context = "\n\n### Evidence-Based Intervention Options:\n"
-            for i, intervention in enumerate(relevant_interventions, 1):
-                # Enhanced display with relevance score if available
-                relevance = intervention.get('_relevance_score')
-                title_line = f"\n**{i}. {intervention['title']}** ({intervention['category']})"
-                if relevance and ENABLE_ENHANCED_RAG:
-                    title_line += f" *[Relevance: {relevance:.1%}]*"
-                
-                intervention_context += title_line + "\n"
-                intervention_context += f"- {intervention['description'][:180]}...\n"
-                intervention_context += f"- Target: {intervention.get('target_population', 'General population').replace('_', ' ')}\n"
-                intervention_context += f"- Timeline: {intervention.get('timeframe', 'Varies')}\n"
-                intervention_context += f"- Cost: {intervention.get('implementation_cost', 'Medium').title()}\n"
-                
-                # Add evidence level if available
-                if intervention.get('evidence_level'):
-                    intervention_context += f"- Evidence: {intervention.get('evidence_level', 'Medium').title()}\n"
-            
-            intervention_context += "\n*Base your recommendations on these proven interventions and explain how they address the specific health risks in this area.*"
-            messages.append({"role": "system", "content": intervention_context})
-
-    # If there's selected area data, add it as context
-    if request.selected_area:
-        context = f"\nContext for the selected area (ZIP code {request.selected_area.get('zip_code', 'unknown')}):\n"
-        context += "\n".join([f"- {k}: {v}" for k, v in request.selected_area.items()])
-        context_message = f"""### Area Context
-    {context}
+
+    # Fit system prompt, history, context and the new message into the token budget
+    assembled = prompt_assembler.assemble(
+        CHAT_SYSTEM_MESSAGE,
+        history,
+        message,
+        context_blocks=[intervention_context],
+        selected_area=selected_area
+    )
+    usage = {
+        "prompt_tokens": assembled.prompt_tokens,
+        "trimmed_tokens": assembled.trimmed_tokens,
+        "summarized_messages": assembled.summarized_messages,
+        "prefix_tokens": assembled.stats["prefix_tokens"]
+    }
+    logger.debug("Chat prompt assembled", extra=usage)
+    return assembled.messages, usage
+
+@app.post("/api/chat")
+async def chat(request: ChatRequest):
+    """
+    Enhanced chat endpoint with Phase B intervention integration.
+    Includes fallback mode for OpenRouter API issues.
+    """
+    if not ENABLE_CHAT:
+        raise HTTPException(
+            status_code=503, 
+            detail="Chat functionality is temporarily disabled. Use /api/recommendations/enhanced for intervention recommendations."
+        )
     
-    Format your response using markdown with clear sections, bullet points for lists, and proper spacing between paragraphs."""
-    messages.append({"role": "system", "content": context_message})
+    if not OPENROUTER_API_KEY:
+        logger.error("OPENROUTER_API_KEY environment variable not set")
+        raise HTTPException(status_code=500, detail="OpenRouter API key not configured. Please check environment variables.")
     
-    # Add the current user message
-    messages.append({"role": "user", "content": request.message})
+    messages, usage = await build_chat_prompt(request.message, request.messages, request.selected_area)
 
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-                    "HTTP-Referer": "https://geo-risk-spotter.vercel.app",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": "arcee-ai/trinity-large-preview:free",  # Free model available on OpenRouter
-                    "messages": messages
-                }
-            )
-            
-            if response.status_code != 200:
-                print(f"OpenRouter API error: {response.status_code} - {response.text}", flush=True)
-                # Fallback response instead of 500 error
-                fallback_msg = "I'm currently experiencing high traffic with my AI provider (Rate Limit). Please try again in a few minutes."
-                if response.status_code == 404:
-                    fallback_msg = "The selected AI model is currently unavailable. Please check the backend configuration."
-                
-                return {"response": f"⚠️ {fallback_msg} (Debug: {response.status_code})"}
-            
-            data = response.json()
-            return {"response": data["choices"][0]["message"]["content"]}
-
+        content = await model_router.complete(messages, timeout=30.0)
+        return {"response": content, "usage": usage}
+
+    except UpstreamRejectedError as e:
+        logger.warning(f"OpenRouter request rejected by scheduler: {e.reason}")
+        fallback_msg = "I'm currently experiencing high traffic with my AI provider (Rate Limit). Please try again in a few minutes."
+        return {"response": f"⚠️ {fallback_msg} (Debug: {e.reason})", "usage": usage}
+    except UpstreamHTTPError as e:
+        logger.warning(f"OpenRouter API error: {e.status_code} - {e.text}")
+        if e.status_code == 401:
+            raise HTTPException(status_code=500, detail="AI service authentication failed. Please check API key configuration.")
+        # Fallback response instead of 500 error
+        fallback_msg = "I'm currently experiencing high traffic with my AI provider (Rate Limit). Please try again in a few minutes."
+        if e.status_code == 404:
+            fallback_msg = "The selected AI model is currently unavailable. Please check the backend configuration."
+        
+        return {"response": f"⚠️ {fallback_msg} (Debug: {e.status_code})", "usage": usage}
     except httpx.RequestError as e:
-        print(f"❌ Request error: {e}")
+        logger.error(f"Request error: {e}")
         raise HTTPException(status_code=500, detail="Failed to connect to AI service")
-    except httpx.HTTPStatusError as e:
-        print(f"❌ HTTP error: {e.response.status_code} - {e.response.text}")
-        if e.response.status_code == 401:
-            raise HTTPException(status_code=500, detail="AI service authentication failed. Please check API key configuration.")
-        raise HTTPException(status_code=500, detail=f"AI service error: {e.response.status_code}")
     except Exception as e:
-        print(f"❌ Unexpected error in chat endpoint: {e}")
+        logger.exception(f"Unexpected error in chat endpoint: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.websocket("/ws/chat")
+async def chat_socket(websocket: WebSocket, session_id: Optional[str] = None):
+    """
+    Streaming chat over a WebSocket with server-side conversation state.
+
+    Connect with an optional ?session_id= to resume. Client frames:
+      {"type": "message", "message": "...", "selected_area": {...}?}  (area only when it changes)
+      {"type": "area", "selected_area": {...}} | {"type": "reset"}
+    Server frames: "session", "token" (delta), "done" (full response + usage), "error".
+    """
+    await websocket.accept()
+    if not ENABLE_CHAT or not OPENROUTER_API_KEY:
+        await websocket.send_json({"type": "error", "detail": "Chat is unavailable."})
+        await websocket.close(code=1013)
+        return
+
+    session = chat_session_store.open(session_id)
+    session.connections += 1
+    await websocket.send_json({"type": "session", "session_id": session.session_id,
+                               "resumed": session.session_id == session_id, "turns": session.turns})
+    try:
+        while True:
+            frame = await websocket.receive_json()
+            kind = frame.get("type", "message")
+            chat_session_store.touch(session)
+
+            if kind == "reset":
+                chat_session_store.close(session.session_id)
+                session.connections -= 1
+                session = chat_session_store.open(None, session.selected_area)
+                session.connections += 1
+                await websocket.send_json({"type": "session", "session_id": session.session_id,
+                                           "resumed": False, "turns": 0})
+                continue
+            if "selected_area" in frame:
+                session.set_area(frame["selected_area"])
+            if kind == "area":
+                continue
+            message = str(frame.get("message", "")).strip()
+            if kind != "message" or not message:
+                await websocket.send_json({"type": "error", "detail": "Expected a non-empty message."})
+                continue
+
+            async with session.lock:
+                messages, usage = await build_chat_prompt(message, session.history, session.selected_area)
+
+                async def forward(delta: str) -> None:
+                    await websocket.send_json({"type": "token", "delta": delta})
+
+                try:
+                    content = await model_router.complete(messages, timeout=30.0, on_token=forward)
+                except (UpstreamRejectedError, UpstreamHTTPError, httpx.RequestError) as e:
+                    reason = getattr(e, "reason", None) or getattr(e, "status_code", None) or type(e).__name__
+                    logger.warning(f"Chat socket upstream failure: {reason}")
+                    await websocket.send_json({
+                        "type": "error", "usage": usage,
+                        "detail": "I'm currently experiencing high traffic with my AI provider. "
+                                  "Please try again in a few minutes."
+                    })
+                    continue
+
+                session.append("user", message)
+                session.append("assistant", content)
+                session.turns += 1
+                chat_session_store.touch(session)
+                await websocket.send_json({"type": "done", "response": content, "usage": usage,
+                                           "turns": session.turns})
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.exception(f"Chat socket error: {e}")
+        try:
+            await websocket.close(code=1011)
+        except RuntimeError:
+            pass
+    finally:
+        session.connections -= 1
+
 # Initialize intervention cache on startup
 @app.on_event("startup")
 async def startup_event():
     """Initialize services on startup"""
-    print(f"🚀 Starting RiskPulse: Diabetes backend...")
-    print(f"📍 Environment check:")
-    print(f"   - OPENROUTER_API_KEY: {'✅ Set' if OPENROUTER_API_KEY else '❌ Missing'}")
-    print(f"   - ENABLE_INTERVENTIONS: {ENABLE_INTERVENTIONS}")
-    print(f"   - ENABLE_ENHANCED_RAG: {ENABLE_ENHANCED_RAG}")
+    logger.info("Starting RiskPulse: Diabetes backend", extra={
+        "openrouter_api_key_set": bool(OPENROUTER_API_KEY),
+        "enable_interventions": ENABLE_INTERVENTIONS,
+        "enable_enhanced_rag": ENABLE_ENHANCED_RAG
+    })
     
     if ENABLE_INTERVENTIONS and ENABLE_ENHANCED_RAG:
         try:
             # Initialize enhanced service if enabled
             global enhanced_intervention_service
             enhanced_intervention_service = EnhancedInterventionService()
-            print("✅ Enhanced RAG service initialized")
+            logger.info("Enhanced RAG service initialized")
+            
+            # Unload the embedding model when idle or under memory pressure
+            background_tasks.append(asyncio.create_task(
+                enhanced_intervention_service.embedding_service.run_unload_monitor()
+            ))
                 
         except Exception as e:
-            print(f"⚠️ Failed to initialize intervention system: {e}")
+            logger.warning(f"Failed to initialize intervention system: {e}")
             # Don't fail startup if interventions can't be loaded
+    
+    # Map the trend cube (if built) and precompute its rankings
+    trend_store.ensure_loaded()
+    
+    # Evict region shards under memory pressure
+    background_tasks.append(asyncio.create_task(region_store.run_eviction_monitor()))
+    
+    # Evict idle WebSocket chat sessions
+    background_tasks.append(asyncio.create_task(chat_session_store.run_sweeper()))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background tasks and release shared upstream connections."""
+    for task in background_tasks:
+        task.cancel()
+    prefetcher.cancel("shutdown")
+    await openrouter_client.aclose()
+    logging_runtime.shutdown()
+
+@app.get("/api/metrics/upstream")
+async def get_upstream_metrics():
+    """Upstream scheduler and model routing statistics: queue waits, rejections, breaker state, hedging."""
+    return {
+        **upstream_scheduler.stats(),
+        "routing": model_router.stats(),
+        "summary_store": summary_store.stats(),
+        "context_blocks": intervention_context_cache.stats(),
+        "map_payloads": map_feature_store.stats(),
+        "reports": report_builder.stats(),
+        "responses": response_cache.stats()
+    }
+
+@app.get("/api/metrics/prefetch")
+async def get_prefetch_metrics():
+    """Speculative prefetch: queued, completed, cancelled, and later requests served from prefetched entries."""
+    return prefetcher.stats()
+
+@app.get("/api/metrics/regions")
+async def get_region_metrics():
+    """Region shards: which are loaded, opens and evictions, approximate heap per shard and RSS."""
+    return region_store.stats()
+
+@app.get("/api/metrics/chat-sessions")
+async def get_chat_session_metrics():
+    """WebSocket chat sessions: count, approximate memory per session, evictions."""
+    return chat_session_store.stats()
+
+@app.get("/api/metrics/logging")
+async def get_logging_metrics():
+    """Log queue depth, drops and sampling counters."""
+    return logging_runtime.stats()
+
+@app.get("/api/metrics/embeddings")
+async def get_embedding_metrics():
+    """Embedding model residency: loaded state, load/unload counts, reload latency, RSS."""
+    if enhanced_intervention_service is None:
+        return {"model_loaded": False, "message": "Enhanced RAG service not initialized"}
+    return enhanced_intervention_service.embedding_service.stats()
+
+@app.post("/api/admin/interventions/delta")
+async def apply_intervention_delta(delta: InterventionDelta, x_admin_token: Optional[str] = Header(None)):
+    """
+    Push curator edits (upserts by `id`, deletes by `id`) into the live intervention corpus.
+    Only added or changed interventions are re-embedded; the keyword and ANN indexes are patched.
+    """
+    global enhanced_intervention_service
+    require_admin(x_admin_token)
+    if not ENABLE_ENHANCED_RAG:
+        raise HTTPException(status_code=501, detail="Enhanced RAG is disabled.")
+    if not delta.upserts and not delta.deletes:
+        raise HTTPException(status_code=422, detail="Delta has no upserts or deletes.")
+    missing = [i for i, item in enumerate(delta.upserts) if not item.get("title")]
+    if missing:
+        raise HTTPException(status_code=422, detail=f"Upserts without a title at positions {missing}.")
+
+    if enhanced_intervention_service is None:
+        enhanced_intervention_service = EnhancedInterventionService()
+    try:
+        summary = await enhanced_intervention_service.apply_delta(delta.upserts, delta.deletes)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    logger.info("Applied intervention delta", extra=summary)
+    return summary
+
+def format_intervention(rec: Dict) -> Dict:
+    """API representation of a ranked intervention."""
+    formatted_rec = {
+        "title": rec.get("title", ""),
+        "category": rec.get("category", ""),
+        "description": rec.get("description", ""),
+        "target_population": rec.get("target_population", ""),
+        "implementation_cost": rec.get("implementation_cost", ""),
+        "timeframe": rec.get("timeframe", ""),
+        "evidence_level": rec.get("evidence_level", ""),
+        "relevance_score": rec.get("_relevance_score", 0.0)
+    }
+    
+    # Add scoring breakdown if available
+    if ENABLE_ENHANCED_RAG:
+        formatted_rec["scoring"] = {
+            "vector_score": rec.get("_vector_score", 0.0),
+            "keyword_score": rec.get("_keyword_score", 0.0),
+            "context_score": rec.get("_context_score", 0.0)
+        }
+    return formatted_rec
+
+async def get_ranked_interventions(health_data: dict, max_results: int = 5) -> List[Dict]:
+    """Precomputed per-ZIP ranking when fresh, live hybrid scoring otherwise (formatted)."""
+    recommendations = await get_precomputed_interventions(health_data, max_results=max_results)
+    if recommendations is None:
+        recommendations = await get_enhanced_relevant_interventions(
+            health_data, query=generate_smart_query(health_data), max_results=max_results
+        )
+    return [format_intervention(rec) for rec in recommendations]
+
+def ranked_interventions_version() -> str:
+    """Corpus version and scoring model get_ranked_interventions currently ranks with."""
+    service = enhanced_intervention_service
+    if service is None or not service.intervention_cache.get("corpus_version"):
+        return "unloaded"
+    return f"{service.intervention_cache['corpus_version'][:16]}:{service.scoring_model()}"
+
+def require_profiler(x_admin_token: Optional[str]) -> None:
+    if not ENABLE_PROFILER:
+        raise HTTPException(status_code=404, detail="Profiling is disabled (set ENABLE_PROFILER=true).")
+    require_admin(x_admin_token)
+    if request_profiler.busy:
+        raise HTTPException(status_code=409, detail="A profile capture is already running.")
+
+def profile_response(sampler: StackSampler, format: str):
+    """Collapsed stacks as text (for flamegraph tools) or a JSON summary with the stacks."""
+    summary = sampler.summary()
+    if format == "json":
+        return {**summary, "collapsed": sampler.collapsed()}
+    return PlainTextResponse(sampler.collapsed(), headers={
+        "X-Profile-Samples": str(summary["samples"]),
+        "X-Profile-Duration": str(summary["duration_seconds"]),
+    })
+
+@app.post("/api/admin/profile")
+async def profile_window(seconds: float = 10.0, interval_ms: float = 5.0, idle: bool = False,
+                         format: str = "collapsed", x_admin_token: Optional[str] = Header(None)):
+    """
+    Sample every thread's Python stack for `seconds` and return collapsed stacks
+    (pipe into flamegraph.pl or load into speedscope). `idle=true` keeps samples
+    of threads blocked waiting for work; `format=json` adds top-frame summaries.
+    """
+    require_profiler(x_admin_token)
+    if seconds <= 0 or format not in ("collapsed", "json"):
+        raise HTTPException(status_code=422, detail="seconds must be positive and format 'collapsed' or 'json'.")
+    try:
+        sampler = await request_profiler.profile_for(seconds, interval_ms, idle)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return profile_response(sampler, format)
+
+@app.post("/api/admin/profile/requests")
+async def profile_requests(route: str, count: int = 1, timeout: float = 60.0, interval_ms: float = 5.0,
+                           idle: bool = False, format: str = "collapsed",
+                           x_admin_token: Optional[str] = Header(None)):
+    """
+    Sample while the next `count` requests to `route` (a path or template such as
+    /api/reports/{zip_code}) are in flight; returns when they finish or after `timeout`.
+    """
+    require_profiler(x_admin_token)
+    if count < 1 or format not in ("collapsed", "json"):
+        raise HTTPException(status_code=422, detail="count must be at least 1 and format 'collapsed' or 'json'.")
+    try:
+        sampler = await request_profiler.profile_requests(route, count, timeout, interval_ms, idle)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return profile_response(sampler, format)
 
 @app.post("/api/recommendations/enhanced")
 async def get_enhanced_recommendations_endpoint(request: RecommendationRequest):
@@ -390,118 +714,265 @@ async def get_enhanced_recommendations_endpoint(request: RecommendationRequest):
     """
     if not ENABLE_ENHANCED_RAG:
         raise HTTPException(status_code=501, detail="Enhanced RAG is disabled. Use /api/recommendations instead.")
+    validate_facet_filters(request.filters)
     
     try:
-        # Generate smart query from health data for vector similarity
         health_data = request.health_data.dict()
-        smart_query = _generate_smart_query_from_health_data(health_data)
         
-        # Use enhanced intervention service
-        recommendations = await get_enhanced_relevant_interventions(
-            health_data,
-            query=smart_query,
-            max_results=5
-        )
+        # Serve the offline per-ZIP ranking when it is fresh for this corpus and model
+        recommendations = await get_precomputed_interventions(health_data, max_results=5,
+                                                              filters=request.filters)
+        method = "precomputed"
+        
+        if recommendations is None:
+            # Generate smart query from health data for vector similarity
+            smart_query = generate_smart_query(health_data)
+            
+            # Use enhanced intervention service
+            recommendations = await get_enhanced_relevant_interventions(
+                health_data,
+                query=smart_query,
+                max_results=5,
+                filters=request.filters
+            )
+            method = "enhanced_rag"
+        
+        if OPENROUTER_API_KEY:
+            prefetcher.trigger(request.health_data.zip_code)
         
         if not recommendations:
             return {"recommendations": [], "message": "No relevant interventions found."}
         
         # Format recommendations with enhanced metadata
-        formatted_recs = []
-        for rec in recommendations:
-            formatted_rec = {
-                "title": rec.get("title", ""),
-                "category": rec.get("category", ""),
-                "description": rec.get("description", ""),
-                "target_population": rec.get("target_population", ""),
-                "implementation_cost": rec.get("implementation_cost", ""),
-                "timeframe": rec.get("timeframe", ""),
-                "evidence_level": rec.get("evidence_level", ""),
-                "relevance_score": rec.get("_relevance_score", 0.0)
-            }
-            
-            # Add scoring breakdown if available
-            if ENABLE_ENHANCED_RAG:
-                formatted_rec["scoring"] = {
-                    "vector_score": rec.get("_vector_score", 0.0),
-                    "keyword_score": rec.get("_keyword_score", 0.0),
-                    "context_score": rec.get("_context_score", 0.0)
-                }
-            
-            formatted_recs.append(formatted_rec)
+        formatted_recs = [format_intervention(rec) for rec in recommendations]
         
         return {
             "recommendations": formatted_recs,
-            "method": "enhanced_rag",
-            "total_found": len(formatted_recs)
+            "method": method,
+            "total_found": len(formatted_recs),
+            "filters": request.filters or {}
         }
         
     except Exception as e:
-        print(f"❌ Enhanced recommendations error: {e}")
+        logger.exception(f"Enhanced recommendations error: {e}")
         raise HTTPException(status_code=500, detail=f"Error generating enhanced recommendations: {str(e)}")
 
+@app.get("/api/interventions/facets")
+async def get_intervention_facets(request: Request):
+    """
+    Facet value counts for filter UIs. Query parameters narrow the counts,
+    e.g. ?implementation_cost=low&setting=schools&setting=community.
+    """
+    global enhanced_intervention_service
+    if not ENABLE_ENHANCED_RAG:
+        raise HTTPException(status_code=501, detail="Enhanced RAG is disabled.")
+    filters = {field: request.query_params.getlist(field)
+               for field in request.query_params.keys()}
+    validate_facet_filters(filters)
+
+    if enhanced_intervention_service is None:
+        enhanced_intervention_service = EnhancedInterventionService()
+    return {**await enhanced_intervention_service.get_facet_counts(filters), "filters": filters}
+
+def require_trend_store() -> None:
+    if not trend_store.ensure_loaded():
+        raise HTTPException(status_code=503, detail="Trend data not available. Build it with scripts/build_trend_store.py.")
+
+@app.get("/api/trends/top")
+async def get_trend_leaders(metric: str, limit: int = 20, direction: str = "worsening"):
+    """
+    ZIPs where a metric is worsening (or improving) fastest, ranked by least-squares slope per year.
+    """
+    require_trend_store()
+    if metric not in trend_store.column_of:
+        raise HTTPException(status_code=422, detail=f"Unknown metric '{metric}'. Available: {', '.join(trend_store.metrics)}.")
+    if direction not in ("worsening", "improving"):
+        raise HTTPException(status_code=422, detail="direction must be 'worsening' or 'improving'.")
+    limit = max(1, min(limit, 500))
+    return {
+        "metric": metric,
+        "direction": direction,
+        "years": trend_store.years.tolist(),
+        "zips": trend_store.top(metric, limit, improving=direction == "improving"),
+    }
+
+@app.get("/api/trends/{zip_code}")
+async def get_zip_trends(zip_code: str, metrics: Optional[str] = None):
+    """
+    Year-over-year values, deltas and slopes for a ZIP. `metrics` is an optional comma-separated list.
+    """
+    require_trend_store()
+    selected = [m.strip() for m in metrics.split(",") if m.strip()] if metrics else None
+    unknown = [m for m in selected or [] if m not in trend_store.column_of]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown metric(s): {', '.join(unknown)}.")
+    trends = trend_store.zip_trend(zip_code, selected)
+    if trends is None:
+        raise HTTPException(status_code=404, detail=f"No trend data for ZIP {zip_code}.")
+    return trends
+
+def get_region_source(region: Optional[str]) -> RegionSource:
+    """Data source of a region (default region when None); 404 for unknown regions."""
+    try:
+        return region_store.source(region)
+    except RegionError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+def region_risk_engine(source: RegionSource) -> RiskEngine:
+    """Risk engine over a region's ZIPs (the global engine serves the unsharded default region)."""
+    if isinstance(source, LegacySource):
+        return risk_engine
+    return source.instance("risk_engine", lambda s: RiskEngine(clusters_path=s.clusters_path, loader=s.table))
+
+def region_map_store(source: RegionSource) -> MapFeatureStore:
+    """Map payload store of a region (the global store serves the unsharded default region)."""
+    if isinstance(source, LegacySource):
+        return map_feature_store
+    return source.instance("map_features", lambda s: MapFeatureStore(s.clusters_path, loader=s.geojson))
+
+@app.get("/api/regions")
+async def get_regions():
+    """Regions this deployment serves, with ZIP counts, bounding boxes and load state."""
+    return {"default": region_store.default_region, "regions": region_store.regions()}
+
+@app.get("/api/reports/{zip_code}")
+async def get_zip_report(request: Request, zip_code: str, components: Optional[str] = None):
+    """
+    Everything a ZIP report needs in one response: AI summary, the three recommendation
+    texts, ranked interventions, cluster profile and city comparison stats.
+    Components are produced concurrently and cached independently; a failed component
+    is returned with status "error" while the others are still served.
+    `components` is an optional comma-separated subset, e.g. ?components=summary,interventions.
+    """
+    selected = [c.strip() for c in components.split(",") if c.strip()] if components else None
+    unknown = [c for c in selected or [] if c not in REPORT_COMPONENTS]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown component(s): {', '.join(unknown)}. "
+                                                    f"Choose from {', '.join(REPORT_COMPONENTS)}.")
+    source = region_store.source_for_zip(zip_code)
+    try:
+        health_data = await source.record(zip_code)
+    except Exception as e:
+        logger.exception(f"Health data unavailable for report: {e}")
+        raise HTTPException(status_code=503, detail="Health data not available")
+    if health_data is None:
+        raise HTTPException(status_code=404, detail=f"No health data for ZIP {zip_code}.")
+
+    report = await report_builder.build(
+        health_data, get_ranked_interventions, selected, ai_enabled=bool(OPENROUTER_API_KEY),
+        engine=region_risk_engine(source), clusters_path=source.clusters_path,
+        interventions_version=ranked_interventions_version()
+    )
+    return json_response(request, report)
+
 @app.get("/api/analysis/clusters")
-async def get_clusters():
+async def get_clusters(request: Request, region: Optional[str] = None):
     """
     Return pre-computed K-Means clustering results for zip code health data.
     Returns mapping of zip_code -> cluster_id (0-4) and cluster profiles.
 
     Clusters are pre-computed to avoid memory issues on free tier hosting.
+    `region` selects a region shard (default region when omitted).
     """
-    try:
-        # Load pre-computed clusters from static JSON file
-        clusters_path = os.path.join(os.path.dirname(__file__), 'data', 'clusters.json')
-        with open(clusters_path, 'r') as f:
+    source = get_region_source(region)
+
+    def read_clusters():
+        with open(source.clusters_path, 'r') as f:
             return json.load(f)
+
+    try:
+        # Load pre-computed clusters from static JSON file (encoded once per file version)
+        payload = response_cache.get_or_encode(("clusters", source.clusters_path),
+                                               os.path.getmtime(source.clusters_path), read_clusters)
     except FileNotFoundError:
         raise HTTPException(status_code=503, detail="Cluster data not available")
     except Exception as e:
-        print(f"Error loading cluster data: {e}")
+        logger.error(f"Error loading cluster data: {e}")
         raise HTTPException(status_code=500, detail="Failed to load cluster data")
+    return payload_response(request, payload, headers={"Cache-Control": "public, max-age=300"})
 
-def _generate_smart_query_from_health_data(health_data: dict) -> str:
+@app.get("/api/risk/scores")
+async def get_risk_scores(request: Request, weights: Optional[str] = None, region: Optional[str] = None):
     """
-    Generate an intelligent query from health data for vector similarity matching.
-    This enables meaningful "Health Context Match" scores when no explicit query is provided.
+    Composite RiskScore and rank for every ZIP of a region. `weights` overrides the configured
+    metric weights, e.g. ?weights=DIABETES_CrudePrev=0.5,OBESITY_CrudePrev=0.5.
     """
-    query_terms = []
-    
-    # Analyze health data and build contextual query
-    diabetes_rate = health_data.get('DIABETES_CrudePrev', 0)
-    obesity_rate = health_data.get('OBESITY_CrudePrev', 0)
-    inactivity_rate = health_data.get('LPA_CrudePrev', 0)
-    smoking_rate = health_data.get('CSMOKING_CrudePrev', 0)
-    hypertension_rate = health_data.get('BPHIGH_CrudePrev', 0)
-    food_insecurity_rate = health_data.get('FOODINSECU_CrudePrev', 0)
-    healthcare_access_rate = health_data.get('ACCESS2_CrudePrev', 0)
-    
-    # Priority health issues based on rates
-    if diabetes_rate > 15:
-        query_terms.append("diabetes prevention blood sugar glucose management")
-    if obesity_rate > 25:
-        query_terms.append("obesity weight management BMI reduction")
-    if inactivity_rate > 20:
-        query_terms.append("physical activity exercise fitness walking")
-    if smoking_rate > 15:
-        query_terms.append("smoking cessation tobacco quit")
-    if hypertension_rate > 30:
-        query_terms.append("blood pressure hypertension cardiovascular")
-    if food_insecurity_rate > 10:
-        query_terms.append("food security nutrition access healthy eating")
-    if healthcare_access_rate > 15:
-        query_terms.append("healthcare access mobile health services")
-    
-    # Add general health promotion terms
-    query_terms.append("community health chronic disease prevention")
-    
-    # Create coherent query
-    smart_query = " ".join(query_terms)
-    
-    # If no specific health issues, use general diabetes prevention query
-    if not query_terms or smart_query.strip() == "community health chronic disease prevention":
-        smart_query = "diabetes prevention community health chronic disease management"
-    
-    return smart_query
+    risk_engine = region_risk_engine(get_region_source(region))
+    try:
+        await risk_engine.ensure_loaded()
+        selected = parse_weights(weights) if weights else None
+        if selected:
+            risk_engine.validate_weights(selected)
+    except ScenarioError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ValueError:
+        raise HTTPException(status_code=422, detail="weights must look like METRIC=0.5,METRIC=0.5")
+    except Exception as e:
+        logger.exception(f"Risk engine unavailable: {e}")
+        raise HTTPException(status_code=503, detail="Health data not available")
+
+    def build():
+        scores = risk_engine.score(risk_engine.values, selected)
+        ranks = risk_engine.ranks(scores)
+        return {
+            "weights": selected or risk_engine.weights,
+            "scores": {z: {"score": round(float(s), 3), "rank": int(r)}
+                       for z, s, r in zip(risk_engine.zip_codes.tolist(), scores, ranks)},
+        }
+
+    if selected:
+        return json_response(request, build())
+    # Default-weight scores only change when the engine reloads its data
+    payload = response_cache.get_or_encode(("risk_scores", risk_engine.clusters_path), risk_engine.values, build)
+    return payload_response(request, payload)
+
+@app.post("/api/scenarios")
+async def run_scenario(request: ScenarioRequest):
+    """
+    What-if simulation: apply metric changes (e.g. obesity -5% in Brooklyn) and return
+    recomputed risk scores, rank changes and cluster reassignments.
+    """
+    if not request.changes:
+        raise HTTPException(status_code=422, detail="Scenario has no changes.")
+    risk_engine = region_risk_engine(get_region_source(request.region))
+    try:
+        await risk_engine.ensure_loaded()
+    except Exception as e:
+        logger.exception(f"Risk engine unavailable: {e}")
+        raise HTTPException(status_code=503, detail="Health data not available")
+    try:
+        result = risk_engine.simulate([c.dict() for c in request.changes], request.weights,
+                                      max(1, min(request.limit, 1000)))
+    except ScenarioError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    logger.info("Scenario simulated", extra={**result["summary"], "elapsed_ms": result["elapsed_ms"]})
+    return result
+
+@app.get("/api/map/zips")
+async def get_map_zips(request: Request, fields: Optional[str] = None, precision: int = 5,
+                       region: Optional[str] = None):
+    """
+    ZIP FeatureCollection of a region with cluster ids merged in, for the initial map load.
+    `fields` is a comma-separated property list (defaults to the HealthData metrics);
+    coordinates are rounded to `precision` decimals. Supports If-None-Match, brotli and gzip.
+    """
+    selected = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    if not 3 <= precision <= 7:
+        raise HTTPException(status_code=422, detail="precision must be between 3 and 7.")
+    map_feature_store = region_map_store(get_region_source(region))
+    try:
+        payload = await map_feature_store.get_payload(selected, precision)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.exception(f"Error building map payload: {e}")
+        raise HTTPException(status_code=503, detail="Map data not available")
+
+    response = payload_response(request, payload, media_type="application/geo+json",
+                                headers={"Cache-Control": "public, max-age=300"})
+    if response.status_code == 304:
+        map_feature_store.counters["not_modified"] += 1
+    return response
 
 if __name__ == "__main__":
     import uvicorn
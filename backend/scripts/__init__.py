@@ -0,0 +1 @@
+# Offline jobs; run from the backend directory, e.g. `python -m scripts.build_recommendation_table`
@@ -0,0 +1,75 @@
+"""
+Offline build of the per-ZIP recommendation table.
+
+Scores the full intervention corpus for every ZIP in data/clusters.json with the
+same hybrid algorithm as /api/recommendations/enhanced and writes the ranked
+lists to RECOMMENDATION_TABLE_DIR, keyed by corpus version and embedding model.
+
+Usage (from the backend directory):
+    python -m scripts.build_recommendation_table [--health-source PATH_OR_URL] [--depth 50]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+import numpy as np
+
+from services.enhanced_interventions import EnhancedInterventionService, generate_smart_query
+from services.health_data import health_data_fingerprint, load_cluster_zip_codes, load_health_records
+from services.recommendation_table import table_path, write_table
+
+logger = logging.getLogger(__name__)
+
+CLUSTERS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "clusters.json")
+
+
+async def build(health_source: str = None, depth: int = 50, output: str = None) -> str:
+    """
+    Build the table and return the path it was written to.
+
+    Args:
+        health_source: Health GeoJSON URL or path (defaults to HEALTH_GEOJSON_URL)
+        depth: Ranked interventions stored per ZIP
+        output: Override for the output path
+    """
+    service = EnhancedInterventionService()
+    await service._ensure_cache_valid()
+    corpus_version = service.intervention_cache.get("corpus_version")
+    if not service.intervention_cache.get("data"):
+        raise RuntimeError("No interventions available - cannot build recommendation table")
+
+    records = await load_health_records(health_source)
+    zip_codes = [z for z in load_cluster_zip_codes(CLUSTERS_PATH) if z in records]
+    logger.info(f"Scoring {len(zip_codes)} ZIPs against corpus {corpus_version[:16]}")
+
+    started = time.monotonic()
+    rows = []
+    for zip_code in zip_codes:
+        health_data = records[zip_code]
+        scores = service.score_interventions(health_data, generate_smart_query(health_data))
+        ranked = np.argsort(scores["combined"], kind="stable")[::-1]
+        rows.append((zip_code, health_data_fingerprint(health_data), ranked, scores))
+
+    scoring_model = service.scoring_model()
+    path = output or table_path(corpus_version, scoring_model)
+    write_table(path, rows, corpus_version, scoring_model, depth)
+    logger.info(f"Wrote {len(rows)} ZIP rankings to {path} in {time.monotonic() - started:.1f}s")
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Precompute per-ZIP intervention rankings")
+    parser.add_argument("--health-source", help="Health GeoJSON URL or local path")
+    parser.add_argument("--depth", type=int, default=50, help="Ranked interventions kept per ZIP")
+    parser.add_argument("--output", help="Output .npz path (defaults to RECOMMENDATION_TABLE_DIR)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(build(args.health_source, args.depth, args.output))
+
+
+if __name__ == "__main__":
+    main()
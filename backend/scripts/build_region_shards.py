@@ -0,0 +1,95 @@
+"""
+Offline build of a region shard.
+
+Loads a region's health GeoJSON (same schema as the map's health GeoJSON) and
+its clusters.json, quantizes the ZIP geometry and writes the memory-mappable
+shard to REGION_DATA_DIR/<REGION>. Precomputed recommendation tables built for
+the region (scripts/build_recommendation_table.py --output DIR) can be bundled
+with --recommendations. A running backend discovers new regions on restart.
+
+Usage (from the backend directory):
+    python -m scripts.build_region_shards --region NY --name "New York"
+        --health-source PATH_OR_URL --clusters PATH [--precision 5]
+        [--recommendations NPZ ...] [--output DIR]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from services.health_data import feature_to_health_data, geometry_centroid, load_health_geojson
+from services.map_features import quantize_geometry
+from services.region_store import REGION_DATA_DIR, SHARD_METRICS, write_shard
+
+logger = logging.getLogger(__name__)
+
+
+async def build(region: str, name: str, health_source: str, clusters_path: str, precision: int = 5,
+                recommendations: Optional[List[str]] = None, output: str = REGION_DATA_DIR) -> str:
+    """
+    Build one region shard and return its directory.
+
+    Args:
+        region: Region id, e.g. "NY"
+        name: Display name of the region
+        health_source: Health GeoJSON URL or path covering the region
+        clusters_path: The region's clusters.json
+        precision: Coordinate decimals kept in the stored geometry
+        recommendations: Precomputed recommendation .npz files to bundle
+        output: Parent directory of the shards
+    """
+    started = time.monotonic()
+    geojson = await load_health_geojson(health_source)
+    with open(clusters_path) as f:
+        clusters = json.load(f)
+
+    zip_codes, rows, centroids, geometries = [], [], [], []
+    for feature in geojson.get("features", []):
+        properties = feature.get("properties") or {}
+        record = feature_to_health_data(properties)
+        if record is None:
+            continue
+        # Missing metrics are stored as NaN (core metrics read back as 0.0 like the legacy source)
+        rows.append([np.nan if properties.get(m) in (None, "") or record[m] is None else record[m]
+                     for m in SHARD_METRICS])
+        geometry = quantize_geometry(feature.get("geometry"), precision)
+        centroids.append(geometry_centroid(geometry) or (np.nan, np.nan))
+        geometries.append(geometry)
+        zip_codes.append(record["zip_code"])
+
+    values = np.asarray(rows, dtype=np.float32).reshape(len(zip_codes), len(SHARD_METRICS))
+    path = write_shard(
+        output, region, name, zip_codes, values,
+        np.asarray(centroids, dtype=np.float32).reshape(len(zip_codes), 2), geometries, clusters,
+        recommendation_tables=recommendations,
+        sources={"health": health_source, "clusters": clusters_path, "precision": precision},
+    )
+    logger.info(f"Wrote region {region.upper()} ({len(zip_codes)} ZIPs) to {path} "
+                f"in {time.monotonic() - started:.1f}s")
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build a memory-mappable region shard")
+    parser.add_argument("--region", required=True, help="Region id, e.g. NY")
+    parser.add_argument("--name", help="Display name (default: the region id)")
+    parser.add_argument("--health-source", required=True, help="Health GeoJSON URL or path for the region")
+    parser.add_argument("--clusters", required=True, help="clusters.json of the region")
+    parser.add_argument("--precision", type=int, default=5, help="Coordinate decimals to keep")
+    parser.add_argument("--recommendations", nargs="*", default=[],
+                        help="Precomputed recommendation table .npz files to bundle")
+    parser.add_argument("--output", default=REGION_DATA_DIR, help="Parent directory of the shards")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(build(args.region, args.name or args.region.upper(), args.health_source, args.clusters,
+                      args.precision, args.recommendations, args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Offline build of the multi-year PLACES trend cube.
+
+Loads one health GeoJSON snapshot per year (same schema as the map's health
+GeoJSON), aligns them on the union of ZIP codes and writes a year x ZIP x metric
+float32 cube to TREND_STORE_DIR. ZIPs missing from a year are stored as NaN.
+A running backend picks the new cube up on the next trends request.
+
+Usage (from the backend directory):
+    python -m scripts.build_trend_store --snapshot 2021=PATH_OR_URL --snapshot 2022=PATH_OR_URL ...
+        [--output DIR]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from typing import Dict
+
+import numpy as np
+
+from services.health_data import load_metric_snapshot
+from services.trend_store import TREND_METRICS, TREND_STORE_DIR, write_cube
+
+logger = logging.getLogger(__name__)
+
+
+async def build(snapshots: Dict[int, str], output: str = TREND_STORE_DIR) -> str:
+    """
+    Build the cube from per-year snapshots and return the cube path.
+
+    Args:
+        snapshots: Year -> health GeoJSON URL or path
+        output: Output directory
+    """
+    years = sorted(snapshots)
+    started = time.monotonic()
+    snapshot_by_year = {}
+    for year in years:
+        snapshot_by_year[year] = await load_metric_snapshot(snapshots[year], TREND_METRICS)
+        logger.info(f"{year}: {len(snapshot_by_year[year])} ZIPs from {snapshots[year]}")
+
+    zip_codes = sorted(set().union(*snapshot_by_year.values()))
+    row_of = {z: i for i, z in enumerate(zip_codes)}
+    cube = np.full((len(years), len(zip_codes), len(TREND_METRICS)), np.nan, dtype=np.float32)
+    for t, year in enumerate(years):
+        for zip_code, values in snapshot_by_year[year].items():
+            cube[t, row_of[zip_code]] = [np.nan if v is None else v for v in values]
+
+    path = write_cube(output, years, zip_codes, TREND_METRICS, cube,
+                      sources={str(y): snapshots[y] for y in years})
+    logger.info(f"Wrote trend cube {cube.shape} ({cube.nbytes / 1e6:.1f} MB) to {path} "
+                f"in {time.monotonic() - started:.1f}s")
+    return path
+
+
+def parse_snapshot(spec: str):
+    year, _, source = spec.partition("=")
+    if not year.strip().isdigit() or not source:
+        raise argparse.ArgumentTypeError(f"Expected YEAR=PATH_OR_URL, got '{spec}'")
+    return int(year), source.strip()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the multi-year PLACES trend cube")
+    parser.add_argument("--snapshot", action="append", type=parse_snapshot, required=True,
+                        help="YEAR=PATH_OR_URL of a health GeoJSON snapshot (repeat per year)")
+    parser.add_argument("--output", default=TREND_STORE_DIR, help="Output directory")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(build(dict(args.snapshot), args.output))
+
+
+if __name__ == "__main__":
+    main()
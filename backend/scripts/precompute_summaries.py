@@ -0,0 +1,122 @@
+"""
+Bulk precompute of AI summaries and recommendations into the summary store.
+
+Walks every ZIP in data/clusters.json, builds the same prompts as /api/analyze and
+/api/recommendations, and stores the generated texts in SUMMARY_STORE_PATH.
+Already-stored prompts are skipped, so an interrupted run resumes where it stopped.
+Calls go through the upstream scheduler's batch lane, so they respect the rate
+limiter, Retry-After backoff and circuit breaker and yield to interactive traffic.
+
+Usage (from the backend directory):
+    python -m scripts.precompute_summaries [--kinds analysis,lifestyle_interventions] [--concurrency 2]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env"), override=True)
+
+from services.health_data import load_cluster_zip_codes, load_health_records
+from services.prompt_templates import PromptTemplateService, QuestionType
+from services.summary_store import summary_store
+from services.upstream_scheduler import Priority, UpstreamHTTPError, UpstreamRejectedError
+
+logger = logging.getLogger(__name__)
+
+CLUSTERS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "clusters.json")
+ALL_KINDS = ["analysis"] + [q.value for q in QuestionType]
+
+
+def build_prompt(kind: str, health_data: dict) -> str:
+    """Build the exact prompt the API endpoint would send for this kind."""
+    return PromptTemplateService.build_prompt(kind, health_data)
+
+
+async def precompute(kinds, concurrency: int = 2, health_source: str = None,
+                     max_attempts: int = 5, limit: int = 0) -> dict:
+    """
+    Generate and store every missing (ZIP, kind) text.
+
+    Args:
+        kinds: Text kinds to generate ("analysis" and/or QuestionType values)
+        concurrency: Maximum jobs in flight
+        health_source: Health GeoJSON URL or path (defaults to HEALTH_GEOJSON_URL)
+        max_attempts: Attempts per job before giving up on it for this run
+        limit: Stop after this many ZIPs (0 = all)
+
+    Returns:
+        Counts of generated, skipped and failed jobs
+    """
+    records = await load_health_records(health_source)
+    zip_codes = [z for z in load_cluster_zip_codes(CLUSTERS_PATH) if z in records]
+    if limit:
+        zip_codes = zip_codes[:limit]
+
+    jobs = []
+    skipped = 0
+    for zip_code in zip_codes:
+        for kind in kinds:
+            prompt = build_prompt(kind, records[zip_code])
+            if summary_store.contains(kind, prompt):
+                skipped += 1
+            else:
+                jobs.append((zip_code, kind, prompt))
+    logger.info(f"{len(jobs)} summaries to generate, {skipped} already stored")
+
+    counts = {"generated": 0, "skipped": skipped, "failed": 0}
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.monotonic()
+
+    async def run(zip_code: str, kind: str, prompt: str) -> None:
+        async with semaphore:
+            for attempt in range(max_attempts):
+                try:
+                    await summary_store.cached_completion(
+                        kind, prompt, zip_code=zip_code, priority=Priority.BATCH, hedge=False
+                    )
+                    counts["generated"] += 1
+                    done = counts["generated"] + counts["failed"]
+                    if done % 25 == 0:
+                        rate = done / (time.monotonic() - started)
+                        logger.info(f"{done}/{len(jobs)} done ({rate:.2f}/s)")
+                    return
+                except (UpstreamRejectedError, UpstreamHTTPError) as e:
+                    # Circuit open or rate limited: wait as long as upstream asked before retrying
+                    delay = max(e.retry_after, 2 ** attempt)
+                    logger.warning(f"{zip_code}/{kind}: {e} - retrying in {delay:.0f}s")
+                    await asyncio.sleep(delay)
+                except Exception as e:
+                    logger.warning(f"{zip_code}/{kind}: {e}")
+                    await asyncio.sleep(2 ** attempt)
+            counts["failed"] += 1
+
+    await asyncio.gather(*(run(*job) for job in jobs))
+    logger.info(f"Precompute finished: {counts}")
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Precompute AI summaries into the summary store")
+    parser.add_argument("--kinds", default=",".join(ALL_KINDS),
+                        help=f"Comma-separated kinds (default: {','.join(ALL_KINDS)})")
+    parser.add_argument("--concurrency", type=int, default=2, help="Jobs in flight")
+    parser.add_argument("--health-source", help="Health GeoJSON URL or local path")
+    parser.add_argument("--limit", type=int, default=0, help="Only process the first N ZIPs")
+    args = parser.parse_args()
+
+    kinds = [k.strip() for k in args.kinds.split(",") if k.strip()]
+    unknown = set(kinds) - set(ALL_KINDS)
+    if unknown:
+        parser.error(f"Unknown kinds: {', '.join(sorted(unknown))}")
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(precompute(kinds, args.concurrency, args.health_source, limit=args.limit))
+
+
+if __name__ == "__main__":
+    main()
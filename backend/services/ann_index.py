@@ -0,0 +1,241 @@
+"""
+Approximate nearest-neighbour index for intervention embeddings.
+Pure NumPy IVF-flat implementation: corpus vectors are bucketed by a spherical
+k-means coarse quantizer and queries only scan the `nprobe` closest buckets.
+"""
+
+import json
+import logging
+import os
+import shutil
+import uuid
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 2: arrays live in the ann-<id> subdirectory named by ann_meta.json
+INDEX_FORMAT_VERSION = 2
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Return a float32 copy of `matrix` with unit-length rows (cosine == dot product)."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class IVFFlatIndex:
+    """
+    Inverted-file index over L2-normalized embeddings.
+
+    The index stores only the coarse centroids and the bucket membership of
+    each corpus row; the vectors themselves stay in the corpus matrix the
+    index was built from, so no second copy of the embeddings is kept.
+    """
+
+    def __init__(self, nlist: int = 0, nprobe: int = 8, seed: int = 42,
+                 kmeans_iterations: int = 15):
+        """
+        Args:
+            nlist: Number of buckets. 0 picks ~4*sqrt(n) at build time.
+            nprobe: Buckets scanned per query. Higher = better recall, slower queries.
+            seed: RNG seed for centroid initialisation (keeps builds reproducible).
+            kmeans_iterations: Lloyd iterations for the coarse quantizer.
+        """
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.seed = seed
+        self.kmeans_iterations = kmeans_iterations
+
+        self.centroids: Optional[np.ndarray] = None
+        self.list_offsets: Optional[np.ndarray] = None  # (nlist + 1,) start of each bucket in list_ids
+        self.list_ids: Optional[np.ndarray] = None      # (n,) corpus row ids grouped by bucket
+        self.vectors: Optional[np.ndarray] = None       # corpus matrix the ids point into
+
+    @property
+    def size(self) -> int:
+        """Number of indexed corpus rows."""
+        return 0 if self.list_ids is None else int(self.list_ids.shape[0])
+
+    def _assign(self, vectors: np.ndarray, centroids: np.ndarray,
+                chunk_size: int = 8192) -> np.ndarray:
+        """Assign each vector to its closest centroid, chunked to bound temporary memory."""
+        assignments = np.empty(vectors.shape[0], dtype=np.int32)
+        for start in range(0, vectors.shape[0], chunk_size):
+            block = np.asarray(vectors[start:start + chunk_size], dtype=np.float32)
+            assignments[start:start + chunk_size] = np.argmax(block @ centroids.T, axis=1)
+        return assignments
+
+    def build(self, vectors: np.ndarray) -> "IVFFlatIndex":
+        """
+        Train the coarse quantizer and bucket every corpus row.
+
+        Args:
+            vectors: L2-normalized corpus embeddings (2D array)
+
+        Returns:
+            self, for chaining
+        """
+        n = vectors.shape[0]
+        nlist = self.nlist or max(1, int(4 * np.sqrt(n)))
+        nlist = min(nlist, n)
+
+        rng = np.random.default_rng(self.seed)
+        centroids = np.array(vectors[rng.choice(n, size=nlist, replace=False)], dtype=np.float32)
+
+        for _ in range(self.kmeans_iterations):
+            assignments = self._assign(vectors, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, np.asarray(vectors, dtype=np.float32))
+            counts = np.bincount(assignments, minlength=nlist)
+            empty = counts == 0
+            # Re-seed empty buckets so every centroid stays useful
+            if empty.any():
+                sums[empty] = vectors[rng.choice(n, size=int(empty.sum()), replace=False)]
+            centroids = normalize_rows(sums)
+
+        self.nlist = nlist
+        self.centroids = centroids
+        self._set_lists(self._assign(vectors, centroids))
+        self.vectors = vectors
+        logger.info(f"Built IVF index: {n} vectors in {nlist} buckets (nprobe={self.nprobe})")
+        return self
+
+    def _set_lists(self, assignments: np.ndarray) -> None:
+        """Group corpus row ids into inverted lists from their bucket assignments."""
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=self.nlist)
+        self.list_ids = order.astype(np.int32)
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    def assignments(self) -> np.ndarray:
+        """Bucket of every indexed row (inverse of the inverted lists)."""
+        assignments = np.empty(self.size, dtype=np.int32)
+        assignments[np.asarray(self.list_ids)] = np.repeat(
+            np.arange(self.nlist, dtype=np.int32), np.diff(self.list_offsets)
+        )
+        return assignments
+
+    def patched(self, vectors: np.ndarray, reuse: np.ndarray) -> "IVFFlatIndex":
+        """
+        Index for an updated corpus that keeps the trained centroids.
+
+        Rows carried over from the old corpus keep their bucket; only new or
+        changed rows are assigned, so no k-means retraining is needed.
+
+        Args:
+            vectors: L2-normalized embeddings of the updated corpus
+            reuse: For each new row, the old row id it was copied from, or -1
+
+        Returns:
+            A new index attached to `vectors`
+        """
+        old_assignments = self.assignments()
+        kept = reuse >= 0
+        assignments = np.empty(vectors.shape[0], dtype=np.int32)
+        assignments[kept] = old_assignments[reuse[kept]]
+        fresh = np.flatnonzero(~kept)
+        if fresh.size:
+            assignments[fresh] = self._assign(vectors[fresh], self.centroids)
+
+        index = IVFFlatIndex(nlist=self.nlist, nprobe=self.nprobe, seed=self.seed,
+                             kmeans_iterations=self.kmeans_iterations)
+        index.centroids = self.centroids
+        index._set_lists(assignments)
+        index.vectors = vectors
+        logger.info(f"Patched IVF index: {int(kept.sum())} rows kept, {fresh.size} assigned")
+        return index
+
+    def candidates(self, query: np.ndarray) -> np.ndarray:
+        """Return corpus row ids in the `nprobe` buckets closest to the query."""
+        nprobe = max(1, min(self.nprobe, self.nlist))
+        centroid_scores = self.centroids @ query
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        return np.concatenate([
+            self.list_ids[self.list_offsets[b]:self.list_offsets[b + 1]] for b in probe
+        ])
+
+    def score(self, query: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score the query against the probed buckets only.
+
+        Args:
+            query: L2-normalized query embedding (1D array)
+
+        Returns:
+            (candidate row ids, cosine similarities) for the scanned rows
+        """
+        ids = self.candidates(query)
+        return ids, np.asarray(self.vectors[ids], dtype=np.float32) @ query
+
+    def search(self, query: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        """Return the approximate top_k (row id, similarity) pairs, best first."""
+        ids, scores = self.score(query)
+        if ids.size == 0:
+            return []
+        k = min(top_k, ids.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top]
+
+    def save(self, directory: str) -> None:
+        """
+        Persist the index structure next to the corpus embeddings.
+
+        The arrays go into a fresh ann-<id> subdirectory and ann_meta.json, which
+        names it, is swapped in last, so a crash mid-save leaves the previous
+        index intact instead of mixing arrays from two builds.
+        """
+        os.makedirs(directory, exist_ok=True)
+        files = f"ann-{uuid.uuid4().hex[:12]}"
+        staging = os.path.join(directory, files)
+        os.makedirs(staging)
+        np.save(os.path.join(staging, "ann_centroids.npy"), self.centroids)
+        np.save(os.path.join(staging, "ann_list_offsets.npy"), self.list_offsets)
+        np.save(os.path.join(staging, "ann_list_ids.npy"), self.list_ids)
+
+        meta_path = os.path.join(directory, "ann_meta.json")
+        tmp_path = f"{meta_path}.tmp-{os.getpid()}"
+        with open(tmp_path, "w") as f:
+            json.dump({"format": INDEX_FORMAT_VERSION, "type": "ivf_flat", "files": files,
+                       "nlist": self.nlist, "size": self.size}, f)
+        os.replace(tmp_path, meta_path)
+
+        # Drop superseded builds (and the flat files of format 1)
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.startswith("ann-") and name != files:
+                shutil.rmtree(path, ignore_errors=True)
+            elif name in ("ann_centroids.npy", "ann_list_offsets.npy", "ann_list_ids.npy"):
+                os.remove(path)
+
+    @classmethod
+    def load(cls, directory: str, vectors: np.ndarray, nprobe: int = 8) -> Optional["IVFFlatIndex"]:
+        """
+        Load a persisted index and attach it to `vectors`.
+
+        Returns:
+            The index, or None if nothing usable was persisted in `directory`
+        """
+        meta_path = os.path.join(directory, "ann_meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta.get("format") != INDEX_FORMAT_VERSION or meta.get("size") != vectors.shape[0]:
+                return None
+
+            files = os.path.join(directory, meta["files"])
+            index = cls(nlist=meta["nlist"], nprobe=nprobe)
+            index.centroids = np.load(os.path.join(files, "ann_centroids.npy"))
+            index.list_offsets = np.load(os.path.join(files, "ann_list_offsets.npy"))
+            index.list_ids = np.load(os.path.join(files, "ann_list_ids.npy"), mmap_mode="r")
+            index.vectors = vectors
+            return index
+        except Exception as e:
+            logger.warning(f"Failed to load ANN index from {directory}: {e}")
+            return None
@@ -0,0 +1,168 @@
+"""
+BM25 lexical scorer for interventions.
+Term statistics are precomputed at corpus refresh into CSR-style postings with
+per-posting BM25 impacts, so scoring a query is a single vectorized bincount.
+"""
+
+import logging
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further
+had has have having he her here hers him his how i if in into is it its itself just me more
+most my no nor not now of off on once only or other our out over own same she should so some
+such than that the their them then there these they this those through to too under until up
+very was we were what when where which while who whom why will with would you your yours
+give get tell show need want like please ideas help recommend recommendation recommendations
+program programs intervention interventions solution solutions area zip code
+""".split())
+
+# Field weights mirror the old substring scorer (health issues > title > keywords > description)
+FIELD_WEIGHTS = {"health_issues": 4.0, "title": 3.0, "keywords": 2.0, "description": 1.0}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, split on non-alphanumerics (including underscores) and drop stopwords."""
+    return [t for t in _TOKEN_PATTERN.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+def _field_text(value) -> str:
+    if isinstance(value, list):
+        return " ".join(str(v) for v in value)
+    return str(value or "")
+
+
+class BM25Index:
+    """BM25F-style index over title, description, keywords and health_issues."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75,
+                 field_weights: Optional[Dict[str, float]] = None):
+        self.k1 = k1
+        self.b = b
+        self.field_weights = field_weights or FIELD_WEIGHTS
+        self.vocabulary: Dict[str, int] = {}
+        self.term_ptr = np.zeros(1, dtype=np.int64)    # postings of term t: term_ptr[t]:term_ptr[t+1]
+        self.doc_ids = np.zeros(0, dtype=np.int32)
+        self.impacts = np.zeros(0, dtype=np.float32)   # precomputed idf * saturated tf per posting
+        self.num_docs = 0
+        self.doc_terms: List[Counter] = []             # weighted term counts per document, for patching
+
+    def build(self, interventions: List[Dict]) -> "BM25Index":
+        """
+        Tokenize the corpus and precompute document frequencies and length norms.
+
+        Args:
+            interventions: Intervention dictionaries in corpus order
+
+        Returns:
+            self, for chaining
+        """
+        self.doc_terms = [self._weighted_terms(intervention) for intervention in interventions]
+        self._finalize()
+        logger.info(f"Built BM25 index: {self.num_docs} documents, {len(self.vocabulary)} terms")
+        return self
+
+    def patched(self, interventions: List[Dict], reuse: np.ndarray) -> "BM25Index":
+        """
+        Index for an updated corpus that re-tokenizes only new or changed documents.
+
+        Corpus statistics (document frequencies, average length) are recomputed, so
+        scores are identical to a full build; only tokenization is skipped.
+
+        Args:
+            interventions: Updated intervention list in corpus order
+            reuse: For each document, the row it occupied in this index (-1 when new)
+
+        Returns:
+            A new BM25Index; this one is left untouched for in-flight queries
+        """
+        index = BM25Index(self.k1, self.b, self.field_weights)
+        index.doc_terms = [
+            self.doc_terms[old] if old >= 0 else self._weighted_terms(intervention)
+            for intervention, old in zip(interventions, reuse.tolist())
+        ]
+        index._finalize()
+        logger.info(f"Patched BM25 index: {index.num_docs} documents "
+                    f"({int(np.sum(reuse < 0))} re-tokenized), {len(index.vocabulary)} terms")
+        return index
+
+    def _weighted_terms(self, intervention: Dict) -> Counter:
+        weighted = Counter()
+        for field, weight in self.field_weights.items():
+            for token in tokenize(_field_text(intervention.get(field))):
+                weighted[token] += weight
+        return weighted
+
+    def _finalize(self) -> None:
+        """Build postings and impacts from the per-document weighted term counts."""
+        doc_term_freqs = self.doc_terms
+        doc_lengths = np.fromiter((sum(w.values()) for w in doc_term_freqs), dtype=np.float32,
+                                  count=len(doc_term_freqs))
+
+        vocabulary: Dict[str, int] = {}
+        for weighted in doc_term_freqs:
+            for token in weighted:
+                vocabulary.setdefault(token, len(vocabulary))
+
+        # Group postings by term id
+        postings: List[List] = [[] for _ in range(len(vocabulary))]
+        for doc_id, weighted in enumerate(doc_term_freqs):
+            for token, tf in weighted.items():
+                postings[vocabulary[token]].append((doc_id, tf))
+
+        n = len(doc_term_freqs)
+        avgdl = float(doc_lengths.mean()) if n else 0.0
+        counts = np.array([len(p) for p in postings], dtype=np.int64)
+        term_ptr = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        doc_ids = np.fromiter((d for p in postings for d, _ in p), dtype=np.int32, count=int(term_ptr[-1]))
+        tfs = np.fromiter((tf for p in postings for _, tf in p), dtype=np.float32, count=int(term_ptr[-1]))
+
+        idf = np.log1p((n - counts + 0.5) / (counts + 0.5)).astype(np.float32)
+        norm = self.k1 * (1 - self.b + self.b * doc_lengths[doc_ids] / max(avgdl, 1e-9))
+        impacts = np.repeat(idf, counts) * tfs * (self.k1 + 1) / (tfs + norm)
+
+        self.vocabulary = vocabulary
+        self.term_ptr = term_ptr
+        self.doc_ids = doc_ids
+        self.impacts = impacts.astype(np.float32)
+        self.num_docs = n
+
+    def score(self, query_terms: Iterable[str], candidates: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        BM25 score of every document for a bag of query terms.
+
+        Args:
+            query_terms: Already-tokenized terms; repeats raise a term's weight
+            candidates: Optional document ids; when given, returns scores for those rows only
+
+        Returns:
+            Array of raw BM25 scores (len(candidates) or num_docs)
+        """
+        query_counts = Counter(t for t in query_terms if t in self.vocabulary)
+        if not query_counts:
+            size = self.num_docs if candidates is None else len(candidates)
+            return np.zeros(size, dtype=np.float32)
+
+        term_ids = np.fromiter((self.vocabulary[t] for t in query_counts), dtype=np.int64)
+        weights = np.fromiter(query_counts.values(), dtype=np.float32)
+        starts, ends = self.term_ptr[term_ids], self.term_ptr[term_ids + 1]
+        lengths = ends - starts
+
+        # Gather all postings for the query terms in one shot
+        offsets = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+        positions = np.arange(int(lengths.sum())) + offsets
+        scores = np.bincount(
+            self.doc_ids[positions],
+            weights=self.impacts[positions] * np.repeat(weights, lengths),
+            minlength=self.num_docs
+        ).astype(np.float32)
+        return scores if candidates is None else scores[candidates]
@@ -0,0 +1,167 @@
+"""
+Server-side chat session state for the WebSocket chat mode.
+Sessions hold the conversation history and selected area so clients send only
+the new message. The store is bounded by session count (least recently used
+sessions are evicted first) and by idle time, and tracks approximate memory
+per session for the metrics endpoint.
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CHAT_SESSION_TTL = float(os.getenv("CHAT_SESSION_TTL", "1800"))
+CHAT_SESSION_MAX = int(os.getenv("CHAT_SESSION_MAX", "1000"))
+# Older turns beyond this are dropped from the session (the prompt assembler summarizes
+# what it cannot fit, so the store only needs a bounded window)
+CHAT_SESSION_MAX_MESSAGES = int(os.getenv("CHAT_SESSION_MAX_MESSAGES", "40"))
+CHAT_SESSION_SWEEP_INTERVAL = float(os.getenv("CHAT_SESSION_SWEEP_INTERVAL", "60"))
+
+# Rough per-object overheads used for the memory estimate (CPython dict/str headers)
+_SESSION_OVERHEAD_BYTES = 1024
+_MESSAGE_OVERHEAD_BYTES = 300
+
+
+def _approx_bytes(value) -> int:
+    """Cheap size estimate of JSON-like data: UTF-8 payload plus container overheads."""
+    if isinstance(value, str):
+        return 50 + len(value.encode("utf-8"))
+    if isinstance(value, dict):
+        return 64 + sum(_approx_bytes(k) + _approx_bytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return 56 + sum(_approx_bytes(v) for v in value)
+    return 32
+
+
+class ChatSession:
+    """One conversation: history, selected area and activity timestamps."""
+
+    def __init__(self, session_id: str, selected_area: Optional[dict] = None):
+        self.session_id = session_id
+        self.history: List[Dict[str, str]] = []
+        self.selected_area = selected_area
+        self.created = time.monotonic()
+        self.last_active = self.created
+        self.turns = 0
+        self.connections = 0
+        self.approx_bytes = _SESSION_OVERHEAD_BYTES + _approx_bytes(selected_area or {})
+        self.lock = asyncio.Lock()   # one turn at a time per session
+
+    def set_area(self, selected_area: Optional[dict]) -> None:
+        self.approx_bytes += _approx_bytes(selected_area or {}) - _approx_bytes(self.selected_area or {})
+        self.selected_area = selected_area
+
+    def append(self, role: str, content: str) -> None:
+        self.history.append({"role": role, "content": content})
+        self.approx_bytes += _MESSAGE_OVERHEAD_BYTES + len(content.encode("utf-8"))
+        while len(self.history) > CHAT_SESSION_MAX_MESSAGES:
+            dropped = self.history.pop(0)
+            self.approx_bytes -= _MESSAGE_OVERHEAD_BYTES + len(dropped["content"].encode("utf-8"))
+
+    def idle_seconds(self, now: Optional[float] = None) -> float:
+        return (now or time.monotonic()) - self.last_active
+
+
+class ChatSessionStore:
+    """LRU + TTL bounded map of chat sessions."""
+
+    def __init__(self, max_sessions: int = CHAT_SESSION_MAX, ttl: float = CHAT_SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self.counters: Counter = Counter()
+
+    def open(self, session_id: Optional[str] = None, selected_area: Optional[dict] = None) -> ChatSession:
+        """
+        Resume a live session or start a new one.
+
+        Args:
+            session_id: Id from an earlier connection; unknown or expired ids start fresh
+            selected_area: Area to attach to a new session
+
+        Returns:
+            The session, marked as most recently used
+        """
+        session = self._sessions.get(session_id) if session_id else None
+        if session is not None and session.idle_seconds() > self.ttl:
+            self._evict(session.session_id, "idle")
+            session = None
+
+        if session is None:
+            session = ChatSession(uuid.uuid4().hex, selected_area)
+            self._sessions[session.session_id] = session
+            self.counters["created"] += 1
+            while len(self._sessions) > self.max_sessions:
+                oldest = next(iter(self._sessions))
+                self._evict(oldest, "capacity")
+        else:
+            self.counters["resumed"] += 1
+        self.touch(session)
+        return session
+
+    def touch(self, session: ChatSession) -> None:
+        session.last_active = time.monotonic()
+        if session.session_id in self._sessions:
+            self._sessions.move_to_end(session.session_id)
+
+    def close(self, session_id: str) -> bool:
+        """Drop a session explicitly (client reset)."""
+        return self._evict(session_id, "closed")
+
+    def _evict(self, session_id: str, reason: str) -> bool:
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        self.counters[f"evicted_{reason}"] += 1
+        logger.debug("Chat session evicted", extra={
+            "session_id": session_id, "reason": reason, "turns": session.turns,
+            "approx_bytes": session.approx_bytes
+        })
+        return True
+
+    def sweep(self) -> int:
+        """Evict sessions idle longer than the TTL (oldest first). Returns the number evicted."""
+        now = time.monotonic()
+        expired = []
+        for session_id, session in self._sessions.items():
+            if session.idle_seconds(now) <= self.ttl:
+                break   # ordered by last activity
+            if session.connections == 0:
+                expired.append(session_id)
+        for session_id in expired:
+            self._evict(session_id, "idle")
+        return len(expired)
+
+    async def run_sweeper(self, interval: float = CHAT_SESSION_SWEEP_INTERVAL) -> None:
+        """Background task: evict idle sessions periodically."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                evicted = self.sweep()
+                if evicted:
+                    logger.info(f"Evicted {evicted} idle chat sessions")
+            except Exception as e:
+                logger.warning(f"Chat session sweep failed: {e}")
+
+    def stats(self) -> Dict:
+        sizes = [s.approx_bytes for s in self._sessions.values()]
+        return {
+            "sessions": len(sizes),
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl,
+            "connected": sum(1 for s in self._sessions.values() if s.connections),
+            "approx_bytes_total": sum(sizes),
+            "approx_bytes_per_session_avg": round(sum(sizes) / len(sizes)) if sizes else 0,
+            "approx_bytes_per_session_max": max(sizes) if sizes else 0,
+            **self.counters,
+        }
+
+
+# Global chat session store
+chat_session_store = ChatSessionStore()
@@ -0,0 +1,133 @@
+"""
+Cached retrieval and rendering of the chat's intervention context block.
+
+Follow-up turns about the same ZIP usually ask for the same thing, so the
+retrieved interventions and their rendered markdown are cached per
+(corpus version, scoring model, ZIP + health profile, intent signature).
+The signature only keys the cache: retrieval runs on the user's message, since
+the chat's trigger words are stopwords and a signature is no input for the
+embedder. Messages with the same signature share the block of the first one.
+"""
+
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from .enhanced_interventions import EnhancedInterventionService
+from .health_data import health_data_fingerprint
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_BLOCK_CACHE_TTL = float(os.getenv("CONTEXT_BLOCK_CACHE_TTL", "1800"))
+CONTEXT_BLOCK_CACHE_SIZE = int(os.getenv("CONTEXT_BLOCK_CACHE_SIZE", "1024"))
+
+
+def render_intervention_context(interventions: List[Dict], show_relevance: bool = True) -> str:
+    """
+    Render retrieved interventions as the "Evidence-Based Intervention Options" block.
+
+    Args:
+        interventions: Ranked interventions (with `_relevance_score` when scored)
+        show_relevance: Include the relevance percentage next to each title
+
+    Returns:
+        Markdown block, or an empty string when there is nothing to show
+    """
+    if not interventions:
+        return ""
+
+    parts = ["\n\n### Evidence-Based Intervention Options:\n"]
+    for i, intervention in enumerate(interventions, 1):
+        relevance = intervention.get('_relevance_score')
+        title_line = f"\n**{i}. {intervention['title']}** ({intervention['category']})"
+        if relevance and show_relevance:
+            title_line += f" *[Relevance: {relevance:.1%}]*"
+
+        parts.append(title_line + "\n")
+        parts.append(f"- {intervention['description'][:180]}...\n")
+        parts.append(f"- Target: {intervention.get('target_population', 'General population').replace('_', ' ')}\n")
+        parts.append(f"- Timeline: {intervention.get('timeframe', 'Varies')}\n")
+        parts.append(f"- Cost: {intervention.get('implementation_cost', 'Medium').title()}\n")
+        if intervention.get('evidence_level'):
+            parts.append(f"- Evidence: {intervention.get('evidence_level', 'Medium').title()}\n")
+
+    parts.append("\n*Base your recommendations on these proven interventions and explain how they "
+                 "address the specific health risks in this area.*")
+    return "".join(parts)
+
+
+class InterventionContextCache:
+    """Memoizes retrieval + rendering of intervention context blocks in an LRU with a TTL."""
+
+    def __init__(self, max_age: float = CONTEXT_BLOCK_CACHE_TTL, max_entries: int = CONTEXT_BLOCK_CACHE_SIZE):
+        self.max_age = max_age
+        self.max_entries = max_entries
+        # key -> (stored at, {"ids", "block"})
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self.counters = {"hits": 0, "misses": 0}
+
+    def _get(self, key: str) -> Optional[Dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] > self.max_age:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def _set(self, key: str, value: Dict) -> None:
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_block(self, service: EnhancedInterventionService, health_data: dict, message: str,
+                        max_results: int = 3, show_relevance: bool = True) -> str:
+        """
+        Intervention context block for a chat message about an area.
+
+        Args:
+            service: Intervention service used for retrieval on a miss
+            health_data: Selected area's health data
+            message: The user's chat message
+            max_results: Interventions to include
+            show_relevance: Include relevance percentages
+
+        Returns:
+            Rendered markdown block ("" when nothing relevant was found)
+        """
+        await service._ensure_cache_valid()
+        corpus_version = service.intervention_cache.get("corpus_version") or "none"
+        signature = service.intent_signature(message)
+        key_parts = [
+            corpus_version[:16], service.scoring_model(), str(health_data.get("zip_code", "")),
+            health_data_fingerprint(health_data), signature, str(max_results), str(show_relevance)
+        ]
+        key = hashlib.sha1("\x00".join(key_parts).encode("utf-8")).hexdigest()
+
+        cached = self._get(key)
+        if cached is not None:
+            self.counters["hits"] += 1
+            return cached["block"]
+
+        self.counters["misses"] += 1
+        interventions = await service.get_enhanced_recommendations(health_data, message, max_results)
+        block = render_intervention_context(interventions, show_relevance)
+        self._set(key, {"ids": [i.get("id") for i in interventions], "block": block})
+        logger.debug("Rendered intervention context", extra={
+            "zip_code": health_data.get("zip_code"), "intent": signature, "count": len(interventions)
+        })
+        return block
+
+    def stats(self) -> Dict:
+        total = self.counters["hits"] + self.counters["misses"]
+        return {**self.counters, "entries": len(self._entries),
+                "hit_rate": round(self.counters["hits"] / total, 3) if total else None}
+
+
+# Global context block cache
+intervention_context_cache = InterventionContextCache()
@@ -0,0 +1,264 @@
+"""
+Shared embedding worker for multi-worker deployments.
+
+One worker process owns the SentenceTransformer and serves every web worker over a
+local socket, micro-batching concurrent requests into single `model.encode` calls.
+Corpus embeddings are written to EMBEDDING_CACHE_DIR and memory-mapped by the web
+workers, so the OS page cache holds a single shared copy.
+
+Run from the backend directory:
+    python -m services.embedding_worker
+and start the API with EMBEDDING_BACKEND=worker.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_WORKER_ADDRESS = os.getenv("EMBEDDING_WORKER_ADDRESS", "/tmp/riskpulse-embeddings.sock")
+EMBEDDING_WORKER_MAX_BATCH = int(os.getenv("EMBEDDING_WORKER_MAX_BATCH", "64"))
+EMBEDDING_WORKER_MAX_WAIT_MS = float(os.getenv("EMBEDDING_WORKER_MAX_WAIT_MS", "5"))
+EMBEDDING_WORKER_TIMEOUT = float(os.getenv("EMBEDDING_WORKER_TIMEOUT", "30"))
+# Embedding a whole corpus takes far longer than a query batch
+EMBEDDING_WORKER_CORPUS_TIMEOUT = float(os.getenv("EMBEDDING_WORKER_CORPUS_TIMEOUT", "900"))
+
+_HEADER = struct.Struct(">I")
+
+
+def _parse_address(address: str) -> Tuple[str, Optional[Tuple[str, int]]]:
+    """Return ("unix", None) for socket paths or ("tcp", (host, port)) for host:port."""
+    if ":" in address and not address.startswith("/"):
+        host, port = address.rsplit(":", 1)
+        return "tcp", (host, int(port))
+    return "unix", None
+
+
+def encode_frame(payload: bytes) -> bytes:
+    """Length-prefix a message body."""
+    return _HEADER.pack(len(payload)) + payload
+
+
+async def read_frame(reader: asyncio.StreamReader) -> bytes:
+    """Read one length-prefixed message from an asyncio stream."""
+    (length,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    return await reader.readexactly(length)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise ConnectionError("Embedding worker closed the connection")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+class EmbeddingWorkerClient:
+    """
+    Blocking client used by EmbeddingService when EMBEDDING_BACKEND=worker.
+    Calls block for the whole round trip; async code runs them via asyncio.to_thread.
+    """
+
+    def __init__(self, address: str = EMBEDDING_WORKER_ADDRESS, timeout: float = EMBEDDING_WORKER_TIMEOUT,
+                 corpus_timeout: float = EMBEDDING_WORKER_CORPUS_TIMEOUT):
+        self.address = address
+        self.timeout = timeout
+        self.corpus_timeout = corpus_timeout
+        self._local = threading.local()  # one connection per thread
+
+    def _connect(self) -> socket.socket:
+        kind, host_port = _parse_address(self.address)
+        if kind == "tcp":
+            sock = socket.create_connection(host_port, timeout=self.timeout)
+        else:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.address)
+        return sock
+
+    def _request(self, message: dict, timeout: Optional[float] = None,
+                 retry: bool = True) -> Tuple[dict, bytes]:
+        """
+        Send one request and return (header, binary body).
+        Reconnects and resends once on failure when `retry` is set; requests that
+        must not run twice (corpus builds) pass retry=False.
+        """
+        for attempt in range(2 if retry else 1):
+            sock = getattr(self._local, "sock", None)
+            try:
+                if sock is None:
+                    sock = self._local.sock = self._connect()
+                sock.settimeout(timeout or self.timeout)
+                sock.sendall(encode_frame(json.dumps(message).encode("utf-8")))
+                header = json.loads(_recv_exact(sock, _HEADER.unpack(_recv_exact(sock, _HEADER.size))[0]))
+                body = b""
+                if header.get("body_size"):
+                    body = _recv_exact(sock, header["body_size"])
+                if not header.get("ok"):
+                    raise RuntimeError(f"Embedding worker error: {header.get('error')}")
+                return header, body
+            except (OSError, ConnectionError):
+                if sock is not None:
+                    sock.close()
+                self._local.sock = None
+                if attempt == 1 or not retry:
+                    raise
+        raise ConnectionError("Embedding worker unreachable")
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts in the worker; returns a (len(texts), dim) float32 array."""
+        header, body = self._request({"op": "embed", "texts": texts})
+        return np.frombuffer(body, dtype=header["dtype"]).reshape(header["shape"])
+
+    def build_corpus(self, corpus_version: str, texts: List[str]) -> dict:
+        """Have the worker embed, index and persist a corpus under EMBEDDING_CACHE_DIR."""
+        header, _ = self._request({"op": "corpus", "version": corpus_version, "texts": texts},
+                                  timeout=self.corpus_timeout, retry=False)
+        return header
+
+    def info(self) -> dict:
+        """Worker model name, batching configuration and counters."""
+        header, _ = self._request({"op": "info"})
+        return header
+
+
+class EmbeddingWorkerServer:
+    """Socket server owning the embedding model, with dynamic micro-batching."""
+
+    def __init__(self, address: str = EMBEDDING_WORKER_ADDRESS,
+                 max_batch: int = EMBEDDING_WORKER_MAX_BATCH,
+                 max_wait_ms: float = EMBEDDING_WORKER_MAX_WAIT_MS):
+        from .embeddings import EmbeddingService
+
+        self.address = address
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.service = EmbeddingService(backend="local")
+        self._queue: Optional[asyncio.Queue] = None
+        self.stats = {"requests": 0, "texts": 0, "batches": 0, "max_batch_seen": 0}
+
+    async def _batcher(self) -> None:
+        """Collect queued embed requests into batches and encode them together."""
+        loop = asyncio.get_running_loop()
+        while True:
+            texts, future = await self._queue.get()
+            batch = [(texts, future)]
+            size = len(texts)
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    texts, future = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append((texts, future))
+                size += len(texts)
+
+            all_texts = [t for texts, _ in batch for t in texts]
+            try:
+                embeddings = await loop.run_in_executor(
+                    None, self.service.generate_embeddings_batch, all_texts
+                )
+                embeddings = np.asarray(embeddings, dtype=np.float32)
+                offset = 0
+                for texts, future in batch:
+                    if not future.done():
+                        future.set_result(embeddings[offset:offset + len(texts)])
+                    offset += len(texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+            self.stats["batches"] += 1
+            self.stats["max_batch_seen"] = max(self.stats["max_batch_seen"], len(all_texts))
+
+    async def _embed(self, texts: List[str]) -> np.ndarray:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((texts, future))
+        return await future
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    message = json.loads(await read_frame(reader))
+                except asyncio.IncompleteReadError:
+                    break
+
+                body = b""
+                try:
+                    op = message.get("op")
+                    if op == "embed":
+                        texts = [t.strip() for t in message.get("texts", []) if t and t.strip()]
+                        if not texts:
+                            raise ValueError("No valid texts provided")
+                        self.stats["requests"] += 1
+                        self.stats["texts"] += len(texts)
+                        embeddings = await self._embed(texts)
+                        body = np.ascontiguousarray(embeddings).tobytes()
+                        header = {"ok": True, "shape": list(embeddings.shape), "dtype": "float32"}
+                    elif op == "corpus":
+                        await loop.run_in_executor(
+                            None, self.service.prepare_corpus, message["version"], message["texts"]
+                        )
+                        header = {"ok": True, "model": self.service.model_name}
+                    elif op == "info":
+                        header = {"ok": True, "model": self.service.model_name,
+                                  "max_batch": self.max_batch, "max_wait_ms": self.max_wait * 1000,
+                                  **self.stats, "model_residency": self.service.stats()}
+                    else:
+                        raise ValueError(f"Unknown op: {op}")
+                except Exception as e:
+                    header = {"ok": False, "error": str(e)}
+
+                header["body_size"] = len(body)
+                writer.write(encode_frame(json.dumps(header).encode("utf-8")) + body)
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self) -> None:
+        """Load the model and serve until cancelled."""
+        self._queue = asyncio.Queue()
+        started = time.monotonic()
+        self.service._ensure_model_loaded()
+        logger.info(f"Embedding model ready in {time.monotonic() - started:.1f}s")
+
+        kind, host_port = _parse_address(self.address)
+        if kind == "tcp":
+            server = await asyncio.start_server(self._handle, *host_port)
+        else:
+            if os.path.exists(self.address):
+                os.unlink(self.address)
+            server = await asyncio.start_unix_server(self._handle, path=self.address)
+
+        batcher = asyncio.create_task(self._batcher())
+        # Idle / memory-pressure unloading applies to the shared model too
+        unload_monitor = asyncio.create_task(self.service.run_unload_monitor())
+        logger.info(f"Embedding worker listening on {self.address}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            unload_monitor.cancel()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(EmbeddingWorkerServer().serve())
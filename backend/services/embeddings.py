@@ -4,8 +4,18 @@ Uses sentence-transformers for local, cost-effective embedding generation.
 """
 
 import numpy as np
+import asyncio
+import gc
+import hashlib
 import logging
-from typing import List, Dict, Tuple, Optional
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Tuple, Optional, Union
+
+from .ann_index import IVFFlatIndex, normalize_rows
+from .quantization import STORAGE_DTYPES, QuantizedMatrix
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +24,64 @@ import os
 # Lazy import check
 EMBEDDINGS_AVAILABLE = True  # We assume true until we try to import or check env
 
+# "local" loads the model in this process; "worker" delegates to the shared
+# embedding worker process (services/embedding_worker.py); "hashed" uses the
+# NumPy-only character n-gram tier (services/hashed_embeddings.py) for hosts
+# that cannot afford torch
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "local").lower()
+
+# ANN index configuration. Below ANN_MIN_CORPUS_SIZE rows exact search is used;
+# ANN_NPROBE is the recall-vs-latency knob (buckets scanned per query).
+ENABLE_ANN_INDEX = os.getenv("ENABLE_ANN_INDEX", "true").lower() == "true"
+ANN_MIN_CORPUS_SIZE = int(os.getenv("ANN_MIN_CORPUS_SIZE", "2000"))
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "8"))
+ANN_NLIST = int(os.getenv("ANN_NLIST", "0"))
+# Incremental corpus updates patch the ANN index (keeping its centroids) unless more
+# than this fraction of rows is new, in which case the coarse quantizer is retrained
+ANN_REBUILD_FRACTION = float(os.getenv("ANN_REBUILD_FRACTION", "0.25"))
+
+# Where corpus embeddings (and their ANN index) are persisted. Empty disables persistence.
+EMBEDDING_CACHE_DIR = os.getenv(
+    "EMBEDDING_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "embeddings")
+)
+
+# In-memory precision of corpus embeddings: "float32", "float16" (1/2 the memory)
+# or "int8" (~1/4). See benchmarks/bench_embedding_precision.py for the accuracy cost.
+EMBEDDING_STORAGE_DTYPE = os.getenv("EMBEDDING_STORAGE_DTYPE", "float32").lower()
+
+# Model residency: unload the transformer after this many idle seconds (0 = never)
+# or when process RSS exceeds EMBEDDING_MAX_RSS_MB (0 = no limit). It reloads on
+# the next query; corpus embeddings and cached query vectors stay in memory.
+EMBEDDING_IDLE_UNLOAD_SECONDS = float(os.getenv("EMBEDDING_IDLE_UNLOAD_SECONDS", "900"))
+EMBEDDING_MAX_RSS_MB = float(os.getenv("EMBEDDING_MAX_RSS_MB", "0"))
+EMBEDDING_UNLOAD_CHECK_INTERVAL = float(os.getenv("EMBEDDING_UNLOAD_CHECK_INTERVAL", "30"))
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+
+CorpusMatrix = Union[np.ndarray, QuantizedMatrix]
+
+
+def current_rss_mb() -> Optional[float]:
+    """Resident set size of this process in MB (Linux /proc), or None if unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _release_freed_memory() -> None:
+    """Hand freed model memory back to the OS where the allocator allows it."""
+    gc.collect()
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+    try:
+        import ctypes
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
 
 
 class EmbeddingService:
@@ -22,18 +90,53 @@ class EmbeddingService:
     Uses local sentence-transformers model for cost-effective, reliable embeddings.
     """
     
-    def __init__(self, model_name: str = 'all-MiniLM-L6-v2'):
+    def __init__(self, model_name: str = 'all-MiniLM-L6-v2', backend: Optional[str] = None,
+                 storage_dtype: Optional[str] = None):
         """
         Initialize embedding service with specified model.
         
         Args:
             model_name: HuggingFace model name. 'all-MiniLM-L6-v2' is lightweight and effective.
+            backend: "local", "worker" or "hashed"; defaults to EMBEDDING_BACKEND
+            storage_dtype: Corpus embedding precision; defaults to EMBEDDING_STORAGE_DTYPE
         """
         self.model_name = model_name
         self.model = None
+        self.index: Optional[IVFFlatIndex] = None
+        self.backend = backend or EMBEDDING_BACKEND
+        self._worker = None
+        self._hashed = None
+        
+        # Model residency bookkeeping (see maybe_unload)
+        self._model_lock = threading.RLock()
+        self.last_used: Optional[float] = None
+        self._query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.model_stats = {
+            "loads": 0, "unloads": 0, "unloads_idle": 0, "unloads_memory": 0, "unloads_skipped_busy": 0,
+            "last_load_seconds": None, "total_reload_seconds": 0.0,
+            "query_cache_hits": 0, "query_cache_misses": 0
+        }
+        
+        self.storage_dtype = storage_dtype or EMBEDDING_STORAGE_DTYPE
+        if self.storage_dtype not in STORAGE_DTYPES:
+            logger.warning(f"Unknown embedding storage dtype '{self.storage_dtype}' - using float32")
+            self.storage_dtype = "float32"
         
+        if self.backend == "worker":
+            # The model lives in the shared worker process; nothing is loaded here
+            from .embedding_worker import EmbeddingWorkerClient
+            self._worker = EmbeddingWorkerClient()
+            self.available = True
+            logger.info(f"Embedding service using shared worker at {self._worker.address}")
+        elif self.backend == "hashed":
+            # No model to load: vectors come from hashed n-grams fitted on the corpus
+            from .hashed_embeddings import HashedNgramEmbedder
+            self._hashed = HashedNgramEmbedder()
+            self.model_name = self._hashed.name
+            self.available = True
+            logger.info(f"Embedding service using hashed n-gram vectors ({self.model_name})")
         # Check if disabled by env var (for memory constrained environments like Render free tier)
-        if os.getenv("DISABLE_LOCAL_EMBEDDINGS", "false").lower() == "true":
+        elif os.getenv("DISABLE_LOCAL_EMBEDDINGS", "false").lower() == "true":
             logger.warning("Local embeddings disabled via DISABLE_LOCAL_EMBEDDINGS env var")
             self.available = False
         else:
@@ -47,8 +150,10 @@ class EmbeddingService:
         if not EMBEDDINGS_AVAILABLE:
             return
 
-        if self.model is None:
-            self._load_model()
+        with self._model_lock:
+            if self.model is None:
+                self._load_model()
+            self.last_used = time.monotonic()
     
     def _load_model(self) -> None:
         """Load the sentence transformer model."""
@@ -61,12 +166,18 @@ class EmbeddingService:
             from sklearn.metrics.pairwise import cosine_similarity
             
             logger.info(f"Loading embedding model: {self.model_name}")
+            started = time.monotonic()
             self.model = SentenceTransformer(self.model_name)
+            elapsed = time.monotonic() - started
             
             # Monkey patch the similarity function if needed or store it
             self._cosine_similarity = cosine_similarity
             
-            logger.info("Embedding model loaded successfully")
+            if self.model_stats["loads"] > 0:
+                self.model_stats["total_reload_seconds"] += elapsed
+            self.model_stats["loads"] += 1
+            self.model_stats["last_load_seconds"] = round(elapsed, 3)
+            logger.info(f"Embedding model loaded successfully in {elapsed:.2f}s")
         except ImportError as e:
              logger.error(f"Failed to import sentence-transformers: {e}")
              self.available = False
@@ -74,6 +185,83 @@ class EmbeddingService:
             logger.error(f"Failed to load embedding model: {e}")
             self.available = False
             # Don't raise, just disable availability
+    
+    def unload_model(self, reason: str = "manual", wait: bool = True) -> bool:
+        """
+        Drop the transformer model to free memory; the next query reloads it.
+        
+        Args:
+            reason: Why the model is unloaded ("idle", "memory" or "manual"), for stats
+            wait: Block until in-flight encodes finish; otherwise skip when the model is busy
+            
+        Returns:
+            True if a loaded model was released
+        """
+        if not self._model_lock.acquire(blocking=wait):
+            self.model_stats["unloads_skipped_busy"] += 1
+            return False
+        try:
+            if self.model is None:
+                return False
+            self.model = None
+        finally:
+            self._model_lock.release()
+        
+        _release_freed_memory()
+        self.model_stats["unloads"] += 1
+        if f"unloads_{reason}" in self.model_stats:
+            self.model_stats[f"unloads_{reason}"] += 1
+        logger.info(f"Unloaded embedding model ({reason}); RSS now {current_rss_mb() or 0:.0f} MB")
+        return True
+    
+    def maybe_unload(self) -> Optional[str]:
+        """
+        Unload the model if it has been idle too long or the process is over its RSS limit.
+        A model that is encoding right now is left alone until the next check.
+        
+        Returns:
+            The unload reason, or None if the model stays loaded
+        """
+        if self.model is None:
+            return None
+        
+        reason = None
+        if (EMBEDDING_IDLE_UNLOAD_SECONDS > 0 and self.last_used is not None
+                and time.monotonic() - self.last_used > EMBEDDING_IDLE_UNLOAD_SECONDS):
+            reason = "idle"
+        elif EMBEDDING_MAX_RSS_MB > 0 and (current_rss_mb() or 0) > EMBEDDING_MAX_RSS_MB:
+            reason = "memory"
+        
+        if reason and self.unload_model(reason, wait=False):
+            return reason
+        return None
+    
+    async def run_unload_monitor(self, interval: float = EMBEDDING_UNLOAD_CHECK_INTERVAL) -> None:
+        """Periodically apply maybe_unload until cancelled (in a thread: freeing memory takes a while)."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.maybe_unload)
+            except Exception as e:
+                logger.warning(f"Embedding unload check failed: {e}")
+    
+    def stats(self) -> Dict:
+        """Model residency, load/unload counts, reload latency and query-cache counters."""
+        reloads = max(self.model_stats["loads"] - 1, 0)
+        idle = None if self.last_used is None else round(time.monotonic() - self.last_used, 1)
+        return {
+            "backend": self.backend,
+            "model": self.model_name,
+            "model_loaded": self.model is not None,
+            "idle_seconds": idle,
+            "rss_mb": current_rss_mb(),
+            "idle_unload_seconds": EMBEDDING_IDLE_UNLOAD_SECONDS,
+            "max_rss_mb": EMBEDDING_MAX_RSS_MB,
+            **self.model_stats,
+            "mean_reload_seconds": (round(self.model_stats["total_reload_seconds"] / reloads, 3)
+                                    if reloads else None),
+            "query_cache_size": len(self._query_cache)
+        }
 
     
     def generate_embedding(self, text: str) -> np.ndarray:
@@ -93,21 +281,44 @@ class EmbeddingService:
         if not self.available:
             logger.warning("Embeddings not available - returning empty array")
             return np.array([])
-            
-        self._ensure_model_loaded()
-        
-        if not self.model:
-            raise RuntimeError("Embedding model not loaded")
         
         if not text or not text.strip():
             raise ValueError("Text cannot be empty")
         
-        try:
-            embedding = self.model.encode(text.strip())
-            return embedding
-        except Exception as e:
-            logger.error(f"Error generating embedding for text: {e}")
-            raise
+        # Query vectors stay cached while the model is unloaded
+        text = text.strip()
+        cached = self._query_cache.get(text)
+        if cached is not None:
+            self._query_cache.move_to_end(text)
+            self.model_stats["query_cache_hits"] += 1
+            return cached
+        self.model_stats["query_cache_misses"] += 1
+        
+        embedding = self._encode_query(text)
+        if QUERY_EMBEDDING_CACHE_SIZE > 0:
+            self._query_cache[text] = embedding
+            if len(self._query_cache) > QUERY_EMBEDDING_CACHE_SIZE:
+                self._query_cache.popitem(last=False)
+        return embedding
+    
+    def _encode_query(self, text: str) -> np.ndarray:
+        """Embed one stripped text with whichever backend is configured."""
+        if self._worker is not None:
+            return self._worker.embed([text])[0]
+        if self._hashed is not None:
+            return self._hashed.transform([text])[0]
+        
+        with self._model_lock:
+            self._ensure_model_loaded()
+            
+            if not self.model:
+                raise RuntimeError("Embedding model not loaded")
+            
+            try:
+                return self.model.encode(text)
+            except Exception as e:
+                logger.error(f"Error generating embedding for text: {e}")
+                raise
     
     def generate_embeddings_batch(self, texts: List[str]) -> np.ndarray:
         """
@@ -122,11 +333,6 @@ class EmbeddingService:
         if not self.available:
             logger.warning("Embeddings not available - returning empty array")
             return np.array([])
-            
-        self._ensure_model_loaded()
-        
-        if not self.model:
-            raise RuntimeError("Embedding model not loaded")
         
         if not texts:
             return np.array([])
@@ -137,28 +343,57 @@ class EmbeddingService:
         if not valid_texts:
             raise ValueError("No valid texts provided")
         
-        try:
-            embeddings = self.model.encode(valid_texts)
-            return embeddings
-        except Exception as e:
-            logger.error(f"Error generating batch embeddings: {e}")
-            raise
+        if self._worker is not None:
+            return self._worker.embed(valid_texts)
+        if self._hashed is not None:
+            return self._hashed.transform(valid_texts)
+            
+        with self._model_lock:
+            self._ensure_model_loaded()
+            
+            if not self.model:
+                raise RuntimeError("Embedding model not loaded")
+            
+            try:
+                embeddings = self.model.encode(valid_texts)
+                return embeddings
+            except Exception as e:
+                logger.error(f"Error generating batch embeddings: {e}")
+                raise
     
     def compute_similarity(self, query_embedding: np.ndarray, 
-                          doc_embeddings: np.ndarray) -> np.ndarray:
+                          doc_embeddings: CorpusMatrix,
+                          rows: Optional[np.ndarray] = None) -> np.ndarray:
         """
         Compute cosine similarity between query and document embeddings.
         
         Args:
             query_embedding: Single embedding vector (1D array)
-            doc_embeddings: Multiple embedding vectors (2D array)
+            doc_embeddings: Multiple embedding vectors (2D array or QuantizedMatrix)
+            rows: Optional row ids; when given, only those rows are scored (exactly)
             
         Returns:
-            1D array of similarity scores
+            1D array of similarity scores (len(rows) or one per document)
         """
         if not self.available:
             logger.warning("Embeddings not available - returning zero similarities")
             return np.array([])
+        
+        if rows is not None:
+            # Filtered candidate sets are scored exactly; probing buckets could miss them all
+            subset = np.asarray(doc_embeddings[rows], dtype=np.float32)
+            return normalize_rows(subset) @ normalize_rows(query_embedding.reshape(-1))
+        
+        if self._index_covers(doc_embeddings):
+            # Approximate: only rows in the probed buckets get a score, the rest stay 0
+            ids, scores = self.index.score(normalize_rows(query_embedding.reshape(-1)))
+            similarities = np.zeros(doc_embeddings.shape[0], dtype=np.float32)
+            similarities[ids] = scores
+            return similarities
+        
+        if isinstance(doc_embeddings, QuantizedMatrix):
+            # Corpus rows are unit length, so cosine similarity is a plain dot product
+            return doc_embeddings.dot(normalize_rows(query_embedding.reshape(-1)))
             
         try:
             # Ensure query_embedding is 2D for sklearn
@@ -168,8 +403,8 @@ class EmbeddingService:
             if hasattr(self, '_cosine_similarity'):
                 similarities = self._cosine_similarity(query_embedding, doc_embeddings)
             else:
-                 from sklearn.metrics.pairwise import cosine_similarity
-                 similarities = cosine_similarity(query_embedding, doc_embeddings)
+                # No model (and possibly no sklearn) in this process: plain NumPy cosine
+                similarities = normalize_rows(doc_embeddings) @ normalize_rows(query_embedding).T
                  
             return similarities.flatten()
         except Exception as e:
@@ -177,7 +412,7 @@ class EmbeddingService:
             raise
     
     def find_most_similar(self, query_embedding: np.ndarray, 
-                         doc_embeddings: np.ndarray,
+                         doc_embeddings: CorpusMatrix,
                          top_k: int = 3) -> List[Tuple[int, float]]:
         """
         Find indices and scores of most similar documents.
@@ -193,6 +428,9 @@ class EmbeddingService:
         if not self.available:
             logger.warning("Embeddings not available - returning empty results")
             return []
+        
+        if self._index_covers(doc_embeddings):
+            return self.index.search(normalize_rows(query_embedding.reshape(-1)), top_k)
             
         similarities = self.compute_similarity(query_embedding, doc_embeddings)
         
@@ -205,6 +443,234 @@ class EmbeddingService:
         # Return (index, score) pairs
         results = [(int(idx), float(similarities[idx])) for idx in top_indices]
         return results
+    
+    def _index_covers(self, doc_embeddings: CorpusMatrix) -> bool:
+        """Check whether the ANN index was built over exactly this corpus matrix."""
+        return self.index is not None and self.index.vectors is doc_embeddings
+    
+    def _corpus_dir(self, corpus_version: str) -> str:
+        """Directory holding the persisted embeddings for a corpus version and model."""
+        safe_model = self.model_name.replace("/", "_")
+        return os.path.join(EMBEDDING_CACHE_DIR, f"{safe_model}-{corpus_version[:16]}")
+    
+    def _attach_index(self, embeddings: CorpusMatrix, directory: Optional[str] = None,
+                      previous_index: Optional[IVFFlatIndex] = None,
+                      reuse: Optional[np.ndarray] = None) -> None:
+        """
+        Load, patch or build the ANN index for a corpus matrix.
+        Corpora smaller than ANN_MIN_CORPUS_SIZE keep using exact search.
+        
+        Args:
+            embeddings: Normalized corpus matrix
+            directory: Corpus directory to load the index from / persist it to
+            previous_index: Index of the previous corpus version, for incremental updates
+            reuse: Old row id each new row was copied from (-1 for new rows)
+        """
+        self.index = None
+        if not ENABLE_ANN_INDEX or embeddings.shape[0] < ANN_MIN_CORPUS_SIZE:
+            return
+        
+        if directory:
+            self.index = IVFFlatIndex.load(directory, embeddings, nprobe=ANN_NPROBE)
+            if self.index is not None:
+                logger.info(f"Loaded ANN index from {directory}")
+                return
+        
+        if (previous_index is not None and reuse is not None
+                and np.mean(reuse < 0) <= ANN_REBUILD_FRACTION):
+            self.index = previous_index.patched(embeddings, reuse)
+        else:
+            self.index = IVFFlatIndex(nlist=ANN_NLIST, nprobe=ANN_NPROBE).build(embeddings)
+        if directory:
+            try:
+                self.index.save(directory)
+            except OSError as e:
+                logger.warning(f"Failed to persist ANN index: {e}")
+    
+    def _to_storage(self, embeddings: np.ndarray, directory: Optional[str]) -> CorpusMatrix:
+        """Convert normalized float32 embeddings to the configured storage dtype (and persist it)."""
+        if self.storage_dtype == "float32":
+            return embeddings
+        
+        quantized = QuantizedMatrix.quantize(embeddings, self.storage_dtype)
+        if directory:
+            try:
+                quantized.save(directory)
+            except OSError as e:
+                logger.warning(f"Failed to persist {self.storage_dtype} corpus embeddings: {e}")
+        logger.info(f"Storing corpus embeddings as {self.storage_dtype} "
+                    f"({quantized.nbytes / 1e6:.1f} MB vs {embeddings.nbytes / 1e6:.1f} MB float32)")
+        return quantized
+    
+    def load_corpus(self, corpus_version: str) -> Optional[CorpusMatrix]:
+        """
+        Load persisted corpus embeddings (memory-mapped) and their ANN index.
+        
+        Reduced-precision copies are derived from the persisted float32 matrix on
+        first use and persisted alongside it.
+        
+        Args:
+            corpus_version: Fingerprint of the corpus texts (see corpus_fingerprint)
+            
+        Returns:
+            Normalized embedding matrix in the storage dtype, or None if nothing was
+            persisted for this version
+        """
+        if not EMBEDDING_CACHE_DIR:
+            return None
+        
+        directory = self._corpus_dir(corpus_version)
+        path = os.path.join(directory, "embeddings.npy")
+        if not os.path.exists(path):
+            return None
+        
+        try:
+            embeddings = None
+            if self.storage_dtype != "float32":
+                embeddings = QuantizedMatrix.load(directory, self.storage_dtype)
+            if embeddings is None:
+                embeddings = self._to_storage(np.load(path, mmap_mode="r"), directory)
+        except Exception as e:
+            logger.warning(f"Failed to load persisted embeddings from {path}: {e}")
+            return None
+        
+        self._attach_index(embeddings, directory)
+        logger.info(f"Loaded {embeddings.shape[0]} persisted corpus embeddings")
+        return embeddings
+    
+    def save_corpus(self, corpus_version: str, embeddings: np.ndarray,
+                    previous_index: Optional[IVFFlatIndex] = None,
+                    reuse: Optional[np.ndarray] = None) -> CorpusMatrix:
+        """
+        Normalize, index and persist freshly generated corpus embeddings.
+        
+        Args:
+            corpus_version: Fingerprint of the corpus texts (see corpus_fingerprint)
+            embeddings: Raw embedding matrix from generate_embeddings_batch
+            previous_index: ANN index to patch instead of rebuilding (see update_corpus)
+            reuse: Old row id each row was copied from (-1 for newly embedded rows)
+            
+        Returns:
+            Normalized embedding matrix (in the storage dtype) to use for similarity search
+        """
+        embeddings = normalize_rows(embeddings)
+        directory = None
+        
+        if EMBEDDING_CACHE_DIR:
+            directory = self._corpus_dir(corpus_version)
+            try:
+                os.makedirs(directory, exist_ok=True)
+                np.save(os.path.join(directory, "embeddings.npy"), embeddings)
+            except OSError as e:
+                logger.warning(f"Failed to persist corpus embeddings: {e}")
+                directory = None
+        
+        embeddings = self._to_storage(embeddings, directory)
+        self._attach_index(embeddings, directory, previous_index, reuse)
+        return embeddings
+    
+    def update_corpus(self, corpus_version: str, texts: List[str],
+                      previous_texts: Optional[List[str]] = None,
+                      previous_embeddings: Optional[CorpusMatrix] = None) -> Tuple[CorpusMatrix, int]:
+        """
+        Embeddings for an updated corpus, re-encoding only texts that are new.
+        
+        Rows whose text is unchanged are copied from the previous matrix (matched by
+        content, so reordering costs nothing), removed rows are dropped, and the ANN
+        index is patched rather than retrained.
+        
+        Args:
+            corpus_version: Fingerprint of the updated corpus texts
+            texts: Updated corpus texts
+            previous_texts: Texts of the corpus currently in memory
+            previous_embeddings: Its embedding matrix (rows aligned with previous_texts)
+            
+        Returns:
+            (normalized embedding matrix, number of texts that were embedded)
+        """
+        # Hashed vectors depend on corpus-wide IDF: fit on these texts even when the
+        # matrix is persisted (queries must use the transform the corpus was encoded with)
+        if self._hashed is not None:
+            self._fit_hashed(texts)
+        
+        persisted = self.load_corpus(corpus_version)
+        if persisted is not None:
+            return persisted, 0
+        
+        # ... and every hashed row changes with the corpus, so nothing can be reused
+        if self._hashed is not None:
+            return self.save_corpus(corpus_version, self.generate_embeddings_batch(texts)), len(texts)
+        if previous_embeddings is None or not previous_texts:
+            return self.prepare_corpus(corpus_version, texts), len(texts)
+        
+        previous_rows = {text: i for i, text in enumerate(previous_texts)}
+        reuse = np.array([previous_rows.get(text, -1) for text in texts], dtype=np.int64)
+        fresh = np.flatnonzero(reuse < 0)
+        if fresh.size == len(texts):
+            return self.prepare_corpus(corpus_version, texts), len(texts)
+        
+        kept = np.flatnonzero(reuse >= 0)
+        matrix = np.empty((len(texts), previous_embeddings.shape[1]), dtype=np.float32)
+        matrix[kept] = np.asarray(previous_embeddings[reuse[kept]], dtype=np.float32)
+        if fresh.size:
+            matrix[fresh] = normalize_rows(self.generate_embeddings_batch([texts[i] for i in fresh]))
+        
+        logger.info(f"Incremental corpus update: {kept.size} rows reused, {fresh.size} embedded, "
+                    f"{len(previous_texts) - len(set(reuse[kept].tolist()))} dropped")
+        return self.save_corpus(corpus_version, matrix, self.index, reuse), int(fresh.size)
+    
+    def _fit_hashed(self, texts: List[str]) -> None:
+        self._hashed.fit(texts)
+        self._query_cache.clear()  # cached query vectors used the previous IDF
+    
+    def prepare_corpus(self, corpus_version: str, texts: List[str]) -> CorpusMatrix:
+        """
+        Get normalized, indexed corpus embeddings for a corpus version.
+        
+        Persisted embeddings are reused when present. In worker mode the shared worker
+        embeds and persists the corpus, and this process only memory-maps the result.
+        In hashed mode the vectorizer is (re)fitted on the texts first, since query
+        vectors depend on the corpus IDF statistics.
+        
+        Args:
+            corpus_version: Fingerprint of the corpus texts (see corpus_fingerprint)
+            texts: Corpus texts, used when embeddings must be generated
+            
+        Returns:
+            Normalized embedding matrix
+        """
+        if self._hashed is not None:
+            self._fit_hashed(texts)
+        
+        embeddings = self.load_corpus(corpus_version)
+        if embeddings is not None:
+            return embeddings
+        
+        if self._worker is not None and EMBEDDING_CACHE_DIR:
+            self._worker.build_corpus(corpus_version, texts)
+            embeddings = self.load_corpus(corpus_version)
+            if embeddings is not None:
+                return embeddings
+            logger.warning("Worker-built corpus not found in EMBEDDING_CACHE_DIR - embedding over IPC")
+        
+        return self.save_corpus(corpus_version, self.generate_embeddings_batch(texts))
+
+
+def corpus_fingerprint(texts: List[str]) -> str:
+    """
+    Stable content hash of the corpus texts, used as the corpus version.
+    
+    Args:
+        texts: Intervention texts in corpus order
+        
+    Returns:
+        Hex digest identifying this exact corpus
+    """
+    digest = hashlib.sha256()
+    for text in texts:
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
 
 
 def create_intervention_text(intervention: Dict) -> str:
@@ -4,16 +4,106 @@ Combines vector similarity search with keyword matching for optimal results.
 """
 
 import asyncio
+import hashlib
+import json
+import os
 import httpx
 import numpy as np
-from typing import List, Dict, Tuple, Optional
+from typing import Callable, List, Dict, Tuple, Optional
 import logging
 from datetime import datetime, timedelta
 
-from .embeddings import EmbeddingService, create_intervention_text
+from .embeddings import EmbeddingService, create_intervention_text, corpus_fingerprint
+from .bm25 import BM25Index, tokenize
+from .facet_index import FacetIndex
+from .recommendation_table import RecommendationTable
 
 logger = logging.getLogger(__name__)
 
+# Interventions source: S3 URL by default, or a local JSON file path
+INTERVENTIONS_URL = os.getenv(
+    "INTERVENTIONS_URL",
+    "https://geo-risk-spotspot-geojson.s3.us-east-1.amazonaws.com/interventions/interventions-db.json"
+)
+
+# Results below this hybrid score are not returned
+MIN_RELEVANCE_SCORE = 0.1
+# BM25 score that maps to a keyword score of 0.5 (keyword = s / (s + k)); about one
+# query term matched in a document's health issues and title on the published corpus
+KEYWORD_SCORE_SATURATION = float(os.getenv("KEYWORD_SCORE_SATURATION", "4.0"))
+
+
+def intervention_key(intervention: Dict) -> str:
+    """Stable identity of an intervention: its `id`, or a content hash for id-less entries."""
+    if intervention.get("id") not in (None, ""):
+        return str(intervention["id"])
+    return "sha1:" + content_hash(intervention)
+
+
+def content_hash(intervention: Dict) -> str:
+    """Hash of an intervention's full content (key order independent)."""
+    payload = json.dumps(intervention, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def diff_corpus(previous: List[Dict], current: List[Dict]) -> Dict[str, int]:
+    """Count added / changed / removed / unchanged interventions between two corpus versions."""
+    before = {intervention_key(i): content_hash(i) for i in previous}
+    after = {intervention_key(i): content_hash(i) for i in current}
+    common = before.keys() & after.keys()
+    changed = sum(1 for k in common if before[k] != after[k])
+    return {
+        "added": len(after.keys() - before.keys()),
+        "changed": changed,
+        "removed": len(before.keys() - after.keys()),
+        "unchanged": len(common) - changed,
+    }
+
+
+def generate_smart_query(health_data: dict) -> str:
+    """
+    Generate an intelligent query from health data for vector similarity matching.
+    This enables meaningful "Health Context Match" scores when no explicit query is provided.
+    """
+    query_terms = []
+    
+    # Analyze health data and build contextual query
+    diabetes_rate = health_data.get('DIABETES_CrudePrev', 0)
+    obesity_rate = health_data.get('OBESITY_CrudePrev', 0)
+    inactivity_rate = health_data.get('LPA_CrudePrev', 0)
+    smoking_rate = health_data.get('CSMOKING_CrudePrev', 0)
+    hypertension_rate = health_data.get('BPHIGH_CrudePrev', 0)
+    food_insecurity_rate = health_data.get('FOODINSECU_CrudePrev', 0)
+    healthcare_access_rate = health_data.get('ACCESS2_CrudePrev', 0)
+    
+    # Priority health issues based on rates
+    if diabetes_rate > 15:
+        query_terms.append("diabetes prevention blood sugar glucose management")
+    if obesity_rate > 25:
+        query_terms.append("obesity weight management BMI reduction")
+    if inactivity_rate > 20:
+        query_terms.append("physical activity exercise fitness walking")
+    if smoking_rate > 15:
+        query_terms.append("smoking cessation tobacco quit")
+    if hypertension_rate > 30:
+        query_terms.append("blood pressure hypertension cardiovascular")
+    if food_insecurity_rate > 10:
+        query_terms.append("food security nutrition access healthy eating")
+    if healthcare_access_rate > 15:
+        query_terms.append("healthcare access mobile health services")
+    
+    # Add general health promotion terms
+    query_terms.append("community health chronic disease prevention")
+    
+    # Create coherent query
+    smart_query = " ".join(query_terms)
+    
+    # If no specific health issues, use general diabetes prevention query
+    if not query_terms or smart_query.strip() == "community health chronic disease prevention":
+        smart_query = "diabetes prevention community health chronic disease management"
+    
+    return smart_query
+
 
 class EnhancedInterventionService:
     """
@@ -26,23 +116,37 @@ class EnhancedInterventionService:
         self.intervention_cache = {
             "data": None,
             "embeddings": None,
+            "corpus_version": None,
+            "texts": None,
             "timestamp": None,
             "max_age": 1800  # 30 minutes
         }
-        self.s3_url = "https://geo-risk-spotspot-geojson.s3.us-east-1.amazonaws.com/interventions/interventions-db.json"
+        self.s3_url = INTERVENTIONS_URL
+        self.recommendation_table: Optional[RecommendationTable] = None
+        self._bm25_index: Optional[BM25Index] = None
+        self.facet_index = FacetIndex()
+        # Curator edits pushed through apply_delta, re-applied on top of each S3 refresh
+        # until the published file catches up with them
+        self._delta_upserts: Dict[str, Dict] = {}
+        self._delta_deletes: set = set()
+        self._corpus_lock = asyncio.Lock()
     
     async def _fetch_interventions_from_s3(self) -> List[Dict]:
-        """Fetch interventions from S3 storage."""
+        """Fetch interventions from S3 storage (or a local file for offline builds)."""
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(self.s3_url)
-                response.raise_for_status()
-                
-                data = response.json()
-                interventions = data.get("interventions", [])
-                logger.info(f"Fetched {len(interventions)} interventions from S3")
-                return interventions
-                
+            if self.s3_url.startswith(("http://", "https://")):
+                async with httpx.AsyncClient(timeout=30.0) as client:
+                    response = await client.get(self.s3_url)
+                    response.raise_for_status()
+                    data = response.json()
+            else:
+                with open(self.s3_url, "r") as f:
+                    data = json.load(f)
+            
+            interventions = data.get("interventions", [])
+            logger.info(f"Fetched {len(interventions)} interventions from {self.s3_url}")
+            return interventions
+            
         except Exception as e:
             logger.error(f"Failed to fetch interventions from S3: {e}")
             return []
@@ -60,36 +164,164 @@ class EnhancedInterventionService:
             interventions = await self._fetch_interventions_from_s3()
             
             if interventions:
-                # Try to generate embeddings for all interventions
-                intervention_texts = [
-                    create_intervention_text(intervention) 
-                    for intervention in interventions
-                ]
-                
-                embeddings = None
-                if self.embedding_service.available:
-                    try:
-                        embeddings = self.embedding_service.generate_embeddings_batch(intervention_texts)
-                        logger.info(f"Generated embeddings for {len(interventions)} interventions")
-                    except Exception as e:
-                        logger.error(f"Failed to generate embeddings: {e}")
-                        embeddings = None
-                else:
-                    logger.warning("Embedding service not available - using keyword-only matching")
-                
-                self.intervention_cache.update({
-                    "data": interventions,
-                    "embeddings": embeddings,
-                    "timestamp": now
-                })
-                
-                logger.info(f"Cache updated with {len(interventions)} interventions" + 
-                           (" and embeddings" if embeddings is not None else " (no embeddings)"))
+                # Overlay inside the corpus lock, so a delta applied meanwhile is not lost
+                await self._apply_corpus(lambda current: self._apply_overlay(interventions), now)
             else:
                 logger.error("No interventions fetched - cache not updated")
     
+    def _apply_overlay(self, interventions: List[Dict]) -> List[Dict]:
+        """Layer pending curator deltas over a fresh S3 corpus, retiring those S3 now reflects."""
+        if not self._delta_upserts and not self._delta_deletes:
+            return interventions
+        
+        published = {intervention_key(i): content_hash(i) for i in interventions}
+        for key in [k for k, item in self._delta_upserts.items() if published.get(k) == content_hash(item)]:
+            del self._delta_upserts[key]
+        self._delta_deletes &= published.keys()
+        
+        merged = [self._delta_upserts.get(intervention_key(i), i) for i in interventions
+                  if intervention_key(i) not in self._delta_deletes]
+        known = {intervention_key(i) for i in interventions}
+        merged.extend(item for key, item in self._delta_upserts.items() if key not in known)
+        return merged
+    
+    async def _apply_corpus(self, update: Callable[[List[Dict]], List[Dict]], now: datetime) -> Dict[str, int]:
+        """
+        Install a new corpus version, re-embedding and re-tokenizing only what changed.
+        
+        The embedding and index work runs in a thread (it may block on the model or
+        the embedding worker for a long time); the result is installed on the event
+        loop in one step. Requests read it through corpus_snapshot, so one that awaits
+        mid-way keeps scoring against the corpus it started with.
+        
+        Args:
+            update: Returns the complete new intervention list given the installed one;
+                    called under the corpus lock, so concurrent updates build on each other
+            now: Refresh timestamp to record
+            
+        Returns:
+            Diff summary against the previous corpus (see diff_corpus)
+        """
+        async with self._corpus_lock:
+            interventions = update(self.intervention_cache.get("data") or [])
+            built = await asyncio.to_thread(self._build_corpus, interventions)
+            summary = built.pop("summary")
+            self._bm25_index = built.pop("bm25_index")
+            self.facet_index = built.pop("facet_index")
+            self.intervention_cache.update({**built, "timestamp": now})
+        
+        logger.info(f"Cache updated with {len(interventions)} interventions" +
+                    (" and embeddings" if built["embeddings"] is not None else " (no embeddings)"),
+                    extra={"corpus_version": built["corpus_version"][:16], **summary})
+        return summary
+    
+    def _build_corpus(self, interventions: List[Dict]) -> Dict:
+        """Embeddings, lexical and facet indexes for a corpus (blocking; see _apply_corpus)."""
+        previous = self.intervention_cache.get("data") or []
+        previous_texts = self.intervention_cache.get("texts")
+        previous_embeddings = self.intervention_cache.get("embeddings")
+        summary = diff_corpus(previous, interventions)
+        
+        intervention_texts = [create_intervention_text(intervention) for intervention in interventions]
+        corpus_version = corpus_fingerprint(intervention_texts)
+        
+        embeddings = None
+        embedded = 0
+        if self.embedding_service.available:
+            # Reuses persisted embeddings (and ANN index) when the corpus is unchanged,
+            # otherwise only encodes texts that are not in the previous corpus
+            try:
+                embeddings, embedded = self.embedding_service.update_corpus(
+                    corpus_version, intervention_texts, previous_texts, previous_embeddings
+                )
+                logger.info(f"Prepared embeddings for {len(interventions)} interventions ({embedded} encoded)")
+            except Exception as e:
+                logger.error(f"Failed to generate embeddings: {e}")
+                embeddings = None
+        else:
+            logger.warning("Embedding service not available - using keyword-only matching")
+        
+        # Lexical term statistics: reuse the token counts of unchanged documents
+        if self._bm25_index is not None and previous_texts and len(previous_texts) == self._bm25_index.num_docs:
+            previous_rows = {text: i for i, text in enumerate(previous_texts)}
+            reuse = np.array([previous_rows.get(text, -1) for text in intervention_texts], dtype=np.int64)
+            bm25_index = self._bm25_index.patched(interventions, reuse)
+        else:
+            bm25_index = BM25Index().build(interventions)
+        
+        summary["embedded"] = embedded
+        return {
+            "data": interventions,
+            "embeddings": embeddings,
+            "corpus_version": corpus_version,
+            "texts": intervention_texts,
+            "bm25_index": bm25_index,
+            "facet_index": FacetIndex().build(interventions),
+            "summary": summary,
+        }
+    
+    def corpus_snapshot(self) -> Dict:
+        """The installed corpus with its embeddings and indexes, as one consistent view."""
+        return {
+            "data": self.intervention_cache.get("data") or [],
+            "embeddings": self.intervention_cache.get("embeddings"),
+            "corpus_version": self.intervention_cache.get("corpus_version"),
+            "bm25_index": self._bm25_index,
+            "facet_index": self.facet_index,
+        }
+    
+    async def apply_delta(self, upserts: List[Dict], deletes: List[str]) -> Dict:
+        """
+        Apply a curator edit to the live corpus without a full reload.
+        
+        Upserts replace the intervention with the same `id` (or are appended); deletes
+        remove interventions by `id`. The delta is kept and re-applied over later S3
+        refreshes until the published file contains the same edits.
+        
+        Args:
+            upserts: Complete intervention objects to add or replace
+            deletes: Ids of interventions to remove
+            
+        Returns:
+            Diff summary plus the new corpus version and size
+            
+        Raises:
+            RuntimeError: If the base corpus could not be loaded
+        """
+        await self._ensure_cache_valid()
+        if not self.intervention_cache.get("data"):
+            raise RuntimeError("Intervention corpus is not loaded")
+        
+        for item in upserts:
+            key = intervention_key(item)
+            self._delta_upserts[key] = item
+            self._delta_deletes.discard(key)
+        for key in map(str, deletes):
+            self._delta_upserts.pop(key, None)
+            self._delta_deletes.add(key)
+        
+        deleted = set(map(str, deletes))
+        
+        def updated(current: List[Dict]) -> List[Dict]:
+            upserted = {intervention_key(item): item for item in upserts}
+            result = [upserted.pop(intervention_key(i), i) for i in current
+                      if intervention_key(i) not in deleted]
+            result.extend(upserted.values())
+            return result
+        
+        # Keep the S3 refresh schedule: the delta does not count as a fresh fetch
+        timestamp = self.intervention_cache.get("timestamp") or datetime.now()
+        summary = await self._apply_corpus(updated, timestamp)
+        return {
+            **summary,
+            "corpus_version": self.intervention_cache["corpus_version"],
+            "total": len(self.intervention_cache["data"]),
+            "pending_overlay": len(self._delta_upserts) + len(self._delta_deletes),
+        }
+    
     def _get_keyword_scores(self, interventions: List[Dict], health_data: dict, 
-                           query: str = "") -> np.ndarray:
+                           query: str = "", candidates: Optional[np.ndarray] = None,
+                           snapshot: Optional[Dict] = None) -> np.ndarray:
         """
         Calculate keyword-based scores for interventions based on health profile.
         
@@ -97,9 +329,11 @@ class EnhancedInterventionService:
             interventions: List of intervention dictionaries
             health_data: Health statistics for the area
             query: Optional query string
+            candidates: Cached-corpus row ids that `interventions` were taken from
+            snapshot: Corpus snapshot `candidates` refer to (default: the installed corpus)
             
         Returns:
-            Array of keyword scores (0-1 range)
+            Array of BM25 keyword scores, saturated to the 0-1 range
         """
         # Build risk keywords based on health data
         risk_keywords = []
@@ -119,43 +353,25 @@ class EnhancedInterventionService:
         if health_data.get('ACCESS2_CrudePrev', 0) > 15:
             risk_keywords.extend(['healthcare', 'access', 'mobile'])
         
-        # Add query-based keywords
+        # Add query-based keywords (tokenized like the corpus, stopwords dropped)
+        query_terms = [term for keyword in risk_keywords for term in tokenize(keyword)]
         if query:
-            query_words = [word.lower().strip() for word in query.split() if len(word) > 3]
-            risk_keywords.extend(query_words)
+            query_terms.extend(tokenize(query))
         
-        # Score each intervention
-        scores = []
-        for intervention in interventions:
-            score = 0.0
-            
-            # Check health issues (high weight)
-            health_issues = intervention.get("health_issues", [])
-            if isinstance(health_issues, list):
-                for issue in health_issues:
-                    if any(keyword in issue.lower() for keyword in risk_keywords):
-                        score += 0.4
-            
-            # Check keywords (medium weight)
-            keywords = intervention.get("keywords", [])
-            if isinstance(keywords, list):
-                for keyword in keywords:
-                    if keyword.lower() in risk_keywords:
-                        score += 0.2
-            
-            # Check title and description (medium weight)
-            title = intervention.get("title", "").lower()
-            description = intervention.get("description", "").lower()
-            
-            for keyword in risk_keywords:
-                if keyword in title:
-                    score += 0.3
-                if keyword in description:
-                    score += 0.1
-            
-            scores.append(min(score, 1.0))  # Cap at 1.0
+        # BM25 over the precomputed index; ad-hoc lists get a throwaway index
+        snapshot = snapshot or self.corpus_snapshot()
+        index = snapshot["bm25_index"]
+        if candidates is not None and index is not None:
+            scores = index.score(query_terms, candidates)
+        else:
+            if index is None or interventions is not snapshot["data"]:
+                index = BM25Index().build(interventions)
+            scores = index.score(query_terms)
         
-        return np.array(scores)
+        # Map to the 0-1 range expected by the hybrid weights with a fixed saturation
+        # (not the per-query maximum), so a weak best match stays a weak keyword score
+        # and MIN_RELEVANCE_SCORE keeps the same meaning for every query
+        return scores / (scores + KEYWORD_SCORE_SATURATION)
     
     def _get_health_context_scores(self, interventions: List[Dict], 
                                   health_data: dict) -> np.ndarray:
@@ -199,39 +415,45 @@ class EnhancedInterventionService:
         
         return np.array(scores)
     
-    async def get_enhanced_recommendations(self, health_data: dict, query: str = "", 
-                                         max_results: int = 3) -> List[Dict]:
+    def score_interventions(self, health_data: dict, query: str = "",
+                            candidates: Optional[np.ndarray] = None,
+                            query_embedding: Optional[np.ndarray] = None,
+                            snapshot: Optional[Dict] = None) -> Dict[str, np.ndarray]:
         """
-        Get intervention recommendations using hybrid search algorithm.
+        Score cached interventions with the hybrid algorithm.
+        Assumes the intervention cache is already valid.
         
         Args:
             health_data: Health statistics for the area
             query: Optional search query
-            max_results: Maximum number of results to return
+            candidates: Optional row ids (e.g. from the facet index); only these are scored
+            query_embedding: Precomputed embedding of `query` (computed here when omitted)
+            snapshot: Corpus snapshot to score (default: the installed corpus)
             
         Returns:
-            List of recommended interventions with relevance scores
+            Dict of score arrays: "combined", "vector", "keyword" and "context",
+            aligned with candidates when given, otherwise with the whole corpus
         """
-        await self._ensure_cache_valid()
-        
-        interventions = self.intervention_cache.get("data", [])
-        embeddings = self.intervention_cache.get("embeddings")
-        
-        if not interventions:
-            logger.warning("No interventions available")
-            return []
+        snapshot = snapshot or self.corpus_snapshot()
+        interventions = snapshot["data"]
+        embeddings = snapshot["embeddings"]
+        if candidates is not None:
+            interventions = [interventions[i] for i in candidates]
         
         # Initialize scores
         vector_scores = np.zeros(len(interventions))
-        keyword_scores = self._get_keyword_scores(interventions, health_data, query)
+        keyword_scores = self._get_keyword_scores(interventions, health_data, query, candidates, snapshot)
         context_scores = self._get_health_context_scores(interventions, health_data)
         
         # Calculate vector similarity scores if embeddings available and query provided
         if embeddings is not None and query and self.embedding_service.available:
             try:
-                query_embedding = self.embedding_service.generate_embedding(query)
+                if query_embedding is None:
+                    query_embedding = self.embedding_service.generate_embedding(query)
                 if query_embedding.size > 0:
-                    similarities = self.embedding_service.compute_similarity(query_embedding, embeddings)
+                    similarities = self.embedding_service.compute_similarity(
+                        query_embedding, embeddings, candidates
+                    )
                     vector_scores = similarities
                     logger.info("Using vector similarity scores")
                 else:
@@ -249,27 +471,181 @@ class EnhancedInterventionService:
             # Without embeddings or query: keyword + context only
             combined_scores = 0.7 * keyword_scores + 0.3 * context_scores
         
-        # Get top interventions
-        top_indices = np.argsort(combined_scores)[::-1][:max_results]
+        if embeddings is None or not self.embedding_service.available:
+            vector_scores = np.zeros(len(interventions))
         
-        # Filter out very low scores
-        min_score_threshold = 0.1
-        filtered_indices = [idx for idx in top_indices 
-                          if combined_scores[idx] >= min_score_threshold]
+        return {
+            "combined": combined_scores,
+            "vector": vector_scores,
+            "keyword": keyword_scores,
+            "context": context_scores
+        }
+    
+    def intent_signature(self, query: str) -> str:
+        """
+        Canonical form of a free-text query: its distinct corpus-vocabulary terms, sorted.
         
-        # Build results with scores
+        Messages that differ only in wording outside the corpus vocabulary (filler,
+        stopwords, word order) share a signature. Assumes the intervention cache is valid.
+        """
+        vocabulary = self._bm25_index.vocabulary if self._bm25_index is not None else {}
+        return " ".join(sorted({term for term in tokenize(query) if term in vocabulary}))
+    
+    def scoring_model(self) -> str:
+        """Identifies how vector scores are produced, so precomputed rankings are never mixed across models."""
+        if self.intervention_cache.get("embeddings") is None or not self.embedding_service.available:
+            return "keyword-only"
+        return self.embedding_service.model_name
+    
+    def _build_results(self, indices, combined, vector, keyword, context,
+                       snapshot: Optional[Dict] = None) -> List[Dict]:
+        """Copy the selected interventions (rows of `snapshot`) and attach their score breakdown."""
+        interventions = (snapshot or self.corpus_snapshot())["data"]
         results = []
-        for idx in filtered_indices:
+        for idx, relevance, vector_score, keyword_score, context_score in zip(
+                indices, combined, vector, keyword, context):
             intervention = interventions[idx].copy()
-            intervention['_relevance_score'] = float(combined_scores[idx])
-            intervention['_vector_score'] = float(vector_scores[idx]) if (embeddings is not None and self.embedding_service.available) else 0.0
-            intervention['_keyword_score'] = float(keyword_scores[idx])
-            intervention['_context_score'] = float(context_scores[idx])
+            intervention['_relevance_score'] = float(relevance)
+            intervention['_vector_score'] = float(vector_score)
+            intervention['_keyword_score'] = float(keyword_score)
+            intervention['_context_score'] = float(context_score)
             results.append(intervention)
+        return results
+    
+    async def get_enhanced_recommendations(self, health_data: dict, query: str = "", 
+                                         max_results: int = 3,
+                                         filters: Optional[Dict[str, List[str]]] = None) -> List[Dict]:
+        """
+        Get intervention recommendations using hybrid search algorithm.
+        
+        Args:
+            health_data: Health statistics for the area
+            query: Optional search query
+            max_results: Maximum number of results to return
+            filters: Optional facet filters, e.g. {"implementation_cost": ["low"]};
+                     values within a facet are ORed, facets are ANDed
+            
+        Returns:
+            List of recommended interventions with relevance scores
+            
+        Raises:
+            ValueError: If a filter names a field that is not a facet
+        """
+        await self._ensure_cache_valid()
+        
+        # A corpus installed while this request awaits the query embedding must not
+        # be mixed with row ids taken from the one it started with
+        snapshot = self.corpus_snapshot()
+        if not snapshot["data"]:
+            logger.warning("No interventions available")
+            return []
+        
+        candidates = snapshot["facet_index"].candidates(filters)
+        if candidates is not None and candidates.size == 0:
+            logger.info("No interventions match the facet filters", extra={"filters": filters})
+            return []
+        
+        query_embedding = None
+        if query and snapshot["embeddings"] is not None and self.embedding_service.available:
+            # Encoding (or the embedding worker round trip) blocks; keep it off the event loop
+            try:
+                query_embedding = await asyncio.to_thread(self.embedding_service.generate_embedding, query)
+            except Exception as e:
+                logger.warning(f"Query embedding failed, using keyword-only: {e}")
+                query_embedding = np.zeros(0, dtype=np.float32)
+        scores = self.score_interventions(health_data, query, candidates, query_embedding, snapshot)
+        combined_scores = scores["combined"]
+        
+        # Get top interventions
+        top_indices = np.argsort(combined_scores, kind="stable")[::-1][:max_results]
+        
+        # Filter out very low scores
+        filtered_indices = [idx for idx in top_indices 
+                          if combined_scores[idx] >= MIN_RELEVANCE_SCORE]
+        
+        # Build results with scores (positions map back to corpus rows when filtered)
+        results = self._build_results(
+            filtered_indices if candidates is None else candidates[filtered_indices],
+            combined_scores[filtered_indices],
+            scores["vector"][filtered_indices],
+            scores["keyword"][filtered_indices],
+            scores["context"][filtered_indices],
+            snapshot
+        )
         
         logger.info(f"Returning {len(results)} interventions with hybrid scoring")
         return results
     
+    async def get_precomputed_recommendations(self, health_data: dict,
+                                              max_results: int = 3,
+                                              filters: Optional[Dict[str, List[str]]] = None,
+                                              table_source=None) -> Optional[List[Dict]]:
+        """
+        Serve recommendations from the offline per-ZIP table when it is fresh.
+        
+        The table is only used when it was built for the current corpus version and
+        embedding model, and from the same health metrics the caller sent. With facet
+        filters, the stored ranking is filtered and used only if enough rows survive.
+        
+        Args:
+            health_data: Health statistics for the area (must include zip_code)
+            max_results: Maximum number of results to return
+            filters: Optional facet filters (see get_enhanced_recommendations)
+            table_source: Region data source providing the region's table via
+                          recommendation_table(corpus_version, model); default table otherwise
+            
+        Returns:
+            Recommendations in the same shape as get_enhanced_recommendations,
+            or None when the caller should fall back to live scoring
+        """
+        await self._ensure_cache_valid()
+        
+        snapshot = self.corpus_snapshot()
+        corpus_version = snapshot["corpus_version"]
+        if not corpus_version or not snapshot["data"]:
+            return None
+        
+        scoring_model = self.scoring_model()
+        if table_source is not None:
+            table = table_source.recommendation_table(corpus_version, scoring_model)
+        else:
+            table = self.recommendation_table
+            if table is None or not table.matches(corpus_version, scoring_model):
+                table = RecommendationTable.load_for(corpus_version, scoring_model)
+                self.recommendation_table = table
+        if table is None:
+            return None
+        
+        row = table.lookup(str(health_data.get("zip_code", "")), health_data)
+        if row is None:
+            return None
+        
+        indices, scores = row
+        keep = (indices >= 0) & (scores[:, 0] >= MIN_RELEVANCE_SCORE)
+        facet_index = snapshot["facet_index"]
+        bits = facet_index.mask(filters)
+        if bits is not None:
+            keep &= np.unpackbits(bits, count=facet_index.num_docs).astype(bool)[np.maximum(indices, 0)]
+            if keep.sum() < max_results:
+                return None
+        indices, scores = indices[keep][:max_results], scores[keep][:max_results]
+        return self._build_results(indices, scores[:, 0], scores[:, 1], scores[:, 2], scores[:, 3], snapshot)
+    
+    async def get_facet_counts(self, filters: Optional[Dict[str, List[str]]] = None) -> Dict:
+        """
+        Facet value counts for building filter UIs, optionally within a filtered set.
+        
+        Args:
+            filters: Optional facet filters (see get_enhanced_recommendations)
+            
+        Returns:
+            {"total": matching interventions, "facets": field -> {value: count}}
+        """
+        await self._ensure_cache_valid()
+        candidates = self.facet_index.candidates(filters)
+        total = self.facet_index.num_docs if candidates is None else int(candidates.size)
+        return {"total": total, "facets": self.facet_index.counts(candidates)}
+    
     async def get_fallback_recommendations(self, health_data: dict, 
                                          max_results: int = 3) -> List[Dict]:
         """
@@ -0,0 +1,145 @@
+"""
+Bitmap facet index for filtered intervention retrieval.
+Each facet value owns a packed bitset over corpus rows, so a filter such as
+"low cost, high evidence, school setting" is a handful of bitwise ANDs/ORs
+that yields the candidate rows before any scoring runs.
+"""
+
+import logging
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FACET_FIELDS = ("category", "setting", "target_population", "implementation_cost", "evidence_level")
+
+# Compound values like "healthcare_community" or "schools, workplaces" also match each part
+_PART_SEPARATORS = re.compile(r"[,;/_]|\band\b")
+
+
+def normalize_facet_value(value) -> str:
+    """Case- and punctuation-insensitive form of a facet value ("Disease Management" -> "disease_management")."""
+    return "_".join(re.findall(r"[a-z0-9]+", str(value).lower()))
+
+
+def facet_values(value) -> List[str]:
+    """All normalized values a raw field matches: the whole value plus its compound parts."""
+    raw_values = value if isinstance(value, list) else [value]
+    values = []
+    for raw in raw_values:
+        if raw in (None, ""):
+            continue
+        whole = normalize_facet_value(raw)
+        if whole:
+            values.append(whole)
+        parts = [normalize_facet_value(p) for p in _PART_SEPARATORS.split(str(raw).lower())]
+        if len(parts) > 1:
+            values.extend(p for p in parts if p and p != whole)
+    return list(dict.fromkeys(values))
+
+
+class FacetIndex:
+    """Packed per-value bitsets over the intervention corpus for each facet field."""
+
+    def __init__(self, fields: Iterable[str] = FACET_FIELDS):
+        self.fields = tuple(fields)
+        self.bitsets: Dict[str, Dict[str, np.ndarray]] = {}
+        self.num_docs = 0
+
+    def build(self, interventions: List[Dict]) -> "FacetIndex":
+        """
+        Index facet values of every intervention.
+
+        Args:
+            interventions: Intervention dictionaries in corpus order
+
+        Returns:
+            self, for chaining
+        """
+        n = len(interventions)
+        bitsets = {}
+        for field in self.fields:
+            rows = defaultdict(list)
+            for doc_id, intervention in enumerate(interventions):
+                for value in facet_values(intervention.get(field)):
+                    rows[value].append(doc_id)
+            bitsets[field] = {value: self._pack(ids, n) for value, ids in rows.items()}
+
+        self.bitsets = bitsets
+        self.num_docs = n
+        logger.info(f"Built facet index: {n} documents, "
+                    f"{sum(len(v) for v in bitsets.values())} facet values")
+        return self
+
+    @staticmethod
+    def _pack(doc_ids: List[int], n: int) -> np.ndarray:
+        mask = np.zeros(n, dtype=bool)
+        mask[doc_ids] = True
+        return np.packbits(mask)
+
+    def validate(self, filters: Dict[str, List[str]]) -> None:
+        """Raise ValueError for filters on fields that are not indexed."""
+        unknown = sorted(set(filters) - set(self.fields))
+        if unknown:
+            raise ValueError(f"Unknown facet(s): {', '.join(unknown)} (choose from {', '.join(self.fields)})")
+
+    def mask(self, filters: Optional[Dict[str, List[str]]]) -> Optional[np.ndarray]:
+        """
+        Packed bitset of rows matching the filters.
+        Values within a facet are ORed; facets are ANDed. Empty filters match everything.
+
+        Args:
+            filters: Facet field -> accepted values (raw or normalized)
+
+        Returns:
+            Packed uint8 bitset, or None when no filter is active
+        """
+        active = {field: values for field, values in (filters or {}).items() if values}
+        if not active:
+            return None
+        self.validate(active)
+
+        empty = np.zeros((self.num_docs + 7) // 8, dtype=np.uint8)
+        combined = None
+        for field, values in active.items():
+            field_bits = empty
+            for value in values:
+                bits = self.bitsets[field].get(normalize_facet_value(value))
+                if bits is not None:
+                    field_bits = field_bits | bits
+            combined = field_bits if combined is None else combined & field_bits
+        return combined
+
+    def candidates(self, filters: Optional[Dict[str, List[str]]]) -> Optional[np.ndarray]:
+        """Sorted row ids matching the filters, or None when no filter is active."""
+        bits = self.mask(filters)
+        if bits is None:
+            return None
+        return np.flatnonzero(np.unpackbits(bits, count=self.num_docs))
+
+    def counts(self, candidates: Optional[np.ndarray] = None) -> Dict[str, Dict[str, int]]:
+        """
+        Number of interventions per facet value, optionally within a candidate set.
+
+        Args:
+            candidates: Row ids to count over (defaults to the whole corpus)
+
+        Returns:
+            Facet field -> {value: count}, values sorted by descending count
+        """
+        within = None
+        if candidates is not None:
+            within = self._pack(candidates, self.num_docs)
+        counts = {}
+        for field, values in self.bitsets.items():
+            field_counts = {}
+            for value, bits in values.items():
+                count = int(np.unpackbits(bits if within is None else bits & within,
+                                          count=self.num_docs).sum())
+                if count:
+                    field_counts[value] = count
+            counts[field] = dict(sorted(field_counts.items(), key=lambda item: (-item[1], item[0])))
+        return counts
@@ -0,0 +1,122 @@
+"""
+Lightweight embedding tier for hosts that cannot load torch.
+Hashed character n-gram TF-IDF vectors (optionally randomly projected to a
+smaller dense dimension), implemented with NumPy only. Starts in milliseconds
+and needs a few MB, at the cost of lexical rather than semantic similarity.
+"""
+
+import logging
+import os
+import re
+import zlib
+from typing import List, Optional
+
+import numpy as np
+
+from .ann_index import normalize_rows
+
+logger = logging.getLogger(__name__)
+
+# Hash buckets per vector; collisions are spread with a signed hash
+HASHED_EMBEDDING_FEATURES = int(os.getenv("HASHED_EMBEDDING_FEATURES", "4096"))
+# Character n-gram lengths (inclusive range, within word boundaries)
+HASHED_EMBEDDING_NGRAMS = os.getenv("HASHED_EMBEDDING_NGRAMS", "3,5")
+# Random-projection output dimension; 0 keeps the hashed TF-IDF vector as-is
+HASHED_EMBEDDING_DIM = int(os.getenv("HASHED_EMBEDDING_DIM", "0"))
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+class HashedNgramEmbedder:
+    """
+    Hashing-trick TF-IDF vectorizer over character n-grams.
+
+    `fit` learns inverse document frequencies per hash bucket from the corpus;
+    `transform` produces L2-normalized dense vectors, so cosine similarity is a
+    dot product exactly as with the transformer embeddings.
+    """
+
+    def __init__(self, n_features: int = HASHED_EMBEDDING_FEATURES,
+                 ngram_range: Optional[tuple] = None,
+                 projection_dim: int = HASHED_EMBEDDING_DIM, seed: int = 42):
+        """
+        Args:
+            n_features: Hash buckets (vector size before projection)
+            ngram_range: (min, max) character n-gram length; defaults to HASHED_EMBEDDING_NGRAMS
+            projection_dim: Gaussian random-projection dimension (0 = no projection)
+            seed: Seed for the projection matrix (keeps vectors reproducible across processes)
+        """
+        self.n_features = n_features
+        self.ngram_range = ngram_range or tuple(int(n) for n in HASHED_EMBEDDING_NGRAMS.split(","))
+        self.projection_dim = projection_dim
+        self.idf = np.ones(n_features, dtype=np.float32)
+        self.fitted = False
+
+        self.projection: Optional[np.ndarray] = None
+        if projection_dim:
+            rng = np.random.default_rng(seed)
+            self.projection = (rng.standard_normal((n_features, projection_dim), dtype=np.float32)
+                               / np.sqrt(projection_dim))
+
+    @property
+    def name(self) -> str:
+        """Identifier used in place of a model name (cache directories, recommendation tables)."""
+        low, high = self.ngram_range
+        suffix = f"-rp{self.projection_dim}" if self.projection_dim else ""
+        return f"hashed-char{low}-{high}-{self.n_features}{suffix}"
+
+    @property
+    def dimension(self) -> int:
+        return self.projection_dim or self.n_features
+
+    def _term_frequencies(self, text: str) -> np.ndarray:
+        """Signed hashed n-gram counts for one text, with sublinear tf scaling."""
+        low, high = self.ngram_range
+        buckets: List[int] = []
+        for word in _WORD_PATTERN.findall(text.lower()):
+            padded = f" {word} "
+            for n in range(low, high + 1):
+                for i in range(max(1, len(padded) - n + 1)):
+                    buckets.append(zlib.crc32(padded[i:i + n].encode("utf-8")))
+
+        counts = np.zeros(self.n_features, dtype=np.float32)
+        if not buckets:
+            return counts
+        hashes = np.array(buckets, dtype=np.uint32)
+        signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+        np.add.at(counts, (hashes % self.n_features).astype(np.int64), signs)
+        return np.sign(counts) * np.log1p(np.abs(counts))
+
+    def fit(self, texts: List[str]) -> "HashedNgramEmbedder":
+        """
+        Learn per-bucket inverse document frequencies from the corpus.
+
+        Args:
+            texts: Corpus texts
+
+        Returns:
+            self, for chaining
+        """
+        document_frequency = np.zeros(self.n_features, dtype=np.float32)
+        for text in texts:
+            document_frequency += self._term_frequencies(text) != 0
+        n = len(texts)
+        self.idf = (np.log((1 + n) / (1 + document_frequency)) + 1).astype(np.float32)
+        self.fitted = True
+        logger.info(f"Fitted hashed n-gram embedder ({self.name}) on {n} texts")
+        return self
+
+    def transform(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts as L2-normalized vectors.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            2D float32 array of shape (len(texts), dimension)
+        """
+        vectors = np.stack([self._term_frequencies(text) for text in texts]) * self.idf
+        if self.projection is not None:
+            vectors = vectors @ self.projection
+        return normalize_rows(vectors)
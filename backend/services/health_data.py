@@ -0,0 +1,270 @@
+"""
+ZIP-level health data source.
+Loads the PLACES health GeoJSON that the frontend map uses and exposes it as
+HealthData-shaped dicts keyed by ZIP code, for offline jobs and server-side endpoints.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+from .cache_manager import cache_manager
+
+logger = logging.getLogger(__name__)
+
+HEALTH_GEOJSON_URL = os.getenv(
+    "HEALTH_GEOJSON_URL",
+    "https://geo-risk-spotspot-geojson.s3.us-east-1.amazonaws.com/ny_new_york_zip_codes_health.geojson"
+)
+
+# Required HealthData metrics (default to 0 like the frontend does)
+CORE_METRICS = [
+    "RiskScore",
+    "DIABETES_CrudePrev",
+    "OBESITY_CrudePrev",
+    "LPA_CrudePrev",
+    "CSMOKING_CrudePrev",
+    "BPHIGH_CrudePrev",
+    "FOODINSECU_CrudePrev",
+    "ACCESS2_CrudePrev",
+]
+
+# Optional HealthData metrics (None when missing)
+OPTIONAL_METRICS = [
+    "TotalPopulation", "TotalPop18plus",
+    "DEPRESSION_CrudePrev", "ISOLATION_CrudePrev", "HOUSINSECU_CrudePrev",
+    "LACKTRPT_CrudePrev", "FOODSTAMP_CrudePrev",
+    "GHLTH_CrudePrev", "MHLTH_CrudePrev", "PHLTH_CrudePrev",
+    "CHECKUP_CrudePrev", "DENTAL_CrudePrev", "SLEEP_CrudePrev",
+]
+
+# Most decimals kept when metrics are read back from float32 storage
+METRIC_DECIMALS = 4
+
+
+def _to_float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def feature_to_health_data(properties: dict) -> Optional[dict]:
+    """
+    Convert GeoJSON feature properties into a HealthData-shaped dict.
+
+    Args:
+        properties: Feature properties from the health GeoJSON
+
+    Returns:
+        Dict with zip_code and metrics, or None if the feature has no ZIP
+    """
+    zip_code = properties.get("ZCTA5CE10") or properties.get("zip_code")
+    if not zip_code:
+        return None
+
+    record = {"zip_code": str(zip_code)}
+    for metric in CORE_METRICS:
+        record[metric] = _to_float(properties.get(metric)) or 0.0
+    for metric in OPTIONAL_METRICS:
+        record[metric] = _to_float(properties.get(metric))
+    return record
+
+
+def health_data_fingerprint(health_data: dict) -> str:
+    """Short hash of the core metrics; identifies the inputs a ranking was computed from."""
+    values = [f"{_to_float(health_data.get(m)) or 0.0:.4f}" for m in CORE_METRICS]
+    return hashlib.sha1("|".join(values).encode("utf-8")).hexdigest()[:16]
+
+
+async def load_health_geojson(source: Optional[str] = None) -> dict:
+    """
+    Load the health GeoJSON from a URL or a local path (cached for 30 minutes).
+
+    Args:
+        source: URL or file path; defaults to HEALTH_GEOJSON_URL
+
+    Returns:
+        Parsed GeoJSON FeatureCollection
+    """
+    source = source or HEALTH_GEOJSON_URL
+    cache_key = f"health_geojson:{source}"
+    cached = cache_manager.get(cache_key)
+    if cached is not None:
+        return cached
+
+    if source.startswith(("http://", "https://")):
+        async with httpx.AsyncClient(timeout=60.0) as client:
+            response = await client.get(source)
+            response.raise_for_status()
+            geojson = response.json()
+    else:
+        with open(source, "r") as f:
+            geojson = json.load(f)
+
+    cache_manager.set(cache_key, geojson, max_age=1800)
+    logger.info(f"Loaded {len(geojson.get('features', []))} health features from {source}")
+    return geojson
+
+
+def geometry_centroid(geometry: Optional[Dict]) -> Optional[Tuple[float, float]]:
+    """Vertex mean of the outer ring (of the largest polygon for MultiPolygons)."""
+    if not geometry:
+        return None
+    kind, coords = geometry.get("type"), geometry.get("coordinates")
+    if kind == "Polygon" and coords:
+        ring = coords[0]
+    elif kind == "MultiPolygon" and coords:
+        ring = max((polygon[0] for polygon in coords if polygon), key=len, default=None)
+    elif kind == "Point" and coords:
+        ring = [coords]
+    else:
+        return None
+    if not ring:
+        return None
+    points = np.asarray([p[:2] for p in ring], dtype=np.float64)
+    return float(points[:, 0].mean()), float(points[:, 1].mean())
+
+
+def round_metrics(values: np.ndarray) -> np.ndarray:
+    """
+    float64 copy of float32 metric values rounded to the 7 significant digits
+    float32 holds (at most METRIC_DECIMALS decimals), so a stored 9.7 reads back
+    as 9.7 rather than 9.699999809265137.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    with np.errstate(divide="ignore"):
+        magnitude = np.floor(np.log10(np.abs(values)))
+    decimals = np.minimum(6 - np.nan_to_num(magnitude, nan=0.0, posinf=0.0, neginf=0.0), METRIC_DECIMALS)
+    scale = 10.0 ** decimals
+    return np.round(values * scale) / scale
+
+
+class ZipTable:
+    """
+    Columnar ZIP data for the numeric services (risk engine, neighbour index):
+    a metric matrix in `metrics` order (NaN where missing) and lon/lat centroids.
+    Region shards hand out their memory-mapped arrays as is.
+    """
+
+    def __init__(self, zip_codes: List[str], metrics: List[str], values: np.ndarray, centroids: np.ndarray):
+        self.zip_codes = zip_codes
+        self.metrics = metrics
+        self.values = values
+        self.centroids = centroids
+        self.column_of = {m: j for j, m in enumerate(metrics)}
+
+    def columns(self, metrics: List[str]) -> np.ndarray:
+        """
+        float32 copy of the given metric columns, missing values filled the way
+        `record` fills them (core metrics 0.0, optional metrics NaN).
+        """
+        out = np.full((len(self.zip_codes), len(metrics)), np.nan, dtype=np.float32)
+        for k, metric in enumerate(metrics):
+            j = self.column_of.get(metric)
+            if j is not None:
+                out[:, k] = self.values[:, j]
+            if metric in CORE_METRICS:
+                out[:, k] = np.nan_to_num(out[:, k], nan=0.0)
+        return out
+
+    def record(self, row: int) -> dict:
+        """HealthData-shaped record of a row (core metrics zero-filled like feature_to_health_data)."""
+        record = {"zip_code": self.zip_codes[row]}
+        values = round_metrics(self.values[row]).tolist()
+        for metric in CORE_METRICS + OPTIONAL_METRICS:
+            j = self.column_of.get(metric)
+            value = np.nan if j is None else values[j]
+            if metric in CORE_METRICS:
+                record[metric] = 0.0 if np.isnan(value) else value
+            else:
+                record[metric] = None if np.isnan(value) else value
+        return record
+
+
+# source -> (GeoJSON object the table was built from, table)
+_zip_tables: Dict[str, Tuple[dict, ZipTable]] = {}
+
+
+async def load_zip_table(source: Optional[str] = None) -> ZipTable:
+    """
+    ZipTable of the health GeoJSON. The same table object is returned until the
+    GeoJSON is reloaded, so callers can detect new data by identity.
+    """
+    source = source or HEALTH_GEOJSON_URL
+    geojson = await load_health_geojson(source)
+    cached = _zip_tables.get(source)
+    if cached is not None and cached[0] is geojson:
+        return cached[1]
+
+    metrics = CORE_METRICS + OPTIONAL_METRICS
+    zip_codes, rows, centroids = [], [], []
+    for feature in geojson.get("features", []):
+        record = feature_to_health_data(feature.get("properties") or {})
+        if not record:
+            continue
+        zip_codes.append(record["zip_code"])
+        rows.append([np.nan if record[m] is None else record[m] for m in metrics])
+        centroids.append(geometry_centroid(feature.get("geometry")) or (np.nan, np.nan))
+    table = ZipTable(
+        zip_codes, metrics,
+        np.asarray(rows, dtype=np.float32).reshape(len(zip_codes), len(metrics)),
+        np.asarray(centroids, dtype=np.float32).reshape(len(zip_codes), 2),
+    )
+    _zip_tables[source] = (geojson, table)
+    return table
+
+
+async def load_health_records(source: Optional[str] = None) -> Dict[str, dict]:
+    """
+    Load HealthData-shaped records for every ZIP in the health GeoJSON.
+
+    Returns:
+        Mapping of zip_code -> health data dict
+    """
+    geojson = await load_health_geojson(source)
+    records = {}
+    for feature in geojson.get("features", []):
+        record = feature_to_health_data(feature.get("properties") or {})
+        if record:
+            records[record["zip_code"]] = record
+    return records
+
+
+async def load_metric_snapshot(source: Optional[str], metrics: List[str]) -> Dict[str, List[Optional[float]]]:
+    """
+    Raw metric values per ZIP from a health GeoJSON, keeping missing values as None
+    (unlike load_health_records, which zero-fills the core metrics for the frontend).
+
+    Returns:
+        Mapping of zip_code -> values in `metrics` order
+    """
+    geojson = await load_health_geojson(source)
+    snapshot = {}
+    for feature in geojson.get("features", []):
+        properties = feature.get("properties") or {}
+        zip_code = properties.get("ZCTA5CE10") or properties.get("zip_code")
+        if zip_code:
+            snapshot[str(zip_code)] = [_to_float(properties.get(m)) for m in metrics]
+    return snapshot
+
+
+def load_cluster_zip_codes(clusters_path: str) -> List[str]:
+    """ZIP codes listed in the precomputed clusters file."""
+    with open(clusters_path, "r") as f:
+        return [item["zip_code"] for item in json.load(f).get("clusters", [])]
+
+
+def load_clusters(clusters_path: str) -> Tuple[Dict[str, int], List[Dict]]:
+    """ZIP -> cluster id mapping and the cluster profiles (empty when the file is missing)."""
+    try:
+        with open(clusters_path, "r") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}, []
+    return {str(c["zip_code"]): c["cluster_id"] for c in data.get("clusters", [])}, data.get("profiles", [])
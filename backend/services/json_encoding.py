@@ -0,0 +1,209 @@
+"""
+Fast JSON encoding and compression for large responses.
+Encodes with orjson when installed (NumPy arrays and scalars serialized natively)
+and falls back to the stdlib encoder with a NumPy-aware default. Bodies above
+JSON_COMPRESS_MIN_BYTES are compressed with brotli (when installed) or gzip
+according to Accept-Encoding, and the encoded and compressed bytes of immutable
+documents are kept so repeat requests skip both steps and revalidate by ETag.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import numpy as np
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+JSON_ENCODER = "orjson" if orjson is not None else "json"
+# Smaller bodies are sent uncompressed (the framing overhead outweighs the savings)
+JSON_COMPRESS_MIN_BYTES = int(os.getenv("JSON_COMPRESS_MIN_BYTES", "1024"))
+JSON_RESPONSE_CACHE_SIZE = int(os.getenv("JSON_RESPONSE_CACHE_SIZE", "64"))
+
+# Per-request bodies favour speed; cached payloads are compressed once at the best ratio
+_DYNAMIC_LEVELS = {"br": 4, "gzip": 6}
+_CACHED_LEVELS = {"br": 11, "gzip": 9}
+SUPPORTED_ENCODINGS = (("br",) if brotli is not None else ()) + ("gzip",)
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any) -> Any:
+    """Encode values neither encoder handles natively (NumPy scalars/arrays, sets, dates)."""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if hasattr(obj, "dict"):
+        return obj.dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Compact UTF-8 JSON.
+
+    orjson encodes NaN as null; the stdlib fallback rejects it like Starlette's
+    JSONResponse does.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+    return json.dumps(content, default=_default, ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def compress(body: bytes, encoding: str, best: bool = False) -> bytes:
+    """Compress a body with "br" or "gzip" (best ratio for bodies that are cached)."""
+    level = (_CACHED_LEVELS if best else _DYNAMIC_LEVELS)[encoding]
+    if encoding == "br":
+        return brotli.compress(body, quality=level)
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def negotiate_encoding(accept_encoding: str, size: int) -> Optional[str]:
+    """
+    Content-Encoding for a body of `size` bytes, or None to send it as is.
+    Honours q-values (q=0 refuses an encoding); prefers brotli over gzip on ties.
+    """
+    if size < JSON_COMPRESS_MIN_BYTES or not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip()] = q
+    best, best_q = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class EncodedPayload:
+    """An encoded JSON document with its ETag and lazily compressed variants."""
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        self._compressed: Dict[str, bytes] = {}
+
+    def compressed(self, encoding: str) -> bytes:
+        if encoding not in self._compressed:
+            self._compressed[encoding] = compress(self.body, encoding, best=True)
+        return self._compressed[encoding]
+
+    @property
+    def gzipped(self) -> bytes:
+        return self.compressed("gzip")
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.body) + sum(len(b) for b in self._compressed.values())
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with `dumps` (the app's default response class)."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_response(request: Request, content: Any, status_code: int = 200,
+                  headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Encode a per-request document directly (skipping jsonable_encoder) and compress
+    it when the client accepts an encoding and the body is large enough.
+    """
+    body = dumps(content)
+    headers = {**(headers or {}), "Vary": "Accept-Encoding"}
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""), len(body))
+    if encoding:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(body, status_code=status_code, media_type="application/json", headers=headers)
+
+
+def payload_response(request: Request, payload: EncodedPayload, media_type: str = "application/json",
+                     headers: Optional[Dict[str, str]] = None) -> Response:
+    """Serve a cached payload: 304 on a matching If-None-Match, else the best accepted encoding."""
+    headers = {**(headers or {}), "ETag": payload.etag, "Vary": "Accept-Encoding"}
+    if payload.etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""), len(payload.body))
+    if encoding:
+        return Response(payload.compressed(encoding), media_type=media_type,
+                        headers={**headers, "Content-Encoding": encoding})
+    return Response(payload.body, media_type=media_type, headers=headers)
+
+
+def _same_version(a: Any, b: Any) -> bool:
+    # Arrays and other loaded objects are versions by identity
+    return a is b or (not isinstance(a, np.ndarray) and a == b)
+
+
+class ResponseCache:
+    """
+    LRU of encoded payloads for documents that only change with their source.
+    Each entry stores the version it was built from (a file mtime, or the loaded
+    source object itself, compared by identity); a new version re-encodes.
+    """
+
+    def __init__(self, max_entries: int = JSON_RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.counters = {"hits": 0, "misses": 0}
+
+    def get_or_encode(self, key: Hashable, version: Any, build: Callable[[], Any]) -> EncodedPayload:
+        entry = self._entries.get(key)
+        if entry is not None and _same_version(entry[0], version):
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return entry[1]
+        self.counters["misses"] += 1
+        payload = EncodedPayload(dumps(build()))
+        self._entries[key] = (version, payload)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return payload
+
+    def stats(self) -> Dict:
+        return {
+            **self.counters,
+            "encoder": JSON_ENCODER,
+            "encodings": list(SUPPORTED_ENCODINGS),
+            "entries": len(self._entries),
+            "cached_bytes": sum(p.nbytes for _, p in self._entries.values()),
+        }
+
+
+# Global response cache instance
+response_cache = ResponseCache()
@@ -0,0 +1,236 @@
+"""
+Structured, non-blocking application logging.
+
+Records are handed to a bounded in-memory queue and written by a background
+listener thread, so request handlers never block on stdout. When the queue is
+full records are dropped (and counted) rather than stalling the event loop.
+Every record carries the current request's trace ID, high-volume debug events
+can be sampled per trace, and output is one JSON object per line.
+"""
+
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "json" (one object per line) or "text" (human-readable, for local development)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Fraction of traces whose DEBUG records are kept (sampled per trace, so a kept
+# request logs all of its debug events). Individual calls can override it with
+# extra={"sample_rate": ...}.
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.05"))
+# Fraction of per-request access log lines kept
+LOG_ACCESS_SAMPLE_RATE = float(os.getenv("LOG_ACCESS_SAMPLE_RATE", "1.0"))
+# Caller file/line lookup (findCaller) dominates the cost of creating a record;
+# it is off unless needed, along with thread/process name capture
+LOG_CALLER_INFO = os.getenv("LOG_CALLER_INFO", "false").lower() == "true"
+
+trace_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("trace_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed via `extra` and is emitted as a field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message", "asctime", "trace_id", "sample_rate"
+}
+_TRACEBACK_FORMATTER = logging.Formatter()
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def get_trace_id() -> Optional[str]:
+    """Trace ID of the request being handled in this context, if any."""
+    return trace_id_var.get()
+
+
+class TraceContextFilter(logging.Filter):
+    """Stamp records with the trace ID from the current context."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = trace_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep a fraction of sampled records.
+
+    Records at DEBUG use LOG_DEBUG_SAMPLE_RATE unless they set `sample_rate`
+    themselves; other levels are kept unless they set `sample_rate`. Within a
+    trace the decision is deterministic, so sampled requests stay complete.
+    """
+
+    def __init__(self, debug_rate: float = LOG_DEBUG_SAMPLE_RATE):
+        super().__init__()
+        self.debug_rate = debug_rate
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = getattr(record, "sample_rate", None)
+        if rate is None:
+            rate = self.debug_rate if record.levelno <= logging.DEBUG else 1.0
+        if rate >= 1.0:
+            return True
+
+        trace_id = getattr(record, "trace_id", None) or trace_id_var.get()
+        if trace_id:
+            keep = (zlib.crc32(trace_id.encode()) % 10000) < rate * 10000
+        else:
+            keep = random.random() < rate
+        if not keep:
+            self.sampled_out += 1
+        return keep
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record: timestamp, level, logger, message, trace ID and extras."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "trace_id", None):
+            entry["trace_id"] = record.trace_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.enqueued = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and traceback now (arguments may change after the call
+        # returns), but leave JSON encoding to the listener thread
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _TRACEBACK_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+            self.enqueued += 1
+            depth = self.queue.qsize()
+            if depth > self.max_depth:
+                self.max_depth = depth
+        except queue.Full:
+            self.dropped += 1
+
+
+class LoggingRuntime:
+    """The configured queue handler, listener and filters, plus their counters."""
+
+    def __init__(self):
+        self.handler: Optional[NonBlockingQueueHandler] = None
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        self.sampler: Optional[SamplingFilter] = None
+        self._lock = threading.Lock()
+
+    def configure(self, level: str = LOG_LEVEL, fmt: str = LOG_FORMAT,
+                  queue_size: int = LOG_QUEUE_SIZE, stream=None) -> None:
+        """
+        Install the queue handler on the root logger (idempotent).
+
+        Args:
+            level: Root log level name
+            fmt: "json" or "text"
+            queue_size: Records buffered before new ones are dropped
+            stream: Output stream for the listener (defaults to stdout)
+        """
+        with self._lock:
+            if self.handler is not None:
+                return
+
+            output = logging.StreamHandler(stream or sys.stdout)
+            output.setFormatter(JSONFormatter() if fmt == "json" else logging.Formatter(
+                "%(asctime)s %(levelname)s %(name)s [%(trace_id)s] %(message)s"
+            ))
+
+            self.sampler = SamplingFilter()
+            self.handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+            self.handler.addFilter(TraceContextFilter())
+            self.handler.addFilter(self.sampler)
+
+            root = logging.getLogger()
+            for existing in list(root.handlers):
+                root.removeHandler(existing)
+            root.addHandler(self.handler)
+            root.setLevel(level)
+
+            if not LOG_CALLER_INFO:
+                logging._srcfile = None
+                logging.logThreads = False
+                logging.logProcesses = False
+                logging.logMultiprocessing = False
+
+            self.listener = logging.handlers.QueueListener(self.handler.queue, output)
+            self.listener.start()
+
+    def shutdown(self) -> None:
+        """Flush queued records and stop the listener thread."""
+        with self._lock:
+            if self.listener is not None:
+                self.listener.stop()
+                self.listener = None
+
+    def stats(self) -> Dict:
+        """Queue and sampling counters (the hot-path cost of logging is one put_nowait)."""
+        if self.handler is None:
+            return {"configured": False}
+        return {
+            "configured": True,
+            "level": logging.getLevelName(logging.getLogger().level),
+            "queue_depth": self.handler.queue.qsize(),
+            "queue_capacity": self.handler.queue.maxsize,
+            "max_queue_depth": self.handler.max_depth,
+            "enqueued": self.handler.enqueued,
+            "dropped": self.handler.dropped,
+            "sampled_out": self.sampler.sampled_out,
+            "debug_sample_rate": self.sampler.debug_rate,
+        }
+
+
+# Global logging runtime
+logging_runtime = LoggingRuntime()
+
+
+def configure_logging(**kwargs) -> None:
+    """Configure application logging once per process (see LoggingRuntime.configure)."""
+    logging_runtime.configure(**kwargs)
+
+
+def elapsed_ms(started: float) -> float:
+    """Milliseconds since a time.perf_counter() reading, rounded for log fields."""
+    return round((time.perf_counter() - started) * 1000, 2)
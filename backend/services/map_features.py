@@ -0,0 +1,172 @@
+"""
+Pre-joined ZIP feature payload for the map.
+Merges the health GeoJSON geometry with the precomputed cluster assignment and a
+caller-selected subset of properties, quantizes coordinates, and keeps the
+encoded (and compressed) body of each distinct field projection so repeat
+requests are served from memory with ETag revalidation.
+"""
+
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .health_data import CORE_METRICS, OPTIONAL_METRICS, load_clusters, load_health_geojson
+from .json_encoding import EncodedPayload, dumps
+
+logger = logging.getLogger(__name__)
+
+CLUSTERS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "clusters.json")
+
+# Decimal places kept in coordinates (5 ~ 1.1 m, well below a ZIP polygon's rendering error)
+MAP_COORD_PRECISION = int(os.getenv("MAP_COORD_PRECISION", "5"))
+MAP_PROJECTION_CACHE_SIZE = int(os.getenv("MAP_PROJECTION_CACHE_SIZE", "32"))
+
+# Properties served when the caller does not pass ?fields= (what the map, popups and analysis read)
+DEFAULT_FIELDS = CORE_METRICS + OPTIONAL_METRICS + ["borough"]
+
+
+def quantize_geometry(geometry: Optional[Dict], precision: int) -> Optional[Dict]:
+    """
+    Round coordinates to `precision` decimals and drop vertices that collapse onto
+    their predecessor. Rings keep at least four positions so they stay valid.
+    """
+    if not geometry:
+        return geometry
+
+    def ring(points):
+        rounded = [[round(x, precision), round(y, precision)] for x, y, *_ in points]
+        deduped = [p for i, p in enumerate(rounded) if i == 0 or p != rounded[i - 1]]
+        return deduped if len(deduped) >= 4 else rounded
+
+    kind, coords = geometry.get("type"), geometry.get("coordinates")
+    if kind == "Polygon":
+        coords = [ring(r) for r in coords]
+    elif kind == "MultiPolygon":
+        coords = [[ring(r) for r in polygon] for polygon in coords]
+    elif kind in ("LineString", "MultiPoint"):
+        coords = [[round(x, precision), round(y, precision)] for x, y, *_ in coords]
+    elif kind == "Point":
+        coords = [round(coords[0], precision), round(coords[1], precision)]
+    return {"type": kind, "coordinates": coords}
+
+
+class MapFeatureStore:
+    """Builds and caches pre-joined, projected ZIP FeatureCollections."""
+
+    def __init__(self, clusters_path: str = CLUSTERS_PATH, max_projections: int = MAP_PROJECTION_CACHE_SIZE,
+                 loader: Callable[[], Awaitable[dict]] = load_health_geojson):
+        self.clusters_path = clusters_path
+        self.loader = loader   # returns the (region's) health GeoJSON
+        self.max_projections = max_projections
+        self._source = None                       # GeoJSON object the base features were built from
+        self._clusters_mtime: Optional[float] = None
+        # precision -> [(zip_code, properties, quantized geometry)]
+        self._bases: Dict[int, List[Tuple[str, Dict, Dict]]] = {}
+        self._profiles: List[Dict] = []
+        self._cluster_of: Dict[str, int] = {}
+        self.available_fields: set = set()
+        self._projections: "OrderedDict[Tuple, EncodedPayload]" = OrderedDict()
+        self.counters = {"hits": 0, "misses": 0, "not_modified": 0, "rebuilds": 0}
+
+    async def _ensure_base(self, precision: int) -> List[Tuple[str, Dict, Dict]]:
+        """Joined base features at a precision, rebuilt when the GeoJSON or clusters changed."""
+        source = await self.loader()
+        try:
+            clusters_mtime = os.path.getmtime(self.clusters_path)
+        except OSError:
+            clusters_mtime = None
+        if source is not self._source or clusters_mtime != self._clusters_mtime:
+            self._cluster_of, self._profiles = load_clusters(self.clusters_path)
+            self._source, self._clusters_mtime = source, clusters_mtime
+            self._bases.clear()
+            self._projections.clear()
+        if precision in self._bases:
+            return self._bases[precision]
+
+        started = time.perf_counter()
+        base, fields = [], set()
+        for feature in source.get("features", []):
+            properties = feature.get("properties") or {}
+            zip_code = properties.get("ZCTA5CE10") or properties.get("zip_code")
+            if not zip_code:
+                continue
+            fields.update(properties)
+            base.append((str(zip_code), properties, quantize_geometry(feature.get("geometry"), precision)))
+
+        self._bases[precision] = base
+        self.available_fields = fields
+        self.counters["rebuilds"] += 1
+        logger.info(f"Built map base features for {len(base)} ZIPs in "
+                    f"{(time.perf_counter() - started) * 1000:.0f}ms (precision {precision})")
+        return base
+
+    async def get_payload(self, fields: Optional[List[str]] = None,
+                          precision: int = MAP_COORD_PRECISION) -> EncodedPayload:
+        """
+        Encoded FeatureCollection for a field projection.
+
+        Args:
+            fields: Properties to include (defaults to DEFAULT_FIELDS that exist);
+                    zip_code and cluster_id are always included
+            precision: Coordinate decimal places
+
+        Returns:
+            EncodedPayload (cached per distinct projection)
+
+        Raises:
+            ValueError: If a requested field is not present in the health GeoJSON
+        """
+        base = await self._ensure_base(precision)
+        if fields is None:
+            selected = [f for f in DEFAULT_FIELDS if f in self.available_fields]
+        else:
+            unknown = sorted(set(fields) - self.available_fields)
+            if unknown:
+                raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+            selected = sorted(set(fields))
+
+        key = (precision, tuple(selected))
+        payload = self._projections.get(key)
+        if payload is not None:
+            self._projections.move_to_end(key)
+            self.counters["hits"] += 1
+            return payload
+
+        self.counters["misses"] += 1
+        features = []
+        for zip_code, properties, geometry in base:
+            projected = {"zip_code": zip_code, "cluster_id": self._cluster_of.get(zip_code)}
+            for field in selected:
+                projected[field] = properties.get(field)
+            features.append({"type": "Feature", "properties": projected, "geometry": geometry})
+
+        collection = {
+            "type": "FeatureCollection",
+            "fields": selected,
+            "coordinate_precision": precision,
+            "cluster_profiles": self._profiles,
+            "features": features,
+        }
+        body = dumps(collection)
+        payload = EncodedPayload(body)
+        self._projections[key] = payload
+        while len(self._projections) > self.max_projections:
+            self._projections.popitem(last=False)
+        logger.info("Encoded map projection", extra={
+            "fields": len(selected), "bytes": len(body), "gzip_bytes": len(payload.gzipped)
+        })
+        return payload
+
+    def stats(self) -> Dict:
+        return {
+            **self.counters,
+            "zips": len(next(iter(self._bases.values()), [])),
+            "cached_projections": len(self._projections),
+            "cached_bytes": sum(p.nbytes for p in self._projections.values()),
+        }
+
+
+# Global map feature store instance
+map_feature_store = MapFeatureStore()
@@ -0,0 +1,244 @@
+"""
+Multi-model routing with hedged requests.
+Tries an ordered list of OpenRouter models; if the current model has not produced a
+first token within its recent p95 time-to-first-token, the same request is fired at
+the next model and whichever streams first wins while the other is cancelled.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+
+from .openrouter import DEFAULT_MODEL, OpenRouterClient, openrouter_client
+from .upstream_scheduler import Priority
+
+logger = logging.getLogger(__name__)
+
+OPENROUTER_MODELS = [
+    m.strip() for m in os.getenv("OPENROUTER_MODELS", DEFAULT_MODEL).split(",") if m.strip()
+]
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "true").lower() == "true"
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", "4.0"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "1.0"))
+HEDGE_MAX_DELAY = float(os.getenv("HEDGE_MAX_DELAY", "15.0"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+
+
+class ModelStats:
+    """Rolling latency and outcome statistics for one model."""
+
+    def __init__(self, window: int = 200):
+        self.first_token_latencies: Deque[float] = deque(maxlen=window)
+        self.total_latencies: Deque[float] = deque(maxlen=window)
+        self.attempts = 0
+        self.wins = 0
+        self.failures = 0
+        self.cancelled = 0
+        self.censored_first_tokens = 0
+        self.hedges_fired = 0
+
+    def p95_first_token(self) -> Optional[float]:
+        """95th percentile time-to-first-token, or None until enough samples exist."""
+        if len(self.first_token_latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.first_token_latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def to_dict(self) -> Dict:
+        def p(samples: Deque[float], q: float) -> Optional[float]:
+            if not samples:
+                return None
+            ordered = sorted(samples)
+            return ordered[int(q * (len(ordered) - 1))]
+
+        return {
+            "attempts": self.attempts,
+            "wins": self.wins,
+            "win_rate": self.wins / self.attempts if self.attempts else 0.0,
+            "failures": self.failures,
+            "cancelled": self.cancelled,
+            "censored_first_tokens": self.censored_first_tokens,
+            "hedges_fired": self.hedges_fired,
+            "first_token_p50": p(self.first_token_latencies, 0.5),
+            "first_token_p95": p(self.first_token_latencies, 0.95),
+            "total_p50": p(self.total_latencies, 0.5),
+            "total_p95": p(self.total_latencies, 0.95),
+        }
+
+
+class ModelRouter:
+    """Routes completions across an ordered model list with hedging and fallback."""
+
+    def __init__(self, client: OpenRouterClient, models: List[str] = None,
+                 hedge_enabled: bool = HEDGE_ENABLED):
+        self.client = client
+        self.models = models or [DEFAULT_MODEL]
+        self.hedge_enabled = hedge_enabled
+        self.model_stats: Dict[str, ModelStats] = {m: ModelStats() for m in self.models}
+
+    def _stats(self, model: str) -> ModelStats:
+        if model not in self.model_stats:
+            self.model_stats[model] = ModelStats()
+        return self.model_stats[model]
+
+    def hedge_delay(self, model: str) -> float:
+        """How long to wait for a first token from `model` before hedging."""
+        p95 = self._stats(model).p95_first_token()
+        if p95 is None:
+            return HEDGE_DEFAULT_DELAY
+        return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, p95))
+
+    async def _attempt(self, model: str, messages: List[Dict[str, str]], priority: Priority,
+                       timeout: float, race: Dict, on_token: Optional[Callable[[str], Awaitable[None]]]) -> Optional[str]:
+        """
+        Stream one model's answer. The first attempt to produce a token claims the race;
+        every other attempt stops forwarding and exits as soon as it notices.
+
+        Every attempt records its time to first token, won or lost. One cancelled
+        before its first token only gives a lower bound: it is recorded as at least
+        the model's current hedge delay, so attempts slower than the threshold still
+        count towards the p95 while a hedge that loses (or a client that disconnects)
+        moments after launch does not pull the p95, and with it the delay, down.
+        """
+        stats = self._stats(model)
+        stats.attempts += 1
+        started = time.monotonic()
+        first_token_seen = False
+
+        def record_first_token(censored: bool = False) -> None:
+            nonlocal first_token_seen
+            if not first_token_seen:
+                first_token_seen = True
+                elapsed = time.monotonic() - started
+                if censored:
+                    stats.censored_first_tokens += 1
+                    elapsed = max(elapsed, self.hedge_delay(model))
+                stats.first_token_latencies.append(elapsed)
+
+        async def on_delta(delta: str) -> None:
+            record_first_token()
+            if race["winner"] is None:
+                race["winner"] = model
+                race["won"].set()
+            if race["winner"] != model:
+                raise asyncio.CancelledError()
+            if on_token is not None:
+                await on_token(delta)
+
+        try:
+            content = await self.client.stream_chat_completion(
+                messages, on_delta, model=model, priority=priority, timeout=timeout
+            )
+        except asyncio.CancelledError:
+            stats.cancelled += 1
+            record_first_token(censored=True)
+            raise
+        except Exception:
+            stats.failures += 1
+            raise
+
+        # A completion without any streamed token still counts as an answer
+        record_first_token()
+        if race["winner"] is None:
+            race["winner"] = model
+            race["won"].set()
+        if race["winner"] != model:
+            return None
+        stats.total_latencies.append(time.monotonic() - started)
+        return content
+
+    async def complete(self, messages: List[Dict[str, str]],
+                       priority: Priority = Priority.INTERACTIVE,
+                       timeout: float = 60.0,
+                       on_token: Optional[Callable[[str], Awaitable[None]]] = None,
+                       hedge: Optional[bool] = None) -> str:
+        """
+        Get a completion from the first model in the list that answers.
+
+        Args:
+            messages: Chat messages in OpenAI format
+            priority: Scheduler lane
+            timeout: Per-attempt HTTP timeout in seconds
+            on_token: Optional coroutine receiving the winning model's content deltas
+            hedge: Override HEDGE_ENABLED (batch jobs pass False to avoid duplicate spend)
+
+        Returns:
+            Content of the winning completion
+
+        Raises:
+            The last upstream error if every model failed
+        """
+        hedge = self.hedge_enabled if hedge is None else hedge
+        pending = list(self.models)
+        race = {"winner": None, "won": asyncio.Event()}
+        attempts: Dict[asyncio.Task, str] = {}
+        last_error: Optional[BaseException] = None
+
+        def launch() -> str:
+            model = pending.pop(0)
+            task = asyncio.create_task(self._attempt(model, messages, priority, timeout, race, on_token))
+            attempts[task] = model
+            return model
+
+        current = launch()
+        try:
+            while attempts:
+                delay = self.hedge_delay(current) if (hedge and pending) else None
+                won_waiter = asyncio.create_task(race["won"].wait())
+                done, _ = await asyncio.wait({*attempts, won_waiter}, timeout=delay,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                won_waiter.cancel()
+
+                if race["won"].is_set():
+                    break
+
+                if not done:
+                    # No first token within the threshold: hedge onto the next model
+                    self._stats(current).hedges_fired += 1
+                    logger.info(f"Hedging: {current} slow to first token after {delay:.1f}s")
+                    current = launch()
+                    continue
+
+                for task in done:
+                    if task is won_waiter or task not in attempts:
+                        continue
+                    model = attempts.pop(task)
+                    last_error = task.exception()
+                    logger.warning(f"Model {model} failed: {last_error!r}")
+
+                # Fall back to the next model once nothing is left running
+                if not attempts and pending:
+                    current = launch()
+
+            if race["winner"] is None:
+                raise last_error or RuntimeError("No models configured")
+
+            winner_task = next(t for t, m in attempts.items() if m == race["winner"])
+            for task, model in attempts.items():
+                if task is not winner_task:
+                    task.cancel()
+            content = await winner_task
+            self._stats(race["winner"]).wins += 1
+            return content
+        finally:
+            for task in attempts:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict:
+        """Per-model latency, win-rate and hedging statistics."""
+        return {
+            "models": self.models,
+            "hedge_enabled": self.hedge_enabled,
+            "per_model": {
+                model: {**s.to_dict(), "hedge_delay": self.hedge_delay(model)}
+                for model, s in self.model_stats.items()
+            }
+        }
+
+
+# Global router instance
+model_router = ModelRouter(openrouter_client, OPENROUTER_MODELS)
@@ -0,0 +1,138 @@
+"""
+OpenRouter chat-completions client.
+All upstream LLM calls go through here so they share one connection pool
+and the limits enforced by the upstream scheduler.
+"""
+
+import json
+import logging
+import os
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from .upstream_scheduler import Priority, UpstreamHTTPError, UpstreamScheduler, upstream_scheduler
+
+logger = logging.getLogger(__name__)
+
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+DEFAULT_MODEL = "arcee-ai/trinity-large-preview:free"  # Free model available on OpenRouter
+
+
+class OpenRouterClient:
+    """Thin async client for the OpenRouter chat-completions API."""
+
+    def __init__(self, scheduler: UpstreamScheduler, base_url: str = OPENROUTER_BASE_URL):
+        self.scheduler = scheduler
+        self.base_url = base_url.rstrip("/")
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        """Shared HTTP client (created lazily so it binds to the running event loop)."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=50, max_keepalive_connections=20)
+            )
+        return self._client
+
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY')}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": "https://geo-risk-spotter.vercel.app",  # Site URL for rankings on openrouter.ai
+            "X-Title": "RiskPulse"
+        }
+
+    async def chat_completion(self, messages: List[Dict[str, str]], model: str = DEFAULT_MODEL,
+                              priority: Priority = Priority.INTERACTIVE,
+                              timeout: float = 60.0) -> str:
+        """
+        Request a chat completion and return the assistant message content.
+
+        Args:
+            messages: Chat messages in OpenAI format
+            model: OpenRouter model identifier
+            priority: Scheduler lane (interactive requests beat batch jobs)
+            timeout: Per-attempt HTTP timeout in seconds
+
+        Returns:
+            Content of the first choice
+
+        Raises:
+            UpstreamRejectedError, UpstreamHTTPError, httpx.RequestError
+        """
+        async def send() -> httpx.Response:
+            return await self._http().post(
+                f"{self.base_url}/chat/completions",
+                headers=self._headers(),
+                json={"model": model, "messages": messages},
+                timeout=timeout
+            )
+
+        response = await self.scheduler.submit(model, send, priority=priority)
+        return response.json()["choices"][0]["message"]["content"]
+
+    async def stream_chat_completion(self, messages: List[Dict[str, str]],
+                                     on_delta: Callable[[str], Awaitable[None]],
+                                     model: str = DEFAULT_MODEL,
+                                     priority: Priority = Priority.INTERACTIVE,
+                                     timeout: float = 60.0) -> str:
+        """
+        Request a streamed chat completion, calling `on_delta` for every content chunk.
+
+        Args:
+            messages: Chat messages in OpenAI format
+            on_delta: Coroutine called with each content delta as it arrives
+            model: OpenRouter model identifier
+            priority: Scheduler lane
+            timeout: Per-attempt HTTP timeout in seconds
+
+        Returns:
+            The full concatenated content
+
+        Raises:
+            UpstreamRejectedError, UpstreamHTTPError, httpx.RequestError
+        """
+        async def send() -> httpx.Response:
+            client = self._http()
+            request = client.build_request(
+                "POST",
+                f"{self.base_url}/chat/completions",
+                headers=self._headers(),
+                json={"model": model, "messages": messages, "stream": True},
+                timeout=timeout
+            )
+            return await client.send(request, stream=True)
+
+        async def consume(response: httpx.Response) -> str:
+            parts = []
+            try:
+                # Server-sent events: "data: {json}" lines, terminated by "data: [DONE]"
+                async for line in response.aiter_lines():
+                    if not line.startswith("data: "):
+                        continue  # keep-alive comments such as ": OPENROUTER PROCESSING"
+                    payload = line[len("data: "):].strip()
+                    if payload == "[DONE]":
+                        break
+                    chunk = json.loads(payload)
+                    if "error" in chunk:
+                        raise UpstreamHTTPError(502, str(chunk["error"]))
+                    delta = chunk["choices"][0].get("delta", {}).get("content")
+                    if delta:
+                        parts.append(delta)
+                        await on_delta(delta)
+            finally:
+                await response.aclose()
+            return "".join(parts)
+
+        return await self.scheduler.submit(model, send, priority=priority, consume=consume)
+
+    async def aclose(self) -> None:
+        """Close the shared HTTP client."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Global client instance
+openrouter_client = OpenRouterClient(upstream_scheduler)
@@ -0,0 +1,273 @@
+"""
+Speculative prefetch of likely-next ZIP summaries.
+After a ZIP is analyzed, users usually open an adjacent ZIP or one in the same
+cluster next. The prefetcher generates the stored summaries for those ZIPs in
+the background, on the scheduler's lowest-priority lane, with its own small
+concurrency budget. Everything in flight is cancelled as soon as interactive
+upstream load rises, and later requests served from prefetched entries are counted.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import Counter, OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import httpx
+import numpy as np
+
+from .health_data import ZipTable, load_clusters, load_zip_table
+from .prompt_templates import PromptTemplateService
+from .region_store import RegionSource, region_store
+from .summary_store import SummaryStore, prompt_fingerprint, summary_store
+from .upstream_scheduler import (
+    Priority, UpstreamHTTPError, UpstreamRejectedError, UpstreamScheduler, upstream_scheduler
+)
+
+logger = logging.getLogger(__name__)
+
+CLUSTERS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "clusters.json")
+
+ENABLE_PREFETCH = os.getenv("ENABLE_PREFETCH", "true").lower() == "true"
+# Text kinds warmed per ZIP ("analysis" and/or QuestionType values)
+PREFETCH_KINDS = [k.strip() for k in os.getenv("PREFETCH_KINDS", "analysis").split(",") if k.strip()]
+PREFETCH_NEIGHBOURS = int(os.getenv("PREFETCH_NEIGHBOURS", "3"))        # nearest ZIPs by centroid
+PREFETCH_CLUSTER_PEERS = int(os.getenv("PREFETCH_CLUSTER_PEERS", "2"))  # nearest ZIPs of the same cluster
+PREFETCH_MAX_CONCURRENCY = int(os.getenv("PREFETCH_MAX_CONCURRENCY", "1"))
+PREFETCH_MAX_PENDING = int(os.getenv("PREFETCH_MAX_PENDING", "20"))
+# Cancel prefetching when more interactive upstream calls than this are queued or in flight
+PREFETCH_MAX_INTERACTIVE_LOAD = int(os.getenv("PREFETCH_MAX_INTERACTIVE_LOAD", "1"))
+PREFETCH_COOLDOWN = float(os.getenv("PREFETCH_COOLDOWN", "15"))
+PREFETCH_CHECK_INTERVAL = float(os.getenv("PREFETCH_CHECK_INTERVAL", "0.25"))
+PREFETCH_TIMEOUT = float(os.getenv("PREFETCH_TIMEOUT", "60"))
+# Bound on remembered prefetched entries awaiting a request (oldest forgotten first)
+PREFETCH_TRACKED_MAX = int(os.getenv("PREFETCH_TRACKED_MAX", "5000"))
+
+
+class NeighbourIndex:
+    """ZIP centroids and cluster ids for spatial and same-cluster neighbour lookups."""
+
+    def __init__(self, clusters_path: str = CLUSTERS_PATH,
+                 loader: Callable[[], Awaitable[ZipTable]] = load_zip_table):
+        self.clusters_path = clusters_path
+        self.loader = loader   # returns the (region's) ZipTable
+        self.zip_codes: List[str] = []
+        self.row_of: Dict[str, int] = {}
+        self.coords = np.zeros((0, 2), dtype=np.float64)
+        self.clusters = np.zeros(0, dtype=np.int32)
+        self._table: Optional[ZipTable] = None
+
+    async def ensure_loaded(self) -> None:
+        """(Re)build from the ZIP table's centroids when it was reloaded."""
+        table = await self.loader()
+        if table is self._table:
+            return
+
+        cluster_of, _ = load_clusters(self.clusters_path)
+        coords = np.array(table.centroids, dtype=np.float64).reshape(len(table.zip_codes), 2)
+        if len(coords):
+            # Equirectangular projection: scale longitude so distances are comparable in both axes
+            mean_lat = np.nanmean(coords[:, 1]) if np.isfinite(coords[:, 1]).any() else 0.0
+            coords[:, 0] *= math.cos(math.radians(mean_lat))
+        self.zip_codes, self.coords = table.zip_codes, coords
+        self.row_of = {z: i for i, z in enumerate(table.zip_codes)}
+        self.clusters = np.array([cluster_of.get(z, -1) for z in table.zip_codes], dtype=np.int32)
+        self._table = table
+
+    def record(self, zip_code: str) -> dict:
+        """HealthData-shaped record of an indexed ZIP."""
+        return self._table.record(self.row_of[zip_code])
+
+    def neighbours(self, zip_code: str, spatial: int = PREFETCH_NEIGHBOURS,
+                   cluster_peers: int = PREFETCH_CLUSTER_PEERS) -> List[str]:
+        """
+        Likely-next ZIPs: the nearest ZIPs by centroid, then the nearest ZIPs of the
+        same cluster that are not already included. Nearest first within each group.
+        """
+        row = self.row_of.get(zip_code)
+        if row is None or not np.isfinite(self.coords[row]).all():
+            return []
+        distances = np.nan_to_num(((self.coords - self.coords[row]) ** 2).sum(axis=1), nan=np.inf)
+        distances[row] = np.inf
+        order = np.argsort(distances, kind="stable")
+        order = order[np.isfinite(distances[order])]
+
+        selected = list(order[:spatial])
+        if cluster_peers and self.clusters[row] >= 0:
+            peers = order[self.clusters[order] == self.clusters[row]]
+            chosen = set(selected)
+            selected += [i for i in peers[:spatial + cluster_peers] if i not in chosen][:cluster_peers]
+        return [self.zip_codes[i] for i in selected]
+
+
+def region_neighbour_index(zip_code: str) -> NeighbourIndex:
+    """Neighbour index of the region serving a ZIP."""
+    return region_store.source_for_zip(zip_code).instance(
+        "neighbours", lambda source: NeighbourIndex(source.clusters_path, source.table)
+    )
+
+
+class Prefetcher:
+    """Budgeted, load-aware background warming of the summary store."""
+
+    def __init__(self, store: SummaryStore = summary_store, scheduler: UpstreamScheduler = upstream_scheduler,
+                 index_for: Callable[[str], NeighbourIndex] = region_neighbour_index,
+                 kinds: Optional[List[str]] = None,
+                 max_concurrency: int = PREFETCH_MAX_CONCURRENCY, max_pending: int = PREFETCH_MAX_PENDING,
+                 max_interactive_load: int = PREFETCH_MAX_INTERACTIVE_LOAD,
+                 cooldown: float = PREFETCH_COOLDOWN):
+        self.store = store
+        self.scheduler = scheduler
+        self.index_for = index_for
+        self.kinds = kinds or PREFETCH_KINDS
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.max_interactive_load = max_interactive_load
+        self.cooldown = cooldown
+        self._pending: "OrderedDict[str, Tuple[str, str, str]]" = OrderedDict()   # key -> (kind, zip, prompt)
+        self._running: Dict[str, asyncio.Task] = {}
+        self._prefetched: "OrderedDict[str, str]" = OrderedDict()                 # key -> zip, not yet requested
+        self._triggers: Set[asyncio.Task] = set()
+        self._monitor: Optional[asyncio.Task] = None
+        self._paused_until = 0.0
+        self.counters: Counter = Counter()
+
+    def _key(self, kind: str, prompt: str) -> str:
+        return prompt_fingerprint(kind, prompt, self.store.model_key)
+
+    def _overloaded(self) -> bool:
+        return self.scheduler.interactive_load() > self.max_interactive_load
+
+    def trigger(self, zip_code: str) -> None:
+        """Queue prefetches for the likely-next ZIPs after `zip_code` was served (non-blocking)."""
+        if not ENABLE_PREFETCH:
+            return
+        if time.monotonic() < self._paused_until or self._overloaded():
+            self.counters["triggers_skipped_load"] += 1
+            return
+        self.counters["triggers"] += 1
+        task = asyncio.create_task(self._schedule(zip_code))
+        self._triggers.add(task)
+        task.add_done_callback(self._triggers.discard)
+
+    async def _schedule(self, zip_code: str) -> None:
+        try:
+            index = self.index_for(zip_code)
+            await index.ensure_loaded()
+        except Exception as e:
+            logger.warning(f"Prefetch neighbour index unavailable: {e}")
+            return
+
+        for neighbour in index.neighbours(zip_code):
+            record = index.record(neighbour)
+            for kind in self.kinds:
+                prompt = PromptTemplateService.build_prompt(kind, record)
+                key = self._key(kind, prompt)
+                if key in self._pending or key in self._running or key in self._prefetched:
+                    continue
+                if self.store.contains(kind, prompt):
+                    self.counters["already_stored"] += 1
+                    continue
+                self._pending[key] = (kind, neighbour, prompt)
+                self.counters["queued"] += 1
+        while len(self._pending) > self.max_pending:
+            # Oldest candidates belong to earlier clicks and are least likely to be next
+            self._pending.popitem(last=False)
+            self.counters["dropped_pending"] += 1
+        self._pump()
+
+    def _pump(self) -> None:
+        """Start pending jobs up to the concurrency budget (most recent first)."""
+        while self._pending and len(self._running) < self.max_concurrency:
+            if time.monotonic() < self._paused_until or self._overloaded():
+                self.cancel("interactive_load")
+                return
+            key, (kind, zip_code, prompt) = self._pending.popitem(last=True)
+            self._running[key] = asyncio.create_task(self._run(key, kind, zip_code, prompt))
+        if self._running and self._monitor is None:
+            self._monitor = asyncio.create_task(self._watch_load())
+
+    async def _run(self, key: str, kind: str, zip_code: str, prompt: str) -> None:
+        started = time.monotonic()
+        try:
+            await self.store.cached_completion(
+                kind, prompt, zip_code=zip_code, priority=Priority.PREFETCH,
+                timeout=PREFETCH_TIMEOUT, hedge=False
+            )
+            self._prefetched[key] = zip_code
+            while len(self._prefetched) > PREFETCH_TRACKED_MAX:
+                self._prefetched.popitem(last=False)
+            self.counters["completed"] += 1
+            logger.debug("Prefetched summary", extra={
+                "zip_code": zip_code, "kind": kind, "elapsed_ms": round((time.monotonic() - started) * 1000)
+            })
+        except asyncio.CancelledError:
+            self.counters["cancelled_in_flight"] += 1
+            raise
+        except (UpstreamRejectedError, UpstreamHTTPError, httpx.RequestError) as e:
+            self.counters["failed"] += 1
+            logger.debug(f"Prefetch of {zip_code}/{kind} failed: {e}")
+        finally:
+            self._running.pop(key, None)
+            if time.monotonic() >= self._paused_until:
+                self._pump()
+
+    async def _watch_load(self) -> None:
+        """Cancel prefetching as soon as interactive load rises; exits when idle."""
+        try:
+            while self._running or self._pending:
+                await asyncio.sleep(PREFETCH_CHECK_INTERVAL)
+                if self._overloaded():
+                    self.cancel("interactive_load")
+        finally:
+            self._monitor = None
+
+    def cancel(self, reason: str) -> int:
+        """Drop pending jobs, cancel in-flight ones and pause new triggers for the cooldown."""
+        self._paused_until = time.monotonic() + self.cooldown
+        cancelled = len(self._running) + len(self._pending)
+        self.counters["dropped_pending"] += len(self._pending)
+        self._pending.clear()
+        for task in list(self._running.values()):
+            task.cancel()
+        if cancelled:
+            self.counters[f"cancellations_{reason}"] += 1
+            logger.info(f"Cancelled {cancelled} prefetch jobs ({reason})")
+        return cancelled
+
+    def note_request(self, kind: str, prompt: str) -> bool:
+        """
+        Record an interactive request for a text. Returns True when it is served by a
+        prefetched entry (each prefetched entry counts once).
+        """
+        if not ENABLE_PREFETCH:
+            return False
+        key = self._key(kind, prompt)
+        if self._prefetched.pop(key, None) is not None:
+            self.counters["served_from_prefetch"] += 1
+            return True
+        if key in self._running:
+            # Asked for while still being prefetched: both calls go upstream
+            self.counters["requested_in_flight"] += 1
+        return False
+
+    def stats(self) -> Dict:
+        completed = self.counters["completed"]
+        return {
+            "enabled": ENABLE_PREFETCH,
+            "kinds": self.kinds,
+            "max_concurrency": self.max_concurrency,
+            "max_interactive_load": self.max_interactive_load,
+            "running": len(self._running),
+            "pending": len(self._pending),
+            "paused_seconds": round(max(0.0, self._paused_until - time.monotonic()), 1),
+            "prefetched_unrequested": len(self._prefetched),
+            "hit_rate": round(self.counters["served_from_prefetch"] / completed, 3) if completed else 0.0,
+            **self.counters,
+        }
+
+
+# Global prefetcher instance
+prefetcher = Prefetcher()
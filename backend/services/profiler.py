@@ -0,0 +1,222 @@
+"""
+On-demand statistical profiler for the running process.
+A sampler thread reads every thread's Python stack (sys._current_frames) at a
+fixed interval and aggregates them as collapsed stacks ("a;b;c count"), the
+input format of flamegraph.pl, speedscope and inferno. Two capture modes:
+a fixed time window, or the next N requests to a route. Nothing runs while no
+capture is active; the request hook is a single attribute check.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ENABLE_PROFILER = os.getenv("ENABLE_PROFILER", "false").lower() == "true"
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+PROFILER_DEFAULT_INTERVAL_MS = float(os.getenv("PROFILER_DEFAULT_INTERVAL_MS", "5"))
+PROFILER_MAX_REQUESTS = int(os.getenv("PROFILER_MAX_REQUESTS", "100"))
+PROFILER_MAX_DEPTH = int(os.getenv("PROFILER_MAX_DEPTH", "128"))
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Leaf frames of threads that are blocked waiting for work (event loop, pools, log queue)
+_IDLE_LEAVES = {
+    ("selectors.py", "select"), ("threading.py", "wait"), ("queue.py", "get"),
+    ("thread.py", "_worker"), ("threading.py", "_wait_for_tstate_lock"),
+}
+
+
+class ProfilerBusy(Exception):
+    """Another capture is already running."""
+
+
+def _frame_label(code) -> str:
+    """'function (path:line)' with paths relative to the backend or site-packages."""
+    filename = code.co_filename
+    if filename.startswith(_BACKEND_DIR):
+        filename = os.path.relpath(filename, _BACKEND_DIR)
+    elif "site-packages" in filename:
+        filename = filename.split("site-packages" + os.sep, 1)[-1]
+    else:
+        filename = os.path.basename(filename)
+    # ';' separates frames in the collapsed format
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ",")
+
+
+def route_pattern(route: str) -> "re.Pattern":
+    """Match a concrete path or a route template such as /api/reports/{zip_code}."""
+    parts = re.split(r"(\{[^/}]+\})", route.rstrip("/") or "/")
+    regex = "".join("[^/]+" if p.startswith("{") else re.escape(p) for p in parts)
+    return re.compile(f"^{regex}/?$")
+
+
+class StackSampler:
+    """Background thread aggregating sampled stacks while `active()` is true."""
+
+    def __init__(self, interval: float, include_idle: bool = False, max_depth: int = PROFILER_MAX_DEPTH):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.max_depth = max_depth
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.ticks = 0
+        self.active = lambda: True
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self.started = 0.0
+        self.elapsed = 0.0
+        self.requests: Optional[int] = None   # requests covered (request-mode captures)
+
+    def start(self) -> None:
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            if not self.active():
+                continue
+            self.ticks += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                leaf = frame.f_code
+                if not self.include_idle and (os.path.basename(leaf.co_filename), leaf.co_name) in _IDLE_LEAVES:
+                    continue
+                labels = []
+                while frame is not None and len(labels) < self.max_depth:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                labels.append(f"thread:{names.get(thread_id, thread_id)}")
+                self.stacks[";".join(reversed(labels))] += 1
+                self.samples += 1
+
+    def collapsed(self) -> str:
+        """Collapsed stacks, heaviest first."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def summary(self, top: int = 25) -> Dict:
+        """Sample counts plus the functions with the most self and inclusive samples."""
+        own, inclusive = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for frame in set(frames[1:]):
+                inclusive[frame] += count
+        return {
+            "duration_seconds": round(self.elapsed, 3),
+            "requests": self.requests,
+            "interval_ms": round(self.interval * 1000, 2),
+            "ticks": self.ticks,
+            "samples": self.samples,
+            "distinct_stacks": len(self.stacks),
+            "top_self": [{"frame": f, "samples": n} for f, n in own.most_common(top)],
+            "top_inclusive": [{"frame": f, "samples": n} for f, n in inclusive.most_common(top)],
+        }
+
+
+class RequestProfiler:
+    """Single-capture coordinator used by the admin endpoints and the request middleware."""
+
+    def __init__(self):
+        self.armed = False              # read by the middleware on every request
+        self._sampler: Optional[StackSampler] = None
+        self._pattern = None
+        self._remaining = 0
+        self._in_flight = 0
+        self._finished = 0
+        self._target = 0
+        self._done: Optional[asyncio.Event] = None
+        self.counters = Counter()
+
+    @property
+    def busy(self) -> bool:
+        return self._sampler is not None
+
+    def _start(self, interval_ms: float, include_idle: bool) -> StackSampler:
+        if self.busy:
+            raise ProfilerBusy("A profile capture is already running.")
+        self._sampler = StackSampler(max(interval_ms, 1.0) / 1000.0, include_idle)
+        return self._sampler
+
+    async def profile_for(self, seconds: float, interval_ms: float = PROFILER_DEFAULT_INTERVAL_MS,
+                          include_idle: bool = False) -> StackSampler:
+        """Sample the whole process for a fixed window."""
+        sampler = self._start(interval_ms, include_idle)
+        self.counters["window_captures"] += 1
+        sampler.start()
+        try:
+            await asyncio.sleep(min(seconds, PROFILER_MAX_SECONDS))
+        finally:
+            sampler.stop()
+            self._sampler = None
+        return sampler
+
+    async def profile_requests(self, route: str, count: int, timeout: float = PROFILER_MAX_SECONDS,
+                               interval_ms: float = PROFILER_DEFAULT_INTERVAL_MS,
+                               include_idle: bool = False) -> StackSampler:
+        """
+        Sample while the next `count` requests to `route` are in flight.
+
+        Samples cover the whole process during those requests, so work for other
+        requests running concurrently on the event loop is included.
+        Returns after the requests completed or `timeout` elapsed (with what was captured).
+        """
+        sampler = self._start(interval_ms, include_idle)
+        self.counters["request_captures"] += 1
+        self._pattern = route_pattern(route)
+        self._remaining = self._target = min(count, PROFILER_MAX_REQUESTS)
+        self._in_flight = self._finished = 0
+        self._done = asyncio.Event()
+        sampler.active = lambda: self._in_flight > 0
+        sampler.start()
+        self.armed = True
+        try:
+            await asyncio.wait_for(self._done.wait(), min(timeout, PROFILER_MAX_SECONDS))
+        except asyncio.TimeoutError:
+            logger.info(f"Request profile timed out after {self._finished}/{self._target} requests")
+        finally:
+            self.armed = False
+            sampler.stop()
+            self._sampler = None
+        sampler.requests = self._finished
+        return sampler
+
+    def begin(self, path: str) -> bool:
+        """Called for each request while armed; True when this request is being profiled."""
+        if not self.armed or self._remaining <= 0 or not self._pattern.match(path):
+            return False
+        self._remaining -= 1
+        if self._remaining == 0:
+            self.armed = False
+        self._in_flight += 1
+        return True
+
+    def end(self) -> None:
+        self._in_flight -= 1
+        self._finished += 1
+        self.counters["requests_profiled"] += 1
+        if self._finished >= self._target and self._done is not None:
+            self._done.set()
+
+    def stats(self) -> Dict:
+        return {"enabled": ENABLE_PROFILER, "busy": self.busy, "armed": self.armed, **self.counters}
+
+
+# Global profiler instance
+request_profiler = RequestProfiler()
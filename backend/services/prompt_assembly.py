@@ -0,0 +1,258 @@
+"""
+Token-budgeted prompt assembly for the chat endpoint.
+Keeps the system prompt and recent turns verbatim, folds older turns into a
+cached rolling summary and projects the selected area down to key metrics.
+
+Messages are ordered from most to least stable (system prompt, area context,
+retrieved context, summary, history, new message) so consecutive turns about
+the same area share a byte-identical prefix that upstream prompt caching can reuse.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CHAT_TOKEN_BUDGET = int(os.getenv("CHAT_TOKEN_BUDGET", "3000"))
+CHAT_SUMMARY_TOKEN_BUDGET = int(os.getenv("CHAT_SUMMARY_TOKEN_BUDGET", "400"))
+CHAT_MIN_RECENT_MESSAGES = int(os.getenv("CHAT_MIN_RECENT_MESSAGES", "4"))
+# Rolling summaries kept per conversation prefix (least recently used evicted first)
+CHAT_SUMMARY_CACHE_SIZE = int(os.getenv("CHAT_SUMMARY_CACHE_SIZE", "2048"))
+CHAT_SUMMARY_CACHE_TTL = float(os.getenv("CHAT_SUMMARY_CACHE_TTL", "1800"))
+
+# Metrics forwarded to the model from `selected_area`, in display order
+AREA_CONTEXT_FIELDS = {
+    "zip_code": "ZIP code",
+    "RiskScore": "Risk Score",
+    "DIABETES_CrudePrev": "Diabetes Prevalence (%)",
+    "OBESITY_CrudePrev": "Obesity Prevalence (%)",
+    "LPA_CrudePrev": "Physical Inactivity (%)",
+    "CSMOKING_CrudePrev": "Smoking Rate (%)",
+    "BPHIGH_CrudePrev": "High Blood Pressure (%)",
+    "FOODINSECU_CrudePrev": "Food Insecurity (%)",
+    "ACCESS2_CrudePrev": "Limited Healthcare Access (%)",
+    "DEPRESSION_CrudePrev": "Depression (%)",
+    "HOUSINSECU_CrudePrev": "Housing Insecurity (%)",
+    "LACKTRPT_CrudePrev": "Lack of Transportation (%)",
+    "TotalPopulation": "Total Population",
+}
+
+_SUMMARY_LINE_CHARS = 160
+
+
+class TokenCounter:
+    """
+    Token counter for budgeting. Uses tiktoken (cl100k_base) when it is installed
+    and its encoding can be loaded; otherwise a regex approximation (~4 characters
+    per token for words, 1 per symbol).
+    """
+
+    def __init__(self, encoding_name: str = "cl100k_base"):
+        self._encoding = None
+        try:
+            import tiktoken
+            self._encoding = tiktoken.get_encoding(encoding_name)
+        except Exception:
+            logger.info("tiktoken not available - using approximate token counting")
+        self._pattern = re.compile(r"\w+|[^\w\s]")
+
+    def count(self, text: str) -> int:
+        """Count tokens in a string."""
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text))
+        return sum(max(1, (len(piece) + 3) // 4) for piece in self._pattern.findall(text))
+
+    def count_messages(self, messages: List[Dict[str, str]]) -> int:
+        """Count tokens for chat messages, including ~4 tokens of per-message framing."""
+        return sum(self.count(m.get("content", "")) + 4 for m in messages)
+
+
+@dataclass
+class AssembledPrompt:
+    """Result of prompt assembly, with token accounting for the request."""
+    messages: List[Dict[str, str]]
+    prompt_tokens: int
+    trimmed_tokens: int
+    summarized_messages: int = 0
+    stats: Dict[str, Any] = field(default_factory=dict)
+
+
+def project_area_context(selected_area: Optional[dict]) -> str:
+    """
+    Render only the metrics that matter from the selected area.
+
+    Args:
+        selected_area: Raw area properties sent by the client
+
+    Returns:
+        Markdown bullet list, or an empty string when no known metric is present
+    """
+    if not selected_area:
+        return ""
+
+    lines = []
+    for key, label in AREA_CONTEXT_FIELDS.items():
+        value = selected_area.get(key)
+        if value is None or value == "":
+            continue
+        if isinstance(value, float):
+            value = f"{value:.2f}"
+        lines.append(f"- {label}: {value}")
+    return "\n".join(lines)
+
+
+def _summary_line(message: Dict[str, str]) -> str:
+    """Extractive one-line digest of a single turn: its first sentence, truncated."""
+    content = re.sub(r"[#*_`>]+", "", message.get("content", "")).strip()
+    content = re.sub(r"\s+", " ", content)
+    first_sentence = re.split(r"(?<=[.!?])\s", content, maxsplit=1)[0]
+    if len(first_sentence) > _SUMMARY_LINE_CHARS:
+        first_sentence = first_sentence[:_SUMMARY_LINE_CHARS].rstrip() + "..."
+    speaker = "User asked" if message.get("role") == "user" else "Assistant answered"
+    return f"- {speaker}: {first_sentence}"
+
+
+class PromptAssembler:
+    """Builds the upstream message list for a chat turn within a token budget."""
+
+    def __init__(self, token_budget: int = CHAT_TOKEN_BUDGET,
+                 summary_budget: int = CHAT_SUMMARY_TOKEN_BUDGET,
+                 min_recent_messages: int = CHAT_MIN_RECENT_MESSAGES):
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self.min_recent_messages = min_recent_messages
+        self.counter = TokenCounter()
+        # prefix hash -> (stored at, summary lines)
+        self._summaries: "OrderedDict[str, Tuple[float, List[str]]]" = OrderedDict()
+        self.summary_cache_size = CHAT_SUMMARY_CACHE_SIZE
+        self.summary_cache_ttl = CHAT_SUMMARY_CACHE_TTL
+
+    def _cached_summary(self, prefix_hash: str) -> Optional[List[str]]:
+        entry = self._summaries.get(prefix_hash)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] > self.summary_cache_ttl:
+            del self._summaries[prefix_hash]
+            return None
+        self._summaries.move_to_end(prefix_hash)
+        return entry[1]
+
+    def _store_summary(self, prefix_hash: str, lines: List[str]) -> None:
+        self._summaries[prefix_hash] = (time.monotonic(), lines)
+        self._summaries.move_to_end(prefix_hash)
+        while len(self._summaries) > self.summary_cache_size:
+            self._summaries.popitem(last=False)
+
+    def _rolling_summary(self, older: List[Dict[str, str]]) -> str:
+        """
+        Summarize the turns that fell out of the window.
+
+        Summaries are cached per conversation prefix (in a bounded LRU with a TTL),
+        so each turn only has to extend the summary of the prefix it already computed.
+        """
+        prefix_hashes = []
+        digest = hashlib.sha256()
+        for message in older:
+            digest.update(f"{message.get('role')}\x00{message.get('content', '')}\x01".encode("utf-8"))
+            prefix_hashes.append(digest.hexdigest())
+
+        # Find the longest prefix we already summarized
+        lines: List[str] = []
+        start = 0
+        for i in range(len(older) - 1, -1, -1):
+            cached = self._cached_summary(prefix_hashes[i])
+            if cached is not None:
+                lines, start = list(cached), i + 1
+                break
+
+        for message in older[start:]:
+            lines.append(_summary_line(message))
+
+        # Keep the most recent lines that fit the summary budget
+        while len(lines) > 1 and self.counter.count("\n".join(lines)) > self.summary_budget:
+            lines.pop(0)
+
+        if older:
+            self._store_summary(prefix_hashes[-1], lines)
+        return "Summary of earlier conversation:\n" + "\n".join(lines)
+
+    def assemble(self, system_prompt: str, history: List[Dict[str, str]], user_message: str,
+                 context_blocks: Optional[List[str]] = None,
+                 selected_area: Optional[dict] = None) -> AssembledPrompt:
+        """
+        Assemble the message list for one chat turn.
+
+        Args:
+            system_prompt: Base system instructions (always kept)
+            history: Prior turns as {"role", "content"} dicts, oldest first
+            user_message: The new user message (always kept)
+            context_blocks: Extra system messages such as retrieved interventions
+            selected_area: Raw area properties; projected to AREA_CONTEXT_FIELDS
+
+        Returns:
+            AssembledPrompt with the messages and token accounting
+        """
+        history = [{"role": m["role"], "content": m["content"]} for m in history]
+
+        # Stable prefix: area context changes only with the area, retrieved blocks only with intent
+        head = [{"role": "system", "content": system_prompt}]
+        area_context = project_area_context(selected_area)
+        if area_context:
+            head.append({"role": "system", "content": f"""### Area Context
+{area_context}
+
+Format your response using markdown with clear sections, bullet points for lists, and proper spacing between paragraphs."""})
+        head.extend({"role": "system", "content": block} for block in (context_blocks or []) if block)
+
+        tail = [{"role": "user", "content": user_message}]
+        fixed_tokens = self.counter.count_messages(head) + self.counter.count_messages(tail)
+
+        # Keep the newest turns that fit; always keep a minimum recent window
+        remaining = self.token_budget - fixed_tokens
+        kept_from = len(history)
+        for i in range(len(history) - 1, -1, -1):
+            cost = self.counter.count_messages([history[i]])
+            if remaining - cost < 0 and len(history) - i > self.min_recent_messages:
+                break
+            remaining -= cost
+            kept_from = i
+
+        older, recent = history[:kept_from], history[kept_from:]
+        summary_messages = []
+        if older:
+            summary_messages = [{"role": "system", "content": self._rolling_summary(older)}]
+
+        messages = head + summary_messages + recent + tail
+        prompt_tokens = self.counter.count_messages(messages)
+        prefix_tokens = self.counter.count_messages(head)
+        prefix_hash = hashlib.sha1(
+            "\x01".join(m["content"] for m in head).encode("utf-8")
+        ).hexdigest()[:16]
+
+        # What the request would have cost without compaction: full history and the raw area dump
+        raw_area = ""
+        if selected_area:
+            raw_area = "\n".join(f"- {k}: {v}" for k, v in selected_area.items())
+        naive_tokens = (self.counter.count_messages(head + history + tail)
+                        - self.counter.count(area_context) + self.counter.count(raw_area))
+        trimmed_tokens = max(0, naive_tokens - prompt_tokens)
+
+        return AssembledPrompt(
+            messages=messages,
+            prompt_tokens=prompt_tokens,
+            trimmed_tokens=trimmed_tokens,
+            summarized_messages=len(older),
+            stats={"budget": self.token_budget, "kept_messages": len(recent),
+                   "prefix_tokens": prefix_tokens, "prefix_hash": prefix_hash}
+        )
+
+
+prompt_assembler = PromptAssembler()
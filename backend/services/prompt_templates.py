@@ -87,6 +87,38 @@ Provide practical, personalized advice for:
 """
         }
     
+    @staticmethod
+    def get_analysis_prompt() -> str:
+        """Get the /api/analyze summary prompt template."""
+        return """
+You are a public health analyst. Analyze the following health data for Zip Code {zip_code} and provide a concise summary of the key risk factors for diabetes and related conditions in this area. Focus on the most significant prevalence rates and their potential implications.
+
+Health Data:
+- Risk Score: {risk_score:.2f}
+- Diabetes Crude Prevalence: {diabetes:.2f}%
+- Obesity Crude Prevalence: {obesity:.2f}%
+- Lack of Physical Activity Prevalence: {physical_inactivity:.2f}%
+- Current Smoking Crude Prevalence: {smoking:.2f}%
+- High Blood Pressure Crude Prevalence: {blood_pressure:.2f}%
+- Food Insecurity Crude Prevalence: {food_insecurity:.2f}%
+- Limited Access to Healthcare Prevalence: {healthcare_access:.2f}%
+
+Example output: 
+
+Provide a summary that is easy to understand for public health officials. Do not repeat the zip code in the summary. Please make it short no more than 500 characters. 
+"""
+    
+    def get_prompt(self, question_type: QuestionType) -> str:
+        """Get the recommendation prompt template for a question type."""
+        return self.get_recommendation_prompts()[question_type]
+    
+    @classmethod
+    def build_prompt(cls, kind: str, health_data: dict) -> str:
+        """Build the exact prompt /api/analyze ("analysis") or /api/recommendations (QuestionType value) sends."""
+        template = (cls.get_analysis_prompt() if kind == "analysis"
+                    else cls.get_recommendation_prompts()[QuestionType(kind)])
+        return cls.format_health_data_prompt(template, health_data["zip_code"], health_data)
+    
     @staticmethod
     def format_health_data_prompt(template: str, zip_code: str, health_data: dict) -> str:
         """Format a prompt template with health data."""
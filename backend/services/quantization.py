@@ -0,0 +1,144 @@
+"""
+Reduced-precision storage for L2-normalized corpus embeddings.
+float16 halves the matrix; int8 stores symmetric per-row scalar-quantized codes
+with one float32 scale per row (~4x smaller). Scoring dequantizes in fixed-size
+row blocks so no full-precision copy of the corpus is ever materialized.
+"""
+
+import logging
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STORAGE_DTYPES = ("float32", "float16", "int8")
+
+# Rows dequantized per block while scoring (bounds transient float32 memory)
+SCORE_BLOCK_ROWS = 2048
+
+
+class QuantizedMatrix:
+    """
+    Read-only embedding matrix in float32, float16 or int8 storage.
+
+    Supports the subset of the ndarray interface the embedding service and ANN
+    index use: `shape`, `len()`, row indexing/slicing (returns dequantized
+    float32 rows) and `np.asarray()`.
+    """
+
+    def __init__(self, codes: np.ndarray, scales: Optional[np.ndarray] = None):
+        """
+        Args:
+            codes: Stored matrix (float32, float16 or int8)
+            scales: Per-row float32 scales, required for int8 codes
+        """
+        if codes.dtype == np.int8 and scales is None:
+            raise ValueError("int8 codes need per-row scales")
+        self.codes = codes
+        self.scales = scales
+
+    @classmethod
+    def quantize(cls, matrix: np.ndarray, dtype: str) -> "QuantizedMatrix":
+        """
+        Convert a float matrix to the requested storage dtype.
+
+        Args:
+            matrix: L2-normalized embeddings (2D array)
+            dtype: One of STORAGE_DTYPES
+
+        Returns:
+            QuantizedMatrix wrapping the converted codes
+        """
+        if dtype not in STORAGE_DTYPES:
+            raise ValueError(f"Unsupported embedding storage dtype: {dtype}")
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if dtype != "int8":
+            return cls(matrix.astype(dtype))
+
+        # Symmetric per-row quantization: the largest |component| of each row maps to 127
+        max_abs = np.abs(matrix).max(axis=1)
+        scales = (np.where(max_abs > 0, max_abs, 1.0) / 127.0).astype(np.float32)
+        codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+        return cls(codes, scales)
+
+    @property
+    def dtype_name(self) -> str:
+        return self.codes.dtype.name
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.codes.shape
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the stored codes and scales."""
+        return int(self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0))
+
+    def __len__(self) -> int:
+        return self.codes.shape[0]
+
+    def __getitem__(self, rows) -> np.ndarray:
+        block = np.asarray(self.codes[rows], dtype=np.float32)
+        if self.scales is not None:
+            block *= np.asarray(self.scales[rows], dtype=np.float32)[..., None]
+        return block
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        matrix = self[:]
+        return matrix if dtype is None else matrix.astype(dtype, copy=False)
+
+    def dot(self, query: np.ndarray) -> np.ndarray:
+        """
+        Dot product of every stored row with a float32 query.
+
+        For int8 codes the per-row scale is applied after the block product
+        (codes @ q * scale) instead of dequantizing element-wise.
+
+        Args:
+            query: 1D float32 vector
+
+        Returns:
+            1D float32 array of len(self) scores
+        """
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        if self.codes.dtype == np.float32:
+            return np.asarray(self.codes @ query, dtype=np.float32)
+
+        scores = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), SCORE_BLOCK_ROWS):
+            block = np.asarray(self.codes[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            scores[start:start + block.shape[0]] = block @ query
+        if self.scales is not None:
+            scores *= self.scales
+        return scores
+
+    def save(self, directory: str) -> None:
+        """Persist codes (and scales) as .npy files named after the storage dtype."""
+        codes_path, scales_path = storage_paths(directory, self.dtype_name)
+        np.save(codes_path, self.codes)
+        if self.scales is not None:
+            np.save(scales_path, self.scales)
+
+    @classmethod
+    def load(cls, directory: str, dtype: str) -> Optional["QuantizedMatrix"]:
+        """
+        Memory-map persisted codes for a storage dtype.
+
+        Returns:
+            The matrix, or None if nothing was persisted in that dtype
+        """
+        codes_path, scales_path = storage_paths(directory, dtype)
+        if not os.path.exists(codes_path):
+            return None
+        codes = np.load(codes_path, mmap_mode="r")
+        scales = np.load(scales_path) if dtype == "int8" else None
+        return cls(codes, scales)
+
+
+def storage_paths(directory: str, dtype: str) -> Tuple[str, str]:
+    """(codes path, scales path) for a storage dtype; float32 keeps the plain embeddings.npy name."""
+    suffix = "" if dtype == "float32" else f"-{dtype}"
+    return (os.path.join(directory, f"embeddings{suffix}.npy"),
+            os.path.join(directory, f"embeddings{suffix}-scales.npy"))
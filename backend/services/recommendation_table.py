@@ -0,0 +1,130 @@
+"""
+Offline precomputed per-ZIP recommendation table.
+Stores the full ranked intervention list and score breakdown for every ZIP in a
+compact NumPy archive keyed by corpus version and embedding model, so the
+enhanced recommendations endpoint can answer with a dictionary lookup.
+"""
+
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .health_data import health_data_fingerprint
+
+logger = logging.getLogger(__name__)
+
+RECOMMENDATION_TABLE_DIR = os.getenv(
+    "RECOMMENDATION_TABLE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "precomputed")
+)
+
+# Column order of the score breakdown
+SCORE_COLUMNS = ["relevance", "vector", "keyword", "context"]
+# Bumped when live scoring changes, so tables ranked the old way are not served
+# (2: keyword scores saturate instead of dividing by the per-query maximum)
+SCORING_VERSION = 2
+
+
+def table_path(corpus_version: str, model_name: str, directory: str = RECOMMENDATION_TABLE_DIR) -> str:
+    """File name of the table for a corpus version and embedding model."""
+    safe_model = model_name.replace("/", "_")
+    return os.path.join(directory, f"recommendations-{safe_model}-{corpus_version[:16]}.npz")
+
+
+class RecommendationTable:
+    """In-memory view of a precomputed recommendation table."""
+
+    def __init__(self, zip_codes: np.ndarray, input_hashes: np.ndarray,
+                 indices: np.ndarray, scores: np.ndarray, meta: Dict):
+        self.meta = meta
+        self.input_hashes = input_hashes
+        self.indices = indices  # (n_zips, depth) corpus row of each ranked intervention
+        self.scores = scores    # (n_zips, depth, len(SCORE_COLUMNS))
+        self.row_of = {str(z): i for i, z in enumerate(zip_codes)}
+
+    def matches(self, corpus_version: str, model_name: str) -> bool:
+        """Check whether the table was built for this corpus, model and scoring version."""
+        return (self.meta.get("corpus_version") == corpus_version and
+                self.meta.get("model_name") == model_name and
+                self.meta.get("scoring_version", 1) == SCORING_VERSION)
+
+    def lookup(self, zip_code: str, health_data: dict) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Get the ranked rows for a ZIP.
+
+        Returns:
+            (intervention indices, score rows) best first, or None if the ZIP is not in
+            the table or was built from different health metrics than `health_data`
+        """
+        row = self.row_of.get(zip_code)
+        if row is None or self.input_hashes[row] != health_data_fingerprint(health_data):
+            return None
+        return self.indices[row], self.scores[row]
+
+    @classmethod
+    def load(cls, path: str) -> Optional["RecommendationTable"]:
+        """Load a table archive, or None if it is missing or unreadable."""
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as archive:
+                meta = json.loads(str(archive["meta"]))
+                table = cls(archive["zip_codes"], archive["input_hashes"],
+                            archive["indices"], archive["scores"], meta)
+            logger.info(f"Loaded precomputed recommendations for {len(table.row_of)} ZIPs from {path}")
+            return table
+        except Exception as e:
+            logger.warning(f"Failed to load recommendation table {path}: {e}")
+            return None
+
+    @classmethod
+    def load_for(cls, corpus_version: str, model_name: str) -> Optional["RecommendationTable"]:
+        """Load the table matching a corpus version and model, if one was built."""
+        table = cls.load(table_path(corpus_version, model_name))
+        if table is not None and not table.matches(corpus_version, model_name):
+            return None
+        return table
+
+
+def write_table(path: str, rows: List[Tuple[str, str, np.ndarray, Dict[str, np.ndarray]]],
+                corpus_version: str, model_name: str, depth: int) -> None:
+    """
+    Write a recommendation table archive.
+
+    Args:
+        path: Output .npz path
+        rows: (zip_code, input fingerprint, ranked indices, score arrays) per ZIP
+        corpus_version: Corpus fingerprint the scores were computed against
+        model_name: Embedding model used for vector scores
+        depth: Number of ranked interventions stored per ZIP
+    """
+    n = len(rows)
+    indices = np.full((n, depth), -1, dtype=np.int32)
+    scores = np.zeros((n, depth, len(SCORE_COLUMNS)), dtype=np.float32)
+    for i, (_, _, ranked, score_arrays) in enumerate(rows):
+        ranked = ranked[:depth]
+        indices[i, :len(ranked)] = ranked
+        for j, column in enumerate(["combined", "vector", "keyword", "context"]):
+            scores[i, :len(ranked), j] = score_arrays[column][ranked]
+
+    meta = {
+        "corpus_version": corpus_version,
+        "model_name": model_name,
+        "depth": depth,
+        "score_columns": SCORE_COLUMNS,
+        "scoring_version": SCORING_VERSION,
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    np.savez(
+        path,
+        zip_codes=np.array([r[0] for r in rows]),
+        input_hashes=np.array([r[1] for r in rows]),
+        indices=indices,
+        scores=scores,
+        meta=np.array(json.dumps(meta))
+    )
@@ -0,0 +1,387 @@
+"""
+Region-sharded health data.
+Each region (e.g. a state) is a directory under REGION_DATA_DIR holding its ZIP
+metric matrix and centroids as raw float32 files, per-ZIP geometry as a JSON
+blob with an offset index, its clusters.json and, optionally, a precomputed
+recommendation table. Shards are memory-mapped on first use and evicted
+least-recently-used when too many are open or the process is over its RSS
+limit, so a deployment can serve every region without loading the nation.
+Build shards offline with scripts/build_region_shards.py.
+
+Without a shard for the default region, the legacy single-region sources
+(HEALTH_GEOJSON_URL and data/clusters.json) serve as that region.
+"""
+
+import asyncio
+import json
+import logging
+import mmap
+import os
+import shutil
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from .embeddings import current_rss_mb
+from .health_data import (
+    CORE_METRICS, OPTIONAL_METRICS, ZipTable, load_health_geojson, load_health_records, load_zip_table,
+    round_metrics
+)
+from .recommendation_table import RecommendationTable, table_path
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+REGION_DATA_DIR = os.getenv("REGION_DATA_DIR", os.path.join(DATA_DIR, "regions"))
+REGION_DEFAULT = os.getenv("REGION_DEFAULT", "NY").upper()
+REGION_MAX_LOADED = int(os.getenv("REGION_MAX_LOADED", "4"))
+# Evict open shards (least recently used first) while RSS exceeds this (0 = no limit)
+REGION_MAX_RSS_MB = float(os.getenv("REGION_MAX_RSS_MB", "0"))
+REGION_CHECK_INTERVAL = float(os.getenv("REGION_CHECK_INTERVAL", "30"))
+
+SHARD_METRICS = CORE_METRICS + OPTIONAL_METRICS
+META_FILE = "meta.json"
+ZIPS_FILE = "zips.json"
+METRICS_FILE = "metrics.f32"
+CENTROIDS_FILE = "centroids.f32"
+GEOMETRY_FILE = "geometry.bin"
+GEOMETRY_INDEX_FILE = "geometry.idx"
+CLUSTERS_FILE = "clusters.json"
+
+
+class RegionError(KeyError):
+    """Unknown region id."""
+
+    def __str__(self) -> str:
+        return str(self.args[0]) if self.args else "Unknown region"
+
+
+def write_shard(directory: str, region: str, name: str, zip_codes: List[str], values: np.ndarray,
+                centroids: np.ndarray, geometries: List[Optional[Dict]], clusters: Dict,
+                recommendation_tables: Optional[List[str]] = None, sources: Optional[Dict] = None) -> str:
+    """
+    Write one region shard (atomically replacing an existing one).
+
+    Args:
+        directory: Parent directory of all shards (REGION_DATA_DIR)
+        region: Region id, e.g. "NY"
+        name: Display name
+        zip_codes: ZIP code of each row
+        values: (zips, len(SHARD_METRICS)) metric values, NaN where missing
+        centroids: (zips, 2) lon/lat centroid of each ZIP
+        geometries: GeoJSON geometry of each ZIP (already quantized)
+        clusters: Contents of the region's clusters.json
+        recommendation_tables: Precomputed recommendation .npz files to include
+        sources: Provenance recorded in the metadata
+
+    Returns:
+        The shard directory
+    """
+    region = region.upper()
+    target = os.path.join(directory, region)
+    staging = f"{target}.tmp-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    np.ascontiguousarray(values, dtype=np.float32).tofile(os.path.join(staging, METRICS_FILE))
+    np.ascontiguousarray(centroids, dtype=np.float32).tofile(os.path.join(staging, CENTROIDS_FILE))
+    offsets = [0]
+    with open(os.path.join(staging, GEOMETRY_FILE), "wb") as f:
+        for geometry in geometries:
+            offsets.append(offsets[-1] + f.write(json.dumps(geometry, separators=(",", ":")).encode("utf-8")))
+    np.asarray(offsets, dtype=np.int64).tofile(os.path.join(staging, GEOMETRY_INDEX_FILE))
+    with open(os.path.join(staging, ZIPS_FILE), "w") as f:
+        json.dump(list(zip_codes), f)
+    with open(os.path.join(staging, CLUSTERS_FILE), "w") as f:
+        json.dump(clusters, f)
+    for path in recommendation_tables or []:
+        shutil.copy(path, staging)
+
+    finite = centroids[np.isfinite(centroids).all(axis=1)] if len(centroids) else centroids
+    meta = {
+        "region": region,
+        "name": name,
+        "zips": len(zip_codes),
+        "metrics": SHARD_METRICS,
+        "zip_prefixes": sorted({z[:3] for z in zip_codes}),
+        "bbox": [float(v) for v in (*finite.min(axis=0), *finite.max(axis=0))] if len(finite) else None,
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+        "sources": sources or {},
+    }
+    with open(os.path.join(staging, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    backup = f"{target}.old-{os.getpid()}"
+    if os.path.exists(target):
+        os.replace(target, backup)
+    os.replace(staging, target)
+    shutil.rmtree(backup, ignore_errors=True)
+    return target
+
+
+class RegionSource:
+    """Data access for one region. Also holds per-region engine instances (see `instance`)."""
+
+    def __init__(self, region: str, name: str, clusters_path: str):
+        self.region = region
+        self.name = name
+        self.clusters_path = clusters_path
+        self._instances: Dict[str, Any] = {}
+        self._tables: Dict[tuple, Optional[RecommendationTable]] = {}
+
+    def instance(self, key: str, factory: Callable[["RegionSource"], Any]) -> Any:
+        """Per-region singleton (risk engine, map store, ...); dropped when the region is evicted."""
+        if key not in self._instances:
+            self._instances[key] = factory(self)
+        return self._instances[key]
+
+    async def table(self) -> ZipTable:
+        """Metric matrix and centroids of the region (what the risk engine and neighbour index use)."""
+        raise NotImplementedError
+
+    async def geojson(self) -> dict:
+        """The region as a health GeoJSON FeatureCollection (for the map payload)."""
+        raise NotImplementedError
+
+    async def record(self, zip_code: str) -> Optional[dict]:
+        """HealthData-shaped record of a ZIP, or None if the region has no such ZIP."""
+        raise NotImplementedError
+
+    def recommendation_table(self, corpus_version: str, model_name: str) -> Optional[RecommendationTable]:
+        """The region's precomputed recommendation table for a corpus and model (loaded once)."""
+        key = (corpus_version, model_name)
+        if key not in self._tables:
+            self._tables = {key: self._load_table(corpus_version, model_name)}
+        return self._tables[key]
+
+    def _load_table(self, corpus_version: str, model_name: str) -> Optional[RecommendationTable]:
+        raise NotImplementedError
+
+    def approx_bytes(self) -> int:
+        return 0
+
+    def close(self) -> None:
+        self._instances.clear()
+        self._tables.clear()
+
+
+class LegacySource(RegionSource):
+    """The original single-region files (HEALTH_GEOJSON_URL, data/clusters.json, data/precomputed)."""
+
+    def __init__(self, region: str = REGION_DEFAULT):
+        super().__init__(region, region, os.path.join(DATA_DIR, CLUSTERS_FILE))
+
+    async def table(self) -> ZipTable:
+        return await load_zip_table()
+
+    async def geojson(self) -> dict:
+        return await load_health_geojson()
+
+    async def record(self, zip_code: str) -> Optional[dict]:
+        return (await load_health_records()).get(zip_code)
+
+    def _load_table(self, corpus_version: str, model_name: str) -> Optional[RecommendationTable]:
+        return RecommendationTable.load_for(corpus_version, model_name)
+
+
+class RegionShard(RegionSource):
+    """Memory-mapped region shard."""
+
+    def __init__(self, directory: str, meta: Dict):
+        super().__init__(meta["region"], meta.get("name", meta["region"]), os.path.join(directory, CLUSTERS_FILE))
+        self.directory = directory
+        self.metrics: List[str] = meta["metrics"]
+        with open(os.path.join(directory, ZIPS_FILE)) as f:
+            self.zip_codes: List[str] = json.load(f)
+        self.row_of = {z: i for i, z in enumerate(self.zip_codes)}
+        shape = (len(self.zip_codes), len(self.metrics))
+        self.values = np.memmap(os.path.join(directory, METRICS_FILE), dtype=np.float32, mode="r", shape=shape)
+        self.centroids = np.memmap(os.path.join(directory, CENTROIDS_FILE), dtype=np.float32, mode="r",
+                                   shape=(len(self.zip_codes), 2))
+        self.offsets = np.fromfile(os.path.join(directory, GEOMETRY_INDEX_FILE), dtype=np.int64)
+        self._geometry_file = open(os.path.join(directory, GEOMETRY_FILE), "rb")
+        self._geometry = (mmap.mmap(self._geometry_file.fileno(), 0, access=mmap.ACCESS_READ)
+                          if self.offsets[-1] else b"")
+        self._table = ZipTable(self.zip_codes, self.metrics, self.values, self.centroids)
+        self._collection: Optional[dict] = None
+
+    def geometry(self, row: int) -> Optional[Dict]:
+        return json.loads(self._geometry[self.offsets[row]:self.offsets[row + 1]])
+
+    async def record(self, zip_code: str) -> Optional[dict]:
+        row = self.row_of.get(zip_code)
+        return None if row is None else self._table.record(row)
+
+    async def table(self) -> ZipTable:
+        """The memory-mapped arrays as is; nothing is materialized."""
+        return self._table
+
+    async def geojson(self) -> dict:
+        """
+        The region as a health GeoJSON FeatureCollection, built once while the shard
+        is open. Only the map payload needs it; everything numeric uses `table`.
+        """
+        if self._collection is None:
+            started = time.perf_counter()
+            values = round_metrics(self.values).tolist()
+            features = []
+            for row, zip_code in enumerate(self.zip_codes):
+                properties = {"ZCTA5CE10": zip_code}
+                # NaN marks a metric the source feature did not have; leave it out like the source did
+                properties.update((m, v) for m, v in zip(self.metrics, values[row]) if v == v)
+                features.append({"type": "Feature", "properties": properties, "geometry": self.geometry(row)})
+            self._collection = {"type": "FeatureCollection", "features": features}
+            logger.info(f"Materialized {len(features)} features for region {self.region} in "
+                        f"{(time.perf_counter() - started) * 1000:.0f}ms")
+        return self._collection
+
+    def _load_table(self, corpus_version: str, model_name: str) -> Optional[RecommendationTable]:
+        table = RecommendationTable.load(table_path(corpus_version, model_name, self.directory))
+        return table if table is not None and table.matches(corpus_version, model_name) else None
+
+    def approx_bytes(self) -> int:
+        """Heap held by this shard beyond its (reclaimable) mapped pages."""
+        # Parsed geometry takes roughly three times its JSON size
+        materialized = int(self.offsets[-1]) * 3 if self._collection is not None else 0
+        tables = sum(t.indices.nbytes + t.scores.nbytes for t in self._tables.values() if t is not None)
+        return materialized + tables + len(self.zip_codes) * 120
+
+    def close(self) -> None:
+        # Requests still holding this shard keep working; the mappings and file are
+        # released when the last reference goes away
+        super().close()
+        self._collection = None
+
+
+class RegionStore:
+    """Registry of region shards with lazy opening and LRU / memory-pressure eviction."""
+
+    def __init__(self, directory: str = REGION_DATA_DIR, default_region: str = REGION_DEFAULT,
+                 max_loaded: int = REGION_MAX_LOADED, max_rss_mb: float = REGION_MAX_RSS_MB):
+        self.directory = directory
+        self.default_region = default_region
+        self.max_loaded = max_loaded
+        self.max_rss_mb = max_rss_mb
+        self.manifests: Dict[str, Dict] = {}
+        self._region_of_prefix: Dict[str, str] = {}
+        self._open: "OrderedDict[str, RegionShard]" = OrderedDict()
+        self._legacy = LegacySource(default_region)
+        self.counters = {"opens": 0, "evicted_capacity": 0, "evicted_memory": 0}
+        self.discover()
+
+    def discover(self) -> None:
+        """Read every shard's metadata (small) and build the ZIP prefix -> region map."""
+        manifests = {}
+        if os.path.isdir(self.directory):
+            for entry in sorted(os.listdir(self.directory)):
+                path = os.path.join(self.directory, entry, META_FILE)
+                if os.path.isfile(path):
+                    with open(path) as f:
+                        meta = json.load(f)
+                    manifests[meta["region"].upper()] = meta
+        self.manifests = manifests
+        self._region_of_prefix = {p: region for region, meta in manifests.items()
+                                  for p in meta.get("zip_prefixes", [])}
+        for region in list(self._open):
+            if region not in manifests:
+                self.evict(region, "removed")
+        if manifests:
+            logger.info(f"Found {len(manifests)} region shards in {self.directory}")
+
+    def resolve(self, region: Optional[str]) -> str:
+        """Normalized region id (default when None). Raises RegionError for unknown regions."""
+        region = (region or self.default_region).upper()
+        if region not in self.manifests and region != self.default_region:
+            raise RegionError(f"Unknown region '{region}'. Available: {', '.join(self.available()) or 'none'}.")
+        return region
+
+    def available(self) -> List[str]:
+        return sorted(set(self.manifests) | {self.default_region})
+
+    def region_for_zip(self, zip_code: str) -> str:
+        """Region serving a ZIP (by 3-digit prefix), falling back to the default region."""
+        return self._region_of_prefix.get(str(zip_code)[:3], self.default_region)
+
+    def source(self, region: Optional[str] = None) -> RegionSource:
+        """Open (or reuse) the region's data source, marking it most recently used."""
+        region = self.resolve(region)
+        if region not in self.manifests:
+            return self._legacy
+        shard = self._open.get(region)
+        if shard is not None:
+            self._open.move_to_end(region)
+            return shard
+
+        started = time.perf_counter()
+        shard = RegionShard(os.path.join(self.directory, region), self.manifests[region])
+        self._open[region] = shard
+        self.counters["opens"] += 1
+        logger.info(f"Opened region shard {region} ({len(shard.zip_codes)} ZIPs) in "
+                    f"{(time.perf_counter() - started) * 1000:.0f}ms")
+        while len(self._open) > self.max_loaded:
+            self.evict(next(iter(self._open)), "capacity")
+        return shard
+
+    def source_for_zip(self, zip_code: str) -> RegionSource:
+        return self.source(self.region_for_zip(zip_code))
+
+    def evict(self, region: str, reason: str) -> bool:
+        shard = self._open.pop(region, None)
+        if shard is None:
+            return False
+        shard.close()
+        key = f"evicted_{reason}"
+        self.counters[key] = self.counters.get(key, 0) + 1
+        logger.info(f"Evicted region shard {region} ({reason})")
+        return True
+
+    def maybe_evict(self) -> int:
+        """Evict least recently used shards (keeping the newest) while over the RSS limit."""
+        evicted = 0
+        while self.max_rss_mb > 0 and len(self._open) > 1 and (current_rss_mb() or 0) > self.max_rss_mb:
+            self.evict(next(iter(self._open)), "memory")
+            evicted += 1
+        return evicted
+
+    async def run_eviction_monitor(self, interval: float = REGION_CHECK_INTERVAL) -> None:
+        """Periodically apply maybe_evict until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.maybe_evict()
+            except Exception as e:
+                logger.warning(f"Region eviction check failed: {e}")
+
+    def regions(self) -> List[Dict]:
+        """Available regions with their size and whether they are currently loaded."""
+        listed = []
+        for region in self.available():
+            meta = self.manifests.get(region, {})
+            listed.append({
+                "region": region,
+                "name": meta.get("name", region),
+                "zips": meta.get("zips"),
+                "bbox": meta.get("bbox"),
+                "sharded": region in self.manifests,
+                "loaded": region in self._open or region not in self.manifests,
+                "default": region == self.default_region,
+            })
+        return listed
+
+    def stats(self) -> Dict:
+        return {
+            **self.counters,
+            "regions": len(self.available()),
+            "loaded": list(self._open),
+            "max_loaded": self.max_loaded,
+            "max_rss_mb": self.max_rss_mb,
+            "rss_mb": round(current_rss_mb() or 0, 1),
+            "approx_heap_bytes": {r: s.approx_bytes() for r, s in self._open.items()},
+        }
+
+
+# Global region store instance
+region_store = RegionStore()
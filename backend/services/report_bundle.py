@@ -0,0 +1,205 @@
+"""
+One-call report bundle for a ZIP.
+Gathers the AI summary, the three recommendation texts, ranked interventions,
+the cluster profile and city comparison stats concurrently. Each component has
+its own timeout and cache, and a failing component is reported in place
+instead of failing the whole report.
+"""
+
+import asyncio
+import logging
+import os
+import time
+import warnings
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from .cache_manager import cache_manager
+from .health_data import CORE_METRICS, health_data_fingerprint, load_clusters
+from .prefetch import prefetcher
+from .prompt_templates import PromptTemplateService, QuestionType
+from .risk_engine import RiskEngine, risk_engine
+from .summary_store import SummaryStore, summary_store
+from .upstream_scheduler import UpstreamHTTPError, UpstreamRejectedError
+
+logger = logging.getLogger(__name__)
+
+CLUSTERS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "clusters.json")
+
+REPORT_COMPONENT_TIMEOUT = float(os.getenv("REPORT_COMPONENT_TIMEOUT", "60"))
+# TTL of the locally computed components (generated texts live in the summary store)
+REPORT_COMPONENT_CACHE_TTL = float(os.getenv("REPORT_COMPONENT_CACHE_TTL", "900"))
+
+TEXT_COMPONENTS = ["summary"] + [q.value for q in QuestionType]
+LOCAL_COMPONENTS = ["interventions", "cluster", "comparison"]
+REPORT_COMPONENTS = TEXT_COMPONENTS + LOCAL_COMPONENTS
+
+
+class ComponentUnavailable(Exception):
+    """A report component cannot be produced (e.g. its data source is not configured)."""
+
+
+class ReportBuilder:
+    """Concurrent, per-component cached assembly of ZIP reports."""
+
+    def __init__(self, store: SummaryStore = summary_store, engine: RiskEngine = risk_engine,
+                 clusters_path: str = CLUSTERS_PATH, timeout: float = REPORT_COMPONENT_TIMEOUT,
+                 cache_ttl: float = REPORT_COMPONENT_CACHE_TTL):
+        self.store = store
+        self.engine = engine
+        self.clusters_path = clusters_path
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.counters = {"reports": 0, "partial": 0, "component_hits": 0, "component_misses": 0,
+                         "component_errors": 0}
+
+    async def _text(self, kind: str, health_data: dict, ai_enabled: bool):
+        if not ai_enabled:
+            raise ComponentUnavailable("OpenRouter API key not configured.")
+        prompt = PromptTemplateService.build_prompt(kind, health_data)
+        cached = self.store.contains(kind, prompt)
+        prefetcher.note_request(kind, prompt)
+        text = await self.store.cached_completion(
+            kind, prompt, zip_code=health_data["zip_code"], timeout=self.timeout, hedge=False
+        )
+        return text, cached
+
+    async def _local(self, component: str, health_data: dict, compute: Callable[[], Awaitable],
+                     version: str = ""):
+        key = f"report:{component}:{health_data['zip_code']}:{health_data_fingerprint(health_data)}:{version}"
+        cached = cache_manager.get(key)
+        if cached is not None:
+            return cached, True
+        data = await compute()
+        if data:
+            # Empty results may come from a degraded retrieval path; recompute them next time
+            cache_manager.set(key, data, max_age=self.cache_ttl)
+        return data, False
+
+    async def _cluster(self, zip_code: str, clusters_path: str) -> Dict:
+        cluster_of, profiles = load_clusters(clusters_path)
+        if zip_code not in cluster_of:
+            raise ComponentUnavailable(f"ZIP {zip_code} is not in the cluster assignment.")
+        cluster_id = cluster_of[zip_code]
+        profile = next((p for p in profiles if p.get("cluster_id") == cluster_id), None)
+        return {"cluster_id": cluster_id, "profile": profile,
+                "peer_count": sum(1 for c in cluster_of.values() if c == cluster_id)}
+
+    async def _comparison(self, zip_code: str, engine: RiskEngine) -> Dict:
+        await engine.ensure_loaded()
+        rows = np.flatnonzero(engine.zip_codes == zip_code)
+        if not rows.size:
+            raise ComponentUnavailable(f"ZIP {zip_code} is not in the health data.")
+        row = rows[0]
+        scores = engine.score(engine.values)
+        metrics = {}
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            for metric in CORE_METRICS:
+                j = engine.column_of.get(metric)
+                if j is None or np.isnan(engine.values[row, j]):
+                    continue
+                column = engine.values[:, j]
+                column = column[~np.isnan(column)]
+                value = float(engine.values[row, j])
+                metrics[metric] = {
+                    "value": round(value, 2),
+                    "city_mean": round(float(column.mean()), 2),
+                    "city_median": round(float(np.median(column)), 2),
+                    "percentile": round(float((column < value).mean() * 100), 1),
+                }
+        return {
+            "zips": len(engine.zip_codes),
+            "risk_score": round(float(scores[row]), 3),
+            "risk_rank": int(engine.ranks(scores)[row]),  # 1 = highest risk (within the region)
+            "metrics": metrics,
+        }
+
+    async def _run(self, component: str, health_data: dict, ai_enabled: bool,
+                   retrieve_interventions: Callable[[dict], Awaitable[List[Dict]]],
+                   engine: RiskEngine, clusters_path: str, interventions_version: str) -> Dict:
+        started = time.perf_counter()
+        zip_code = health_data["zip_code"]
+        try:
+            if component in TEXT_COMPONENTS:
+                kind = "analysis" if component == "summary" else component
+                work = self._text(kind, health_data, ai_enabled)
+            elif component == "interventions":
+                work = self._local(component, health_data, lambda: retrieve_interventions(health_data),
+                                   interventions_version)
+            elif component == "cluster":
+                work = self._local(component, health_data, lambda: self._cluster(zip_code, clusters_path))
+            else:
+                work = self._local(component, health_data, lambda: self._comparison(zip_code, engine))
+            data, cached = await asyncio.wait_for(work, self.timeout)
+            self.counters["component_hits" if cached else "component_misses"] += 1
+            return {"status": "ok", "data": data, "cached": cached,
+                    "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+        except Exception as e:
+            self.counters["component_errors"] += 1
+            result = {"status": "error", "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+            if isinstance(e, ComponentUnavailable):
+                result["error"] = str(e)
+            elif isinstance(e, asyncio.TimeoutError):
+                result["error"] = f"Timed out after {self.timeout:.0f}s."
+            elif isinstance(e, UpstreamRejectedError):
+                result.update(error=f"The AI service is busy ({e.reason}).", retry_after=round(e.retry_after, 1))
+            elif isinstance(e, UpstreamHTTPError):
+                result.update(error=f"AI service returned an error: {e.status_code}", retry_after=round(e.retry_after, 1))
+            elif isinstance(e, httpx.RequestError):
+                result["error"] = "Could not reach the AI service."
+            else:
+                logger.exception(f"Report component {component} failed for {zip_code}: {e}")
+                result["error"] = "Unexpected error."
+            return result
+
+    async def build(self, health_data: dict, retrieve_interventions: Callable[[dict], Awaitable[List[Dict]]],
+                    components: Optional[List[str]] = None, ai_enabled: bool = True,
+                    engine: Optional[RiskEngine] = None, clusters_path: Optional[str] = None,
+                    interventions_version: str = "") -> Dict:
+        """
+        Assemble a report, running every requested component concurrently.
+
+        Args:
+            health_data: HealthData-shaped record of the ZIP
+            retrieve_interventions: Coroutine returning ranked interventions for the record
+            components: Subset of REPORT_COMPONENTS (default: all)
+            ai_enabled: False when no upstream API key is configured
+            engine: Risk engine of the ZIP's region (default: the configured engine)
+            clusters_path: clusters.json of the ZIP's region (default: the configured file)
+            interventions_version: Corpus version and scoring model the interventions are
+                ranked with; part of their cache key, so a corpus update is not served stale
+
+        Returns:
+            Report with one {"status", "data" | "error", ...} entry per component
+        """
+        started = time.perf_counter()
+        components = components or REPORT_COMPONENTS
+        results = await asyncio.gather(*(
+            self._run(c, health_data, ai_enabled, retrieve_interventions,
+                      engine or self.engine, clusters_path or self.clusters_path, interventions_version)
+            for c in components
+        ))
+        failed = [c for c, r in zip(components, results) if r["status"] != "ok"]
+        self.counters["reports"] += 1
+        if failed:
+            self.counters["partial"] += 1
+            logger.info("Report assembled with failed components", extra={
+                "zip_code": health_data["zip_code"], "failed": failed
+            })
+        return {
+            "zip_code": health_data["zip_code"],
+            "complete": not failed,
+            "failed": failed,
+            "components": dict(zip(components, results)),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    def stats(self) -> Dict:
+        return dict(self.counters)
+
+
+# Global report builder instance
+report_builder = ReportBuilder()
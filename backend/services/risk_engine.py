@@ -0,0 +1,258 @@
+"""
+Vectorized risk-score engine and what-if scenario simulation.
+Holds every ZIP's metrics as one float32 matrix, so the composite RiskScore for
+all ZIPs is a single matrix-vector product with configurable metric weights.
+Scenarios apply hypothetical metric changes to a scoped set of ZIPs and report
+recomputed scores, rank changes and nearest-profile cluster reassignment.
+"""
+
+import logging
+import os
+import time
+import warnings
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+from .health_data import CORE_METRICS, OPTIONAL_METRICS, ZipTable, load_clusters, load_zip_table
+
+logger = logging.getLogger(__name__)
+
+CLUSTERS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "clusters.json")
+
+# Composite RiskScore: mean of diabetes, obesity, physical inactivity and hypertension prevalence
+DEFAULT_RISK_WEIGHTS = "DIABETES_CrudePrev=0.25,OBESITY_CrudePrev=0.25,LPA_CrudePrev=0.25,BPHIGH_CrudePrev=0.25"
+RISK_WEIGHTS = os.getenv("RISK_WEIGHTS", DEFAULT_RISK_WEIGHTS)
+
+ENGINE_METRICS = [m for m in CORE_METRICS + OPTIONAL_METRICS if m.endswith("_CrudePrev")]
+
+# ZIP prefix -> borough (same ZIP ranges as NYC_BOROUGHS in the frontend's boroughService.js)
+BOROUGH_PREFIXES = {
+    "100": "Manhattan", "101": "Manhattan", "102": "Manhattan",
+    "103": "Staten Island",
+    "104": "Bronx",
+    "112": "Brooklyn",
+    "110": "Queens", "111": "Queens", "113": "Queens", "114": "Queens", "116": "Queens",
+}
+
+
+def borough_of(zip_code: str) -> Optional[str]:
+    """NYC borough of a ZIP code, or None outside the five boroughs."""
+    return BOROUGH_PREFIXES.get(str(zip_code)[:3])
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """Parse "METRIC=weight,METRIC=weight" into a weight mapping."""
+    weights = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        metric, _, weight = part.partition("=")
+        weights[metric.strip()] = float(weight)
+    return weights
+
+
+class ScenarioError(ValueError):
+    """A scenario references unknown metrics, scopes or units."""
+
+
+class RiskEngine:
+    """ZIP x metric matrix with vectorized scoring, ranking and cluster assignment."""
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None, clusters_path: str = CLUSTERS_PATH,
+                 loader: Callable[[], Awaitable[ZipTable]] = load_zip_table):
+        self.weights = weights or parse_weights(RISK_WEIGHTS)
+        self.clusters_path = clusters_path
+        self.loader = loader   # returns the (region's) ZipTable
+        self.metrics = ENGINE_METRICS
+        self.column_of = {m: j for j, m in enumerate(self.metrics)}
+        self.zip_codes = np.zeros(0, dtype="<U5")
+        self.values = np.zeros((0, len(self.metrics)), dtype=np.float32)
+        self.boroughs = np.zeros(0, dtype=object)
+        self.clusters = np.zeros(0, dtype=np.int32)          # stored cluster id per ZIP (-1 = none)
+        self.centroids = np.zeros((0, 0), dtype=np.float32)  # standardized profile centroids
+        self.centroid_ids = np.zeros(0, dtype=np.int32)
+        self.centroid_columns: List[int] = []
+        self.mean = np.zeros(0, dtype=np.float32)
+        self.std = np.ones(0, dtype=np.float32)
+        self._table = None
+        self.validate_weights(self.weights)
+
+    def validate_weights(self, weights: Dict[str, float]) -> None:
+        unknown = sorted(set(weights) - set(self.metrics))
+        if unknown:
+            raise ScenarioError(f"Unknown weight metric(s): {', '.join(unknown)}")
+
+    async def ensure_loaded(self) -> None:
+        """(Re)build the metric matrix when the ZIP table was reloaded."""
+        table = await self.loader()
+        if table is self._table:
+            return
+
+        started = time.perf_counter()
+        self.zip_codes = np.array(table.zip_codes)
+        self.values = table.columns(self.metrics)
+        self.boroughs = np.array([borough_of(z) for z in self.zip_codes], dtype=object)
+
+        cluster_of, profiles = load_clusters(self.clusters_path)
+        self.clusters = np.array([cluster_of.get(z, -1) for z in self.zip_codes], dtype=np.int32)
+        self._fit_centroids(profiles)
+        self._table = table
+        logger.info(f"Risk engine loaded {len(self.zip_codes)} ZIPs x {len(self.metrics)} metrics in "
+                    f"{(time.perf_counter() - started) * 1000:.0f}ms")
+
+    def _fit_centroids(self, profiles: List[Dict]) -> None:
+        """Standardize cluster profile centroids with the current ZIP distribution."""
+        with warnings.catch_warnings():
+            # Optional metrics can be missing for every ZIP; those columns are unused by profiles
+            warnings.simplefilter("ignore", RuntimeWarning)
+            self.mean = np.nan_to_num(np.nanmean(self.values, axis=0)) if len(self.values) else np.zeros(len(self.metrics))
+            std = np.nanstd(self.values, axis=0) if len(self.values) else np.ones(len(self.metrics))
+        self.std = np.where(np.nan_to_num(std) > 0, std, 1.0).astype(np.float32)
+        columns = sorted({self.column_of[m] for p in profiles for m in p.get("metrics", {}) if m in self.column_of})
+        self.centroid_columns = columns
+        self.centroid_ids = np.array([p["cluster_id"] for p in profiles], dtype=np.int32)
+        raw = np.array([[p["metrics"].get(self.metrics[j], np.nan) for j in columns] for p in profiles],
+                       dtype=np.float32).reshape(len(profiles), len(columns))
+        self.centroids = (raw - self.mean[columns]) / self.std[columns]
+
+    def score(self, values: np.ndarray, weights: Optional[Dict[str, float]] = None) -> np.ndarray:
+        """Composite risk score of every row: one matrix-vector product."""
+        weights = weights or self.weights
+        vector = np.zeros(len(self.metrics), dtype=np.float32)
+        for metric, weight in weights.items():
+            vector[self.column_of[metric]] = weight
+        return np.nan_to_num(values) @ vector
+
+    @staticmethod
+    def ranks(scores: np.ndarray) -> np.ndarray:
+        """1-based rank of each row, highest risk first."""
+        order = np.argsort(-scores, kind="stable")
+        ranks = np.empty(len(scores), dtype=np.int32)
+        ranks[order] = np.arange(1, len(scores) + 1, dtype=np.int32)
+        return ranks
+
+    def nearest_cluster(self, values: np.ndarray) -> np.ndarray:
+        """Cluster id of the nearest (standardized) profile centroid for each row."""
+        if not len(self.centroid_ids):
+            return np.full(len(values), -1, dtype=np.int32)
+        features = (np.nan_to_num(values[:, self.centroid_columns], nan=0.0)
+                    - self.mean[self.centroid_columns]) / self.std[self.centroid_columns]
+        centroids = np.nan_to_num(self.centroids)
+        distances = ((features[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+        return self.centroid_ids[np.argmin(distances, axis=1)]
+
+    def scope_mask(self, scope: Optional[Dict]) -> np.ndarray:
+        """
+        Rows a change applies to. Scope keys: "zip_codes" (list), "borough", "cluster_id";
+        several keys are ANDed, an empty scope selects every ZIP.
+        """
+        mask = np.ones(len(self.zip_codes), dtype=bool)
+        scope = scope or {}
+        unknown = sorted(set(scope) - {"zip_codes", "borough", "cluster_id"})
+        if unknown:
+            raise ScenarioError(f"Unknown scope key(s): {', '.join(unknown)}")
+        if scope.get("zip_codes"):
+            if not isinstance(scope["zip_codes"], (list, tuple)):
+                raise ScenarioError("Scope 'zip_codes' must be a list of ZIP codes")
+            mask &= np.isin(self.zip_codes, [str(z) for z in scope["zip_codes"]])
+        if scope.get("borough"):
+            boroughs = set(BOROUGH_PREFIXES.values())
+            if not isinstance(scope["borough"], str) or scope["borough"] not in boroughs:
+                raise ScenarioError(f"Unknown borough '{scope['borough']}' (choose from {', '.join(sorted(boroughs))})")
+            mask &= self.boroughs == scope["borough"]
+        if scope.get("cluster_id") is not None:
+            try:
+                cluster_id = int(scope["cluster_id"])
+            except (TypeError, ValueError):
+                raise ScenarioError(f"Scope 'cluster_id' must be an integer, got {scope['cluster_id']!r}")
+            mask &= self.clusters == cluster_id
+        return mask
+
+    def simulate(self, changes: List[Dict], weights: Optional[Dict[str, float]] = None,
+                 limit: int = 50) -> Dict:
+        """
+        Apply hypothetical metric changes and compare against the baseline.
+
+        Args:
+            changes: [{"metric", "change", "unit": "percent"|"points", "scope": {...}}];
+                     "percent" is relative (-5 = 5% lower), "points" adds percentage points
+            weights: Optional weight override for both baseline and scenario scores
+            limit: Number of most-affected ZIPs to return in detail
+
+        Returns:
+            Summary, per-ZIP details for the most affected ZIPs, and cluster moves
+
+        Raises:
+            ScenarioError: For unknown metrics, units or scopes
+        """
+        started = time.perf_counter()
+        weights = weights or self.weights
+        self.validate_weights(weights)
+
+        scenario = self.values.copy()
+        affected = np.zeros(len(self.zip_codes), dtype=bool)
+        for change in changes:
+            metric = change.get("metric")
+            if metric not in self.column_of:
+                raise ScenarioError(f"Unknown metric '{metric}'")
+            unit = change.get("unit", "percent")
+            if unit not in ("percent", "points"):
+                raise ScenarioError(f"Unknown unit '{unit}' (use 'percent' or 'points')")
+            mask = self.scope_mask(change.get("scope"))
+            j = self.column_of[metric]
+            amount = float(change.get("change", 0.0))
+            if unit == "percent":
+                scenario[mask, j] *= 1.0 + amount / 100.0
+            else:
+                scenario[mask, j] += amount
+            affected |= mask
+        np.clip(scenario, 0.0, 100.0, out=scenario)
+
+        before, after = self.score(self.values, weights), self.score(scenario, weights)
+        rank_before, rank_after = self.ranks(before), self.ranks(after)
+
+        # Only count a reassignment when the change moves a ZIP's nearest centroid; this
+        # keeps ZIPs whose stored cluster differs from nearest-centroid assignment stable
+        nearest_before, nearest_after = self.nearest_cluster(self.values), self.nearest_cluster(scenario)
+        moved = (nearest_before != nearest_after) & (nearest_after != self.clusters)
+        cluster_after = np.where(moved, nearest_after, self.clusters)
+
+        delta = after - before
+        order = np.argsort(-np.abs(delta), kind="stable")[:limit]
+        order = order[np.abs(delta[order]) > 0]
+        details = [
+            {
+                "zip_code": str(self.zip_codes[i]),
+                "borough": self.boroughs[i],
+                "score_before": round(float(before[i]), 3),
+                "score_after": round(float(after[i]), 3),
+                "rank_before": int(rank_before[i]),
+                "rank_after": int(rank_after[i]),
+                "rank_change": int(rank_before[i] - rank_after[i]),  # > 0: moved toward highest risk
+                "cluster_before": int(self.clusters[i]),
+                "cluster_after": int(cluster_after[i]),
+            }
+            for i in order
+        ]
+        reassigned = np.flatnonzero(moved)
+        return {
+            "weights": weights,
+            "summary": {
+                "zips": len(self.zip_codes),
+                "affected_zips": int(affected.sum()),
+                "mean_score_before": round(float(before.mean()), 3) if len(before) else None,
+                "mean_score_after": round(float(after.mean()), 3) if len(after) else None,
+                "mean_delta_affected": round(float(delta[affected].mean()), 3) if affected.any() else 0.0,
+                "zips_changing_rank": int((rank_before != rank_after).sum()),
+                "clusters_reassigned": int(reassigned.size),
+            },
+            "zips": details,
+            "cluster_moves": [
+                {"zip_code": str(self.zip_codes[i]), "from": int(self.clusters[i]), "to": int(cluster_after[i])}
+                for i in reassigned[:limit]
+            ],
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+
+
+# Global risk engine instance
+risk_engine = RiskEngine()
@@ -0,0 +1,137 @@
+"""
+Persistent store for generated LLM summaries and recommendations.
+SQLite-backed and keyed by prompt fingerprint and model configuration, so
+summaries survive deploys and restarts and are served without upstream calls.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from .model_router import ModelRouter, model_router
+from .upstream_scheduler import Priority
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_STORE_PATH = os.getenv(
+    "SUMMARY_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "summaries.sqlite3")
+)
+ENABLE_SUMMARY_STORE = os.getenv("ENABLE_SUMMARY_STORE", "true").lower() == "true"
+
+
+def prompt_fingerprint(kind: str, prompt: str, model: str) -> str:
+    """Key for a generated text: what was asked, of which model configuration."""
+    return hashlib.sha256(f"{kind}\x00{model}\x00{prompt}".encode("utf-8")).hexdigest()
+
+
+class SummaryStore:
+    """Durable key-value store of generated texts."""
+
+    def __init__(self, path: str = SUMMARY_STORE_PATH, router: ModelRouter = model_router):
+        self.path = path
+        self.router = router
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.counters = {"hits": 0, "misses": 0, "writes": 0}
+
+    @property
+    def model_key(self) -> str:
+        """Model configuration the stored texts were generated with."""
+        return ",".join(self.router.models)
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS summaries (
+                    key TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    zip_code TEXT,
+                    model TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_summaries_zip ON summaries (zip_code, kind)")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, kind: str, prompt: str) -> Optional[str]:
+        """Stored text for this prompt and the current model configuration, if any."""
+        key = prompt_fingerprint(kind, prompt, self.model_key)
+        with self._lock:
+            row = self._db().execute("SELECT content FROM summaries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.counters["misses"] += 1
+            return None
+        self.counters["hits"] += 1
+        return row[0]
+
+    def contains(self, kind: str, prompt: str) -> bool:
+        """Check for a stored text without touching hit/miss counters."""
+        key = prompt_fingerprint(kind, prompt, self.model_key)
+        with self._lock:
+            return self._db().execute("SELECT 1 FROM summaries WHERE key = ?", (key,)).fetchone() is not None
+
+    def put(self, kind: str, prompt: str, content: str, zip_code: Optional[str] = None) -> None:
+        """Store a generated text (replacing any previous one for the same key)."""
+        key = prompt_fingerprint(kind, prompt, self.model_key)
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO summaries (key, kind, zip_code, model, content, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, kind, zip_code, self.model_key, content, time.time())
+            )
+            db.commit()
+        self.counters["writes"] += 1
+
+    async def cached_completion(self, kind: str, prompt: str, zip_code: Optional[str] = None,
+                                priority: Priority = Priority.INTERACTIVE,
+                                timeout: float = 60.0, hedge: Optional[bool] = None) -> str:
+        """
+        Return the stored text for a prompt, generating and storing it on a miss.
+
+        Args:
+            kind: Text type, e.g. "analysis" or a QuestionType value
+            prompt: Full prompt sent upstream
+            zip_code: ZIP the text describes (for bookkeeping)
+            priority: Scheduler lane for the upstream call
+            timeout: Per-attempt HTTP timeout
+            hedge: Passed through to the model router
+
+        Returns:
+            Generated text
+        """
+        if ENABLE_SUMMARY_STORE:
+            stored = self.get(kind, prompt)
+            if stored is not None:
+                return stored
+
+        content = await self.router.complete(
+            [{"role": "user", "content": prompt}], priority=priority, timeout=timeout, hedge=hedge
+        )
+        if ENABLE_SUMMARY_STORE and content:
+            try:
+                self.put(kind, prompt, content, zip_code)
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to persist {kind} summary: {e}")
+        return content
+
+    def stats(self) -> Dict:
+        """Store size and hit/miss counters."""
+        with self._lock:
+            rows = self._db().execute("SELECT kind, COUNT(*) FROM summaries GROUP BY kind").fetchall()
+        return {**self.counters, "stored": dict(rows), "path": self.path}
+
+
+# Global store instance
+summary_store = SummaryStore()
@@ -0,0 +1,277 @@
+"""
+Multi-year PLACES time-series store.
+Keeps a year x ZIP x metric float32 cube in a memory-mapped file (NaN where a
+ZIP had no value that year), computes per-ZIP deltas and least-squares slopes
+for all ZIPs and metrics in one vectorized pass, and precomputes the
+fastest-worsening / fastest-improving ZIP rankings whenever the cube is loaded.
+Build the cube offline with scripts/build_trend_store.py.
+"""
+
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .health_data import CORE_METRICS, OPTIONAL_METRICS
+
+logger = logging.getLogger(__name__)
+
+TREND_STORE_DIR = os.getenv(
+    "TREND_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "trends")
+)
+
+CUBE_FILE = "cube.f32"
+META_FILE = "meta.json"
+
+# Prevalence metrics tracked over time (population counts are not trends of interest)
+TREND_METRICS = [m for m in CORE_METRICS + OPTIONAL_METRICS if not m.startswith("TotalPop")]
+
+# Metrics where a rising value is an improvement; every other metric worsens as it rises
+HIGHER_IS_BETTER = {"CHECKUP_CrudePrev", "DENTAL_CrudePrev"}
+
+
+def _direction(metrics: List[str]) -> np.ndarray:
+    """+1 where an increase is worsening, -1 where it is improving."""
+    return np.array([-1.0 if m in HIGHER_IS_BETTER else 1.0 for m in metrics], dtype=np.float32)
+
+
+def compute_trends(cube: np.ndarray, years: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Per-ZIP, per-metric trend statistics over the year axis, ignoring missing years.
+
+    Args:
+        cube: (years, zips, metrics) values with NaN for missing observations
+        years: Year of each cube slice
+
+    Returns:
+        Dict of (zips, metrics) float32 arrays: "first", "latest", "delta" (latest
+        minus earliest observed value), "slope" (least-squares change per year)
+        and "observations" (number of observed years)
+    """
+    values = np.asarray(cube, dtype=np.float32)
+    observed = ~np.isnan(values)
+    filled = np.where(observed, values, 0.0)
+    x = (np.asarray(years, dtype=np.float64) - float(np.mean(years)))[:, None, None]
+
+    n = observed.sum(axis=0).astype(np.float64)
+    sx = (observed * x).sum(axis=0)
+    sy = filled.sum(axis=0, dtype=np.float64)
+    sxx = (observed * x * x).sum(axis=0)
+    sxy = (filled * x).sum(axis=0, dtype=np.float64)
+    denominator = n * sxx - sx * sx
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope = np.where((n >= 2) & (denominator > 0), (n * sxy - sx * sy) / denominator, np.nan)
+
+    # First / latest observed value along the year axis
+    year_count = values.shape[0]
+    first_idx = np.argmax(observed, axis=0)
+    last_idx = year_count - 1 - np.argmax(observed[::-1], axis=0)
+    first = np.take_along_axis(values, first_idx[None], axis=0)[0]
+    latest = np.take_along_axis(values, last_idx[None], axis=0)[0]
+    any_observed = n > 0
+    first = np.where(any_observed, first, np.nan)
+    latest = np.where(any_observed, latest, np.nan)
+
+    return {
+        "first": first.astype(np.float32),
+        "latest": latest.astype(np.float32),
+        "delta": np.where(n >= 2, latest - first, np.nan).astype(np.float32),
+        "slope": slope.astype(np.float32),
+        "observations": n.astype(np.float32),
+    }
+
+
+def write_cube(directory: str, years: List[int], zip_codes: List[str], metrics: List[str],
+               cube: np.ndarray, sources: Optional[Dict[str, str]] = None) -> str:
+    """
+    Persist a cube and its axis labels; the metadata file is replaced last so readers
+    never see a cube that does not match its labels.
+
+    Args:
+        directory: Output directory (TREND_STORE_DIR)
+        years: Year of each slice, ascending
+        zip_codes: ZIP code of each row
+        metrics: Metric name of each column
+        cube: (years, zips, metrics) float32 values, NaN where missing
+        sources: Optional year -> source snapshot, recorded for provenance
+
+    Returns:
+        Path of the cube file
+    """
+    cube = np.ascontiguousarray(cube, dtype=np.float32)
+    if cube.shape != (len(years), len(zip_codes), len(metrics)):
+        raise ValueError(f"Cube shape {cube.shape} does not match labels "
+                         f"({len(years)}, {len(zip_codes)}, {len(metrics)})")
+
+    os.makedirs(directory, exist_ok=True)
+    cube_path = os.path.join(directory, CUBE_FILE)
+    cube.tofile(cube_path + ".tmp")
+    os.replace(cube_path + ".tmp", cube_path)
+
+    meta = {
+        "years": [int(y) for y in years],
+        "zip_codes": [str(z) for z in zip_codes],
+        "metrics": list(metrics),
+        "shape": list(cube.shape),
+        "sources": sources or {},
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    meta_path = os.path.join(directory, META_FILE)
+    with open(meta_path + ".tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(meta_path + ".tmp", meta_path)
+    return cube_path
+
+
+class TrendStore:
+    """Memory-mapped year x ZIP x metric cube with precomputed trend rankings."""
+
+    def __init__(self, directory: str = TREND_STORE_DIR):
+        self.directory = directory
+        self.cube: Optional[np.memmap] = None
+        self.years = np.zeros(0, dtype=np.int32)
+        self.zip_codes: List[str] = []
+        self.metrics: List[str] = []
+        self.meta: Dict = {}
+        self.row_of: Dict[str, int] = {}
+        self.column_of: Dict[str, int] = {}
+        self.trends: Dict[str, np.ndarray] = {}
+        self.rankings: Dict[str, np.ndarray] = {}   # metric -> ZIP rows, fastest worsening first
+        self.ranks = np.zeros((0, 0), dtype=np.int32)  # (zips, metrics) 1-based worsening rank, 0 = unranked
+        self._loaded_mtime: Optional[float] = None
+
+    @property
+    def available(self) -> bool:
+        return self.cube is not None
+
+    def ensure_loaded(self) -> bool:
+        """Load the cube, or reload it if the build script replaced it. Returns availability."""
+        meta_path = os.path.join(self.directory, META_FILE)
+        try:
+            mtime = os.path.getmtime(meta_path)
+        except OSError:
+            return self.available
+        if mtime != self._loaded_mtime:
+            self.load()
+            self._loaded_mtime = mtime
+        return self.available
+
+    def load(self) -> None:
+        """Memory-map the cube and refresh trend statistics and rankings."""
+        try:
+            with open(os.path.join(self.directory, META_FILE), "r") as f:
+                meta = json.load(f)
+            shape = tuple(meta["shape"])
+            cube = np.memmap(os.path.join(self.directory, CUBE_FILE), dtype=np.float32,
+                             mode="r", shape=shape)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Trend store unavailable in {self.directory}: {e}")
+            return
+
+        self.cube = cube
+        self.meta = meta
+        self.years = np.array(meta["years"], dtype=np.int32)
+        self.zip_codes = meta["zip_codes"]
+        self.metrics = meta["metrics"]
+        self.row_of = {z: i for i, z in enumerate(self.zip_codes)}
+        self.column_of = {m: j for j, m in enumerate(self.metrics)}
+        self._refresh_rankings()
+        logger.info(f"Loaded trend cube {shape} ({self.years.min() if len(self.years) else '-'}-"
+                    f"{self.years.max() if len(self.years) else '-'}) from {self.directory}")
+
+    def _refresh_rankings(self) -> None:
+        self.trends = compute_trends(self.cube, self.years)
+        # Worsening rate: slope signed so that larger always means getting worse
+        worsening = self.trends["slope"] * _direction(self.metrics)
+        ordered = np.where(np.isnan(worsening), -np.inf, worsening)
+        rows = np.argsort(-ordered, axis=0, kind="stable")
+        self.rankings = {}
+        self.ranks = np.zeros(worsening.shape, dtype=np.int32)
+        for j, metric in enumerate(self.metrics):
+            column = rows[:, j]
+            ranked = column[~np.isnan(worsening[column, j])].astype(np.int32)
+            self.rankings[metric] = ranked
+            self.ranks[ranked, j] = np.arange(1, ranked.size + 1, dtype=np.int32)
+
+    def zip_trend(self, zip_code: str, metrics: Optional[List[str]] = None) -> Optional[Dict]:
+        """
+        Year-by-year values and trend statistics for one ZIP.
+
+        Args:
+            zip_code: ZIP code
+            metrics: Metrics to include (defaults to all)
+
+        Returns:
+            Trend payload, or None if the ZIP is not in the cube
+        """
+        row = self.row_of.get(zip_code)
+        if row is None:
+            return None
+        columns = [self.column_of[m] for m in (metrics or self.metrics)]
+        series = np.asarray(self.cube[:, row, columns])
+        direction = _direction([self.metrics[j] for j in columns])
+
+        result = {}
+        for k, j in enumerate(columns):
+            metric = self.metrics[j]
+            slope = self.trends["slope"][row, j]
+            result[metric] = {
+                "values": [None if np.isnan(v) else round(float(v), 3) for v in series[:, k]],
+                "delta": _round(self.trends["delta"][row, j]),
+                "slope_per_year": _round(slope),
+                "worsening": None if np.isnan(slope) else bool(slope * direction[k] > 0),
+                "worsening_rank": int(self.ranks[row, j]) or None,
+            }
+        return {
+            "zip_code": zip_code,
+            "years": self.years.tolist(),
+            "metrics": result,
+            "ranked_zips": len(self.zip_codes),
+        }
+
+    def top(self, metric: str, limit: int = 20, improving: bool = False) -> List[Dict]:
+        """
+        ZIPs whose metric is worsening (or improving) fastest, by least-squares slope.
+
+        Args:
+            metric: Metric name
+            limit: Number of ZIPs to return
+            improving: Rank fastest-improving instead of fastest-worsening
+
+        Returns:
+            Ranked list of {zip_code, slope_per_year, delta, latest, observations}
+        """
+        ranking = self.rankings[metric]
+        rows = ranking[::-1][:limit] if improving else ranking[:limit]
+        j = self.column_of[metric]
+        return [
+            {
+                "zip_code": self.zip_codes[row],
+                "slope_per_year": _round(self.trends["slope"][row, j]),
+                "delta": _round(self.trends["delta"][row, j]),
+                "latest": _round(self.trends["latest"][row, j]),
+                "observations": int(self.trends["observations"][row, j]),
+            }
+            for row in rows
+        ]
+
+    def stats(self) -> Dict:
+        return {
+            "available": self.available,
+            "shape": list(self.cube.shape) if self.available else None,
+            "years": self.years.tolist(),
+            "mapped_mb": round(self.cube.nbytes / 1e6, 2) if self.available else 0.0,
+            "built_at": self.meta.get("built_at"),
+        }
+
+
+def _round(value, digits: int = 4) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+# Global trend store instance
+trend_store = TrendStore()
@@ -0,0 +1,392 @@
+"""
+Upstream request scheduler for OpenRouter calls.
+Provides global and per-model concurrency limits with priority lanes, a token-bucket
+rate limiter, Retry-After-aware exponential backoff and a per-model circuit breaker.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+UPSTREAM_MAX_CONCURRENCY = int(os.getenv("UPSTREAM_MAX_CONCURRENCY", "8"))
+UPSTREAM_PER_MODEL_CONCURRENCY = int(os.getenv("UPSTREAM_PER_MODEL_CONCURRENCY", "4"))
+UPSTREAM_RATE_PER_SEC = float(os.getenv("UPSTREAM_RATE_PER_SEC", "2"))
+UPSTREAM_BURST = int(os.getenv("UPSTREAM_BURST", "5"))
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", "3"))
+UPSTREAM_QUEUE_TIMEOUT = float(os.getenv("UPSTREAM_QUEUE_TIMEOUT", "20"))
+UPSTREAM_MAX_QUEUE = int(os.getenv("UPSTREAM_MAX_QUEUE", "100"))
+UPSTREAM_BREAKER_THRESHOLD = int(os.getenv("UPSTREAM_BREAKER_THRESHOLD", "5"))
+UPSTREAM_BREAKER_COOLDOWN = float(os.getenv("UPSTREAM_BREAKER_COOLDOWN", "30"))
+# Longest upstream Retry-After honoured before a retry; longer waits fail fast
+UPSTREAM_MAX_RETRY_WAIT = float(os.getenv("UPSTREAM_MAX_RETRY_WAIT", "30"))
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class Priority(IntEnum):
+    """Scheduling lanes. Lower value is served first."""
+    INTERACTIVE = 0
+    BATCH = 1
+    PREFETCH = 2
+
+
+class UpstreamRejectedError(Exception):
+    """Request was not sent upstream (circuit open, queue full or timeout, or a Retry-After too long to wait)."""
+
+    def __init__(self, reason: str, retry_after: float = 0.0):
+        super().__init__(f"Upstream request rejected: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class UpstreamHTTPError(Exception):
+    """Upstream answered with a non-success status after any retries."""
+
+    def __init__(self, status_code: int, text: str, retry_after: float = 0.0):
+        super().__init__(f"Upstream returned {status_code}")
+        self.status_code = status_code
+        self.text = text
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given either as seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class PriorityGate:
+    """Counting semaphore whose waiters are served by priority, then FIFO."""
+
+    def __init__(self, capacity: int, max_queue: int = UPSTREAM_MAX_QUEUE):
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.in_use = 0
+        self._waiters: List[list] = []  # heap of [priority, seq, future]
+        self._seq = itertools.count()
+
+    def queued(self, priority: Optional[Priority] = None) -> int:
+        """Number of waiters, optionally for a single lane."""
+        return sum(1 for p, _, _ in self._waiters if priority is None or p == priority)
+
+    async def acquire(self, priority: Priority, timeout: float) -> None:
+        """
+        Take a slot, waiting behind higher-priority requests.
+
+        Raises:
+            UpstreamRejectedError: If the queue is full or the wait times out
+        """
+        if self.in_use < self.capacity and not self._waiters:
+            self.in_use += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            raise UpstreamRejectedError("queue_full", retry_after=1.0)
+
+        future = asyncio.get_running_loop().create_future()
+        entry = [priority, next(self._seq), future]
+        heapq.heappush(self._waiters, entry)
+        try:
+            await asyncio.wait_for(future, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self.release()
+            elif entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            if isinstance(exc, asyncio.TimeoutError):
+                raise UpstreamRejectedError("queue_timeout", retry_after=timeout) from None
+            raise
+
+    def release(self) -> None:
+        """Release a slot, handing it directly to the highest-priority waiter."""
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_use -= 1
+
+
+class TokenBucket:
+    """Token-bucket rate limiter that can be paused when upstream asks us to back off."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for `seconds` (e.g. after a 429 with Retry-After)."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self) -> float:
+        """Wait for a token. Returns the time spent waiting, in seconds."""
+        if self.rate <= 0:
+            return 0.0
+
+        started = time.monotonic()
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return time.monotonic() - started
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+    Opens after `threshold` failures, then lets one probe through per `cooldown`.
+    """
+
+    def __init__(self, threshold: int = UPSTREAM_BREAKER_THRESHOLD,
+                 cooldown: float = UPSTREAM_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow(self) -> bool:
+        """Check whether a request may be sent now."""
+        if self.state == "closed":
+            return True
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            # Half-open: let this request probe the upstream, re-arm the timer for the rest
+            self.state = "half_open"
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+    def retry_after(self) -> float:
+        """Seconds until the next probe is allowed."""
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            logger.info("Circuit breaker closed")
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.threshold:
+            if self.state != "open":
+                logger.warning(f"Circuit breaker opened after {self.failures} failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+class UpstreamScheduler:
+    """Admission control, rate limiting and retries for every upstream LLM call."""
+
+    def __init__(self, max_concurrency: int = UPSTREAM_MAX_CONCURRENCY,
+                 per_model_concurrency: int = UPSTREAM_PER_MODEL_CONCURRENCY,
+                 rate_per_sec: float = UPSTREAM_RATE_PER_SEC,
+                 burst: int = UPSTREAM_BURST,
+                 max_retries: int = UPSTREAM_MAX_RETRIES,
+                 queue_timeout: float = UPSTREAM_QUEUE_TIMEOUT,
+                 backoff_base: float = 1.0,
+                 backoff_max: float = 30.0,
+                 max_retry_wait: float = UPSTREAM_MAX_RETRY_WAIT):
+        self.global_gate = PriorityGate(max_concurrency)
+        self.per_model_concurrency = per_model_concurrency
+        self.model_gates: Dict[str, PriorityGate] = {}
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.bucket = TokenBucket(rate_per_sec, burst)
+        self.max_retries = max_retries
+        self.queue_timeout = queue_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retry_wait = max_retry_wait
+
+        self.counters: Dict[str, int] = {
+            "submitted": 0, "succeeded": 0, "failed": 0, "retries": 0, "rate_limited": 0
+        }
+        self.rejections: Dict[str, int] = {}
+        self.queue_waits: Dict[Priority, Deque[float]] = {p: deque(maxlen=1000) for p in Priority}
+        self.in_flight: Dict[Priority, int] = {p: 0 for p in Priority}
+
+    def _model_gate(self, model: str) -> PriorityGate:
+        if model not in self.model_gates:
+            self.model_gates[model] = PriorityGate(self.per_model_concurrency)
+        return self.model_gates[model]
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        """Circuit breaker for a model (created on first use)."""
+        if model not in self.breakers:
+            self.breakers[model] = CircuitBreaker()
+        return self.breakers[model]
+
+    def _reject(self, reason: str) -> None:
+        self.rejections[reason] = self.rejections.get(reason, 0) + 1
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def interactive_load(self) -> int:
+        """Interactive requests currently queued or in flight."""
+        return (self.in_flight[Priority.INTERACTIVE] + self.global_gate.queued(Priority.INTERACTIVE)
+                + sum(gate.queued(Priority.INTERACTIVE) for gate in self.model_gates.values()))
+
+    async def submit(self, model: str, send: Callable[[], Awaitable[httpx.Response]],
+                     priority: Priority = Priority.INTERACTIVE,
+                     max_retries: Optional[int] = None,
+                     consume: Optional[Callable[[httpx.Response], Awaitable[Any]]] = None) -> Any:
+        """
+        Run an upstream call under the scheduler's limits.
+
+        Args:
+            model: Model identifier (selects the per-model gate and breaker)
+            send: Coroutine factory performing the HTTP request
+            priority: Scheduling lane
+            max_retries: Override for the number of retries on 429/5xx/network errors
+            consume: Optional coroutine run on the successful response while the
+                concurrency slots are still held (used to drain streaming bodies)
+
+        Returns:
+            The successful httpx.Response, or the result of `consume`
+
+        Raises:
+            UpstreamRejectedError: Circuit open or queue full/timed out
+            UpstreamHTTPError: Non-success response after retries
+            httpx.RequestError: Network failure after retries
+        """
+        retries = self.max_retries if max_retries is None else max_retries
+        breaker = self.breaker(model)
+        model_gate = self._model_gate(model)
+        self.counters["submitted"] += 1
+
+        for attempt in range(retries + 1):
+            if not breaker.allow():
+                self._reject("circuit_open")
+                raise UpstreamRejectedError("circuit_open", retry_after=breaker.retry_after())
+
+            queued_at = time.monotonic()
+            try:
+                # Model gate first: requests queued behind one saturated model must not
+                # hold global slots that other models (and hedges to them) could use
+                await model_gate.acquire(priority, self.queue_timeout)
+                try:
+                    await self.global_gate.acquire(priority, self.queue_timeout)
+                except BaseException:
+                    model_gate.release()
+                    raise
+            except UpstreamRejectedError as exc:
+                self._reject(exc.reason)
+                raise
+
+            self.queue_waits[priority].append(time.monotonic() - queued_at)
+            self.in_flight[priority] += 1
+            # Slots are held for one attempt only; retry waits happen after releasing them
+            try:
+                await self.bucket.acquire()
+                try:
+                    response = await send()
+                except httpx.RequestError:
+                    # Every failed attempt counts towards the breaker
+                    breaker.record_failure()
+                    if attempt == retries:
+                        self.counters["failed"] += 1
+                        raise
+                    delay = self._backoff(attempt)
+                else:
+                    if response.status_code >= 400:
+                        # Streamed responses have an unread body; load it for error reporting
+                        await response.aread()
+                        await response.aclose()
+
+                    if response.status_code not in RETRYABLE_STATUS_CODES:
+                        # Any other answer means the upstream is alive
+                        breaker.record_success()
+                        if response.status_code >= 400:
+                            self.counters["failed"] += 1
+                            raise UpstreamHTTPError(response.status_code, response.text)
+                        self.counters["succeeded"] += 1
+                        if consume is not None:
+                            return await consume(response)
+                        return response
+
+                    breaker.record_failure()
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    delay = retry_after if retry_after is not None else self._backoff(attempt)
+                    if response.status_code == 429:
+                        # Everyone backs off, not just this request
+                        self.counters["rate_limited"] += 1
+                        self.bucket.pause(min(delay, self.max_retry_wait))
+                    if attempt == retries:
+                        self.counters["failed"] += 1
+                        raise UpstreamHTTPError(response.status_code, response.text, retry_after=delay)
+                    if delay > self.max_retry_wait:
+                        self.counters["failed"] += 1
+                        self._reject("retry_after_too_long")
+                        raise UpstreamRejectedError("retry_after_too_long", retry_after=delay)
+            finally:
+                self.in_flight[priority] -= 1
+                self.global_gate.release()
+                model_gate.release()
+
+            self.counters["retries"] += 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict:
+        """Queue wait, rejection and breaker statistics."""
+        def percentile(samples: Deque[float], q: float) -> float:
+            if not samples:
+                return 0.0
+            ordered = sorted(samples)
+            return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+        return {
+            **self.counters,
+            "rejections": dict(self.rejections),
+            "in_flight": {p.name.lower(): n for p, n in self.in_flight.items()},
+            "queued": {p.name.lower(): self.global_gate.queued(p) for p in Priority},
+            "queue_wait_seconds": {
+                p.name.lower(): {
+                    "p50": percentile(waits, 0.5),
+                    "p95": percentile(waits, 0.95),
+                    "max": max(waits) if waits else 0.0
+                }
+                for p, waits in self.queue_waits.items()
+            },
+            "breakers": {
+                model: {"state": b.state, "failures": b.failures, "retry_after": b.retry_after() if b.state != "closed" else 0.0}
+                for model, b in self.breakers.items()
+            }
+        }
+
+
+# Global scheduler instance shared by all OpenRouter calls
+upstream_scheduler = UpstreamScheduler()
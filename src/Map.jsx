@@ -530,11 +530,34 @@ const Map = ({ selectedArea, setSelectedArea, setIsLoading, setAiSummary, mapMov
 
   useEffect(() => {
     setIsZipCodeDataLoading(true);
-    fetch('https://geo-risk-spotspot-geojson.s3.us-east-1.amazonaws.com/ny_new_york_zip_codes_health.geojson')
-      .then(response => response.json())
+    // Pre-joined payload from the backend (quantized geometry + cluster ids); S3 GeoJSON as fallback
+    fetch(`${API_BASE_URL}/api/map/zips`)
+      .then(response => {
+        if (!response.ok) throw new Error(`Map payload request failed: ${response.status}`);
+        return response.json();
+      })
       .then(data => {
+        const clusterMap = {};
+        data.features.forEach(feature => {
+          const { zip_code, cluster_id } = feature.properties;
+          if (cluster_id !== null && cluster_id !== undefined) {
+            clusterMap[zip_code] = cluster_id;
+          }
+        });
+        if (Object.keys(clusterMap).length > 0) {
+          setClusterData(clusterMap);
+          setClusterProfiles(data.cluster_profiles || []);
+        }
         setGeojsonData(data);
       })
+      .catch(error => {
+        console.warn('Pre-joined map payload unavailable, loading GeoJSON from S3:', error);
+        return fetch('https://geo-risk-spotspot-geojson.s3.us-east-1.amazonaws.com/ny_new_york_zip_codes_health.geojson')
+          .then(response => response.json())
+          .then(data => {
+            setGeojsonData(data);
+          });
+      })
       .catch(error => {
         console.error('Error loading GeoJSON data:', error);
         // Try fallback to local file
@@ -548,7 +571,7 @@ const Map = ({ selectedArea, setSelectedArea, setIsLoading, setAiSummary, mapMov
       .finally(() => {
         setIsZipCodeDataLoading(false);
       });
-  }, [setIsZipCodeDataLoading]);
+  }, [setIsZipCodeDataLoading, setClusterData, setClusterProfiles]);
 
   // Fetch cluster data when needed
   useEffect(() => {
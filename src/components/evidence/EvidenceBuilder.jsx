@@ -270,6 +270,7 @@ const EvidenceBuilder = ({
     
     return {
       areaName,
+      zipCode: zipCode ? String(zipCode) : null,
       analysis,
       metrics: extractDetailedMetrics(areaData),
       summary: aiSummary,
@@ -453,6 +454,7 @@ const EvidenceBuilder = ({
         id: `pkg-${Date.now().toString(36)}`,
         title: packageSettings.title || `Diabetes Risk Evidence Package - ${evidenceData.areaName}`,
         areaName: evidenceData.areaName,
+        zipCode: evidenceData.zipCode,
         audience: packageSettings.audience,
         format: packageSettings.format,
         
@@ -7,6 +7,10 @@
 import jsPDF from 'jspdf';
 import html2canvas from 'html2canvas';
 
+const API_BASE_URL = process.env.NODE_ENV === 'production'
+  ? 'https://geo-risk-spotter.onrender.com'
+  : 'http://localhost:8000';
+
 /**
  * PDF Generation Service Class
  */
@@ -1724,7 +1728,7 @@ class PDFGenerationService {
    * Generate personalized recommendations based on risk factors using RAG system
    */
   async generatePersonalizedRecommendations(packageData) {
-    const { metrics, areaName, analysis } = packageData;
+    const { metrics, areaName, analysis, zipCode } = packageData;
     
     // Identify key risk factors from the data
     const riskFactors = this.identifyKeyRiskFactors(metrics);
@@ -1734,7 +1738,7 @@ class PDFGenerationService {
     
     try {
       // Query our intervention RAG system
-      const ragRecommendations = await this.queryInterventionDatabase(context);
+      const ragRecommendations = await this.queryInterventionDatabase(context, zipCode);
       
       if (ragRecommendations && ragRecommendations.length > 0) {
         return ragRecommendations.slice(0, 4); // Top 4 recommendations
@@ -1820,29 +1824,29 @@ class PDFGenerationService {
   }
 
   /**
-   * Query intervention database (would connect to backend RAG system)
+   * Query the backend's ranked interventions for the area's ZIP (report bundle endpoint)
    */
-  async queryInterventionDatabase(context) {
+  async queryInterventionDatabase(context, zipCode) {
+    if (!zipCode) {
+      // Ranked interventions are per ZIP; other areas use the fallbacks
+      return null;
+    }
+    
     try {
-      // This would make an API call to our backend RAG system
-      const response = await fetch('/api/interventions/recommend', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json'
-        },
-        body: JSON.stringify({
-          context: context,
-          maxRecommendations: 4,
-          includeEvidence: true
-        })
-      });
+      const response = await fetch(
+        `${API_BASE_URL}/api/reports/${encodeURIComponent(zipCode)}?components=interventions`
+      );
       
       if (!response.ok) {
         throw new Error('RAG system unavailable');
       }
       
       const data = await response.json();
-      return data.recommendations?.map(rec => this.formatRAGRecommendation(rec)) || [];
+      const interventions = data.components?.interventions;
+      if (interventions?.status !== 'ok') {
+        throw new Error(interventions?.error || 'RAG system unavailable');
+      }
+      return interventions.data.map(rec => this.formatRAGRecommendation(rec));
       
     } catch (error) {
       console.log('Could not query intervention database:', error);
@@ -1859,7 +1863,7 @@ class PDFGenerationService {
       description: ragRec.description || ragRec.summary,
       timeline: ragRec.implementation_timeline || ragRec.timeframe || 'Variable',
       impact: ragRec.expected_impact || ragRec.effectiveness || 'Medium',
-      cost: ragRec.cost_estimate || ragRec.resources_required || 'Medium',
+      cost: ragRec.cost_estimate || ragRec.implementation_cost || ragRec.resources_required || 'Medium',
       evidence: ragRec.evidence_level || 'Evidence-based',
       source: ragRec.source || 'Clinical guidelines',
       targetFactors: ragRec.target_risk_factors || []